@@ -0,0 +1,96 @@
+"""
+Per-request latency with post-generation analytics computed inline on the
+event loop (the old behaviour) vs. offloaded to the analytics process pool.
+
+Each simulated request waits a fixed "LLM latency" and then scores its
+answer. With analytics inline, every request's scoring also delays all other
+requests on the loop; the event-loop lag column shows that directly.
+
+    python -m benchmarks.bench_analytics --requests 32 --words 1200
+"""
+import time
+import random
+import argparse
+import asyncio
+import statistics
+
+from services import analytics
+from services.analytics import analyze_text, compute_analytics, compute_analytics_many, warm_up_analytics, shutdown_analytics_pool
+
+WORDS = (
+    "the team shipped a great release with clear improvements to reliability and speed "
+    "customers were unhappy about slow exports but the new pipeline fixes that problem "
+    "our analysis shows a significant reduction in latency across every region we serve"
+).split()
+
+def _sample_text(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        n = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + ".")
+        words -= n
+    return " ".join(sentences)
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+async def _lag_probe(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst * 1000
+
+async def _run_requests(texts, llm_latency: float, offload: bool):
+    async def one(text):
+        start = time.perf_counter()
+        await asyncio.sleep(llm_latency)
+        if offload:
+            await compute_analytics(text)
+        else:
+            analyze_text(text)
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_lag_probe(stop))
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(t) for t in texts))
+    wall = time.perf_counter() - start
+    stop.set()
+    return latencies, wall, await probe
+
+async def main(requests: int, words: int, llm_latency: float, batch: int):
+    texts = [_sample_text(words, seed) for seed in range(requests)]
+    analyze_text(texts[0])  # load analyzers in this process for the inline run
+    await warm_up_analytics()
+
+    print(f"requests={requests} words/answer={words} llm_latency={llm_latency}s workers={analytics.ANALYTICS_WORKERS}")
+    print(f"{'mode':<10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'wall s':>8} {'loop lag ms':>12}")
+    for mode, offload in (("inline", False), ("offloaded", True)):
+        latencies, wall, lag = await _run_requests(texts, llm_latency, offload)
+        print(f"{mode:<10} {_pct(latencies, 0.5):>9.1f} {_pct(latencies, 0.95):>9.1f} "
+              f"{max(latencies) * 1000:>9.1f} {wall:>8.2f} {lag:>12.1f}")
+
+    history = [_sample_text(words, seed) for seed in range(batch)]
+    start = time.perf_counter()
+    for text in history:
+        analyze_text(text)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    await compute_analytics_many(history)
+    pooled = time.perf_counter() - start
+    print(f"\nre-scoring {batch} texts: sequential {sequential:.2f}s, batched pool {pooled:.2f}s "
+          f"({statistics.mean([len(t.split()) for t in history]):.0f} words each)")
+    shutdown_analytics_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--words", type=int, default=1200)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.words, args.llm_latency, args.batch))
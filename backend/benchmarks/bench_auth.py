@@ -0,0 +1,45 @@
+"""
+Per-request auth overhead: full RS256 verification on every request vs. the
+memoized-claims fast path, using locally minted tokens and a stubbed key
+endpoint (no network).
+
+    python -m benchmarks.bench_auth --requests 2000 --users 50
+"""
+import time
+import argparse
+
+from benchmarks.fakes import LocalTokenIssuer
+from services.auth_service import PublicKeyCache, TokenVerifier
+
+def _per_request_us(func, tokens, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        func(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / rounds * 1e6
+
+def main(requests: int, users: int):
+    issuer = LocalTokenIssuer()
+    tokens = [issuer.mint(f"user-{i}") for i in range(users)]
+
+    def uncached(token):
+        # A fresh verifier per request: signature + claim checks every time,
+        # which is what verify_id_token costs on each call.
+        TokenVerifier(issuer.project_id, keys).verify(token)
+
+    keys = PublicKeyCache(fetch=issuer.fetch_keys)
+    full = _per_request_us(uncached, tokens, requests)
+
+    verifier = TokenVerifier(issuer.project_id, PublicKeyCache(fetch=issuer.fetch_keys))
+    memoized = _per_request_us(lambda t: verifier.cached(t) or verifier.verify(t), tokens, requests)
+
+    print(f"requests={requests} distinct_tokens={users} key_fetches={issuer.fetches}")
+    print(f"{'verify every request':<24} {full:>10.1f} us/request")
+    print(f"{'memoized claims':<24} {memoized:>10.1f} us/request")
+    print(f"verifier stats: {verifier.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    main(args.requests, args.users)
@@ -0,0 +1,117 @@
+"""
+Per-request chain overhead: the old route (parse the generation template and
+compose prompt | llm | parser on every call, one template with branching
+instructions for every format) vs. the shared ChainSet (templates parsed at
+import, chains composed once, one template per content type). The LLM is a
+zero-latency fake, so the timings are pure framework CPU; prompt size is the
+chars/4 token estimate of the rendered prompt.
+
+    python -m benchmarks.bench_chains --requests 2000
+"""
+import time
+import argparse
+import asyncio
+import statistics
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from benchmarks.fakes import FakeChatModel
+from services.chains import build_chains, template_kind, GENERATION_PROMPTS
+from services.context_assembly import count_tokens
+
+# The single template the route used before content-type templates, kept here for comparison.
+LEGACY_TEMPLATE = """
+        You are an expert AI content creator.
+        
+        === RETRIEVED CONTEXT (From User's Knowledge Base) ===
+        {context}
+        ======================================================
+        
+        USER REQUEST:
+        Topic: {topic}
+        Tone / Style Description: {tone}
+        Format: {content_type}
+        Audience: {target_audience}
+        Language: {language}
+
+        STRICT INSTRUCTIONS:
+        1. **IF the requested Format is 'LLM System Prompt' or 'AI Prompt'**:
+           - Your task is to act as an Elite Prompt Engineer.
+           - DO NOT write the actual content. 
+           - Write a system prompt.
+           
+        2. **IF the requested Format is 'Midjourney Image Prompt'**:
+           - Output a list of 3-5 highly descriptive image prompts.
+           
+        3. **FOR ALL OTHER FORMATS**:
+           - Write the actual content in {language}.
+           - Structure it accordingly.
+        
+        4. **Handling Tone**:
+           - If a custom persona is provided in 'Tone', MIMIC it exactly.
+           - Otherwise, use the adjective provided.
+        
+        5. **Context Usage**:
+           - Use the 'RETRIEVED CONTEXT' to add factual accuracy and specific company details.
+           - If the context is empty or irrelevant, ignore it.
+
+        6. **Formatting**:
+           - NO PREAMBLE. Start directly with the content.
+        """
+
+CONTENT_TYPES = ["blog post", "linkedin post", "llm prompt", "midjourney prompt", "cold email"]
+
+def _inputs(content_type: str) -> dict:
+    return {
+        "context": "",
+        "topic": "Launching a usage-based pricing tier",
+        "content_type": content_type,
+        "tone": "professional",
+        "target_audience": "CTOs",
+        "language": "English",
+    }
+
+async def _legacy_call(llm, inputs: dict):
+    prompt = ChatPromptTemplate.from_template(LEGACY_TEMPLATE)
+    chain = prompt | llm | StrOutputParser()
+    return await chain.ainvoke(inputs)
+
+async def _timed(call, n: int) -> list[float]:
+    latencies = []
+    for i in range(n):
+        inputs = _inputs(CONTENT_TYPES[i % len(CONTENT_TYPES)])
+        start = time.perf_counter()
+        await call(inputs)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return sorted(latencies)
+
+async def main(requests: int):
+    llm = FakeChatModel(responses=["ok"], latency=0)
+    chains = build_chains(llm)
+
+    legacy_prompt = ChatPromptTemplate.from_template(LEGACY_TEMPLATE)
+    print(f"{'content type':<20} {'legacy tokens':>14} {'new tokens':>11}")
+    for content_type in CONTENT_TYPES:
+        inputs = _inputs(content_type)
+        old = count_tokens(legacy_prompt.invoke(inputs).to_string())
+        new = count_tokens(GENERATION_PROMPTS[template_kind(content_type)].invoke(inputs).to_string())
+        print(f"{content_type:<20} {old:>14} {new:>11}")
+
+    for name, call in (("legacy (per request)", lambda inputs: _legacy_call(llm, inputs)),
+                       ("shared chains", lambda inputs: chains.generation_for(inputs["content_type"]).ainvoke(inputs))):
+        await _timed(call, 50)
+        latencies = await _timed(call, requests)
+        print(f"{name:<22} p50 {latencies[len(latencies) // 2]:>7.0f} us  "
+              f"mean {statistics.mean(latencies):>7.0f} us  p95 {latencies[int(len(latencies) * 0.95)]:>7.0f} us")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        ChatPromptTemplate.from_template(LEGACY_TEMPLATE) | llm | StrOutputParser()
+    print(f"template parse + compose alone: {(time.perf_counter() - start) / requests * 1e6:.0f} us/request")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
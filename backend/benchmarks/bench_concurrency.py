@@ -0,0 +1,157 @@
+"""
+Concurrent-request latency through the real app: drives /api/generate and
+/api/history on the FastAPI app from main.py at increasing concurrency and
+reports p50/p95 latency, throughput and the worst event-loop stall seen
+while the requests were in flight.
+
+Gemini is replaced by FakeChatModel, Pinecone by LocalVectorBackend with
+FakeEmbeddings, and Firestore by FakeFirestore, whose RPCs block the calling
+thread for `--db-latency` like the real client does. Requests go through
+httpx's ASGITransport, so the app shares the driver's event loop: any
+blocking call on a route's path shows up as loop lag and as latency growing
+with concurrency. `--blocking-llm` swaps in a model that sleeps synchronously
+inside the loop (what `chain.invoke` in an `async def` handler used to do)
+as a control. Above the Gemini admission limit, generate requests queue for
+a slot by design; that wait is not loop lag.
+
+    python -m benchmarks.bench_concurrency --levels 1 8 32 --requests 64
+    python -m benchmarks.bench_concurrency --blocking-llm
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import datetime
+
+# Before main.py is imported: nothing is built at startup, nothing rate-limits the driver.
+os.environ.setdefault("LAZY_SERVICE_INIT", "1")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+os.environ.setdefault("RATE_LIMIT_BURST", "1000000")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeFirestore
+
+USERS = [f"bench-user-{i}" for i in range(8)]
+
+class BlockingChatModel(FakeChatModel):
+    """FakeChatModel whose latency blocks the event loop."""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._call(messages, stop=stop)))])
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+class LoopLagProbe:
+    """Wakes every `interval` seconds and records how late each wake-up was."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.worst = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.worst = max(self.worst, loop.time() - expected)
+
+    def __enter__(self):
+        self.worst = 0.0
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+def _install_fakes(args):
+    from main import app
+    from services.registry import registry
+    from services.auth_service import get_current_user
+    from services.vector_service import VectorService
+    from services.vector_backends import LocalVectorBackend
+
+    model = BlockingChatModel if args.blocking_llm else FakeChatModel
+    llm = model(responses=["A short generated answer about the topic."], latency=args.llm_latency)
+    embeddings = FakeEmbeddings(size=256, call_latency=args.embed_latency)
+    db = FakeFirestore(latency=args.db_latency)
+    vs = VectorService(
+        backend=LocalVectorBackend(embeddings),
+        embeddings=embeddings,
+        search_limiter=registry.admission.upstream("pinecone")
+    )
+    registry.override(llm=llm, vector_service=vs, db=db, generation_cache=None)
+
+    current = {"uid": USERS[0]}
+    app.dependency_overrides[get_current_user] = lambda: current
+    return app, registry, db, current
+
+async def _seed(registry, db, rng: random.Random):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    store = db.collections.setdefault("generations", {})
+    for uid in USERS:
+        texts = [f"Notes {i} for {uid} on launch planning and customer onboarding." for i in range(20)]
+        await registry.vector_service.aadd_texts(texts, namespace=uid, ids=[f"{uid}-seed-{i}" for i in range(len(texts))])
+        for i in range(50):
+            store[f"{uid}-h{i:03d}"] = {
+                "uid": uid, "topic": f"topic {rng.randint(0, 999)}", "content_type": "Blog Post",
+                "answer": "seeded", "preview": "seeded", "created_at": now - datetime.timedelta(minutes=i),
+            }
+
+async def _drive(client, current: dict, endpoint: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i):
+        async with semaphore:
+            current["uid"] = USERS[i % len(USERS)]
+            start = time.perf_counter()
+            if endpoint == "generate":
+                body = {"topic": f"launch plan {i}-{concurrency}", "content_type": "Blog Post"}
+                response = await client.post("/api/generate", json=body)
+            else:
+                response = await client.get("/api/history", params={"limit": 20})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, statuses, time.perf_counter() - start
+
+async def main(args):
+    app, registry, db, current = _install_fakes(args)
+    await _seed(registry, db, random.Random(7))
+    print(f"llm={'blocking' if args.blocking_llm else 'async'} llm_latency={args.llm_latency}s "
+          f"embed_latency={args.embed_latency}s db_latency={args.db_latency}s requests={args.requests}")
+    print(f"{'endpoint':<9} {'concurrency':>11} {'p50 ms':>9} {'p95 ms':>9} {'r/s':>7} {'loop lag ms':>12}  statuses")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # Lazily built clients and chains are not part of the measurement.
+        await _drive(client, current, "generate", 2, 1)
+        await _drive(client, current, "history", 2, 1)
+        for endpoint in ("generate", "history"):
+            for concurrency in args.levels:
+                with LoopLagProbe() as probe:
+                    latencies, statuses, elapsed = await _drive(client, current, endpoint, args.requests, concurrency)
+                print(f"{endpoint:<9} {concurrency:>11} {_pct(latencies, 0.5):>9.1f} {_pct(latencies, 0.95):>9.1f} "
+                      f"{len(latencies) / elapsed:>7.1f} {probe.worst * 1000:>12.1f}  {statuses}")
+    await registry.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per endpoint and level")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--blocking-llm", action="store_true", help="control run: LLM latency blocks the event loop")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""
+Prompt-context size before and after context assembly. A synthetic document
+is cut with the upload splitter (1000 chars, 200 overlap) and each simulated
+retrieval returns k chunks around a random position, so neighbours (and
+their shared overlap) come back together as they do for real topic queries.
+Scores decay with distance from the best chunk; the tail can fall below
+CONTEXT_MIN_SCORE.
+
+    python -m benchmarks.bench_context --queries 500 --k 5 --budget 1500
+"""
+import time
+import random
+import argparse
+import statistics
+
+from langchain_core.documents import Document
+from routes.knowledge import _build_text_splitter
+from services.context_assembly import assemble_context
+
+WORDS = (
+    "the platform syncs customer records across regions and retries failed jobs "
+    "with exponential backoff while the dashboard reports usage per workspace and "
+    "billing is calculated monthly from active seats plus metered api calls"
+).split()
+
+def build_document(paragraphs: int, seed: int = 3) -> str:
+    """Long paragraphs of short lines, as PDF extraction produces them."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+                 for _ in range(rng.randint(20, 60))]
+        out.append("\n".join(lines))
+    return "\n\n".join(out)
+
+def main(queries: int, k: int, budget: int, paragraphs: int):
+    chunks = _build_text_splitter().split_text(build_document(paragraphs))
+    rng = random.Random(5)
+    before, after, used, timings = [], [], [], []
+    for _ in range(queries):
+        center = rng.randrange(len(chunks))
+        order = sorted(range(len(chunks)), key=lambda i: (abs(i - center), rng.random()))[:k]
+        best = rng.uniform(0.55, 0.9)
+        docs = [Document(page_content=chunks[i], metadata={"score": best - 0.08 * rank - rng.uniform(0, 0.05)})
+                for rank, i in enumerate(order)]
+        start = time.perf_counter()
+        _, stats = assemble_context(docs, token_budget=budget)
+        timings.append((time.perf_counter() - start) * 1000)
+        before.append(stats["tokens_before"])
+        after.append(stats["tokens_after"])
+        used.append(stats["used_chunks"])
+
+    timings.sort()
+    print(f"chunks={len(chunks)} queries={queries} k={k} budget={budget}")
+    print(f"tokens before: mean {statistics.mean(before):.0f}  max {max(before)}")
+    print(f"tokens after:  mean {statistics.mean(after):.0f}  max {max(after)}")
+    print(f"reduction:     {1 - sum(after) / sum(before):.1%}   chunks used: mean {statistics.mean(used):.2f}")
+    print(f"assembly:      p50 {timings[len(timings) // 2]:.3f} ms  p95 {timings[int(len(timings) * 0.95)]:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    args = parser.parse_args()
+    main(args.queries, args.k, args.budget, args.paragraphs)
@@ -0,0 +1,72 @@
+"""
+Generation-request latency spent persisting history: an inline document
+write per request vs. handing the record to the write-behind HistoryWriter,
+plus how many Firestore commits each approach needs.
+
+    python -m benchmarks.bench_history_writer --requests 500 --latency 0.03
+"""
+import time
+import argparse
+import asyncio
+
+from benchmarks.fakes import FakeFirestore
+from services.executor import run_blocking
+from services.history_writer import HistoryWriter
+
+def _record(i: int) -> dict:
+    return {"uid": f"user-{i % 20}", "topic": f"topic {i}", "answer": "lorem ipsum " * 200}
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+async def _drive(persist, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await persist(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, time.perf_counter() - start
+
+async def main(total: int, latency: float, concurrency: int, batch_size: int, fail: int):
+    inline_db = FakeFirestore(latency=latency)
+
+    async def inline(i):
+        await run_blocking(inline_db.collection("generations").document().set, _record(i))
+
+    behind_db = FakeFirestore(latency=latency, fail_next_commits=fail)
+    writer = HistoryWriter(behind_db, batch_size=batch_size, flush_interval=0.05, backoff_seconds=0.01)
+
+    async def write_behind(i):
+        ref = behind_db.collection("generations").document()
+        if not writer.submit(ref, _record(i)):
+            await run_blocking(ref.set, _record(i))
+
+    print(f"requests={total} concurrency={concurrency} firestore_latency={latency}s batch_size={batch_size}")
+    print(f"{'mode':<13} {'p50 ms':>8} {'p99 ms':>8} {'wall s':>7} {'commits':>8} {'stored':>7}")
+    latencies, wall = await _drive(inline, total, concurrency)
+    stored = len(inline_db.collections.get("generations", {}))
+    print(f"{'inline':<13} {_pct(latencies, 0.5):>8.2f} {_pct(latencies, 0.99):>8.2f} {wall:>7.2f} {total:>8} {stored:>7}")
+
+    latencies, wall = await _drive(write_behind, total, concurrency)
+    await run_blocking(writer.close)
+    stored = len(behind_db.collections.get("generations", {}))
+    print(f"{'write-behind':<13} {_pct(latencies, 0.5):>8.2f} {_pct(latencies, 0.99):>8.2f} {wall:>7.2f} "
+          f"{behind_db.commits:>8} {stored:>7}")
+    print(f"writer stats: {writer.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--fail", type=int, default=1, help="commits to fail first, exercising retries")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency, args.concurrency, args.batch_size, args.fail))
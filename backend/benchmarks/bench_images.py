@@ -0,0 +1,87 @@
+"""
+"Load more images" cost: the old ImageService (a Gemini refinement call and a
+fresh `requests.get` connection per page, no timeout) vs. the current one
+(memoized search term, cached result pages, pooled keep-alive httpx client),
+with and without next-page prefetching, against a local mock Pexels server
+and a fake LLM. Users pause `--think` seconds between pages.
+
+    python -m benchmarks.bench_images --users 8 --pages 5 --pexels-latency 0.15 --prefetch-depth 1
+"""
+import os
+import time
+import argparse
+import asyncio
+
+os.environ.setdefault("PEXELS_API_KEY", "bench-key")
+
+import requests
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeChatModel, MockPexelsServer
+from services.executor import run_blocking
+from services.image_service import ImageService
+
+class LegacyImageService:
+    """The pre-cache implementation, kept here for comparison."""
+
+    def __init__(self, llm, base_url: str):
+        self.llm = llm
+        self.base_url = base_url
+
+    async def get_images(self, query: str, per_page: int = 5, page: int = 1):
+        response = await self.llm.ainvoke([HumanMessage(content=f"Topic: {query}")])
+        params = {"query": response.content.strip(), "per_page": per_page, "page": page, "orientation": "landscape"}
+        response = await run_blocking(requests.get, self.base_url, headers={"Authorization": "bench-key"}, params=params)
+        response.raise_for_status()
+        return [photo["src"]["medium"] for photo in response.json().get("photos", [])]
+
+async def _session(service, topic: str, pages: int, think: float, latencies: list):
+    # One user paging through results, then a second user opening the same topic.
+    for _ in range(2):
+        for page in range(1, pages + 1):
+            start = time.perf_counter()
+            await service.get_images(topic, page=page)
+            latencies.append((page, time.perf_counter() - start))
+            await asyncio.sleep(think)
+
+def _summary(latencies):
+    first = [t for page, t in latencies if page == 1]
+    later = [t for page, t in latencies if page > 1]
+    return sum(first) / len(first) * 1000, sum(later) / len(later) * 1000
+
+async def main(users: int, pages: int, pexels_latency: float, llm_latency: float, think: float, depth: int):
+    topics = [f"topic {i % max(1, users // 2)}" for i in range(users)]
+    print(f"users={users} pages={pages} pexels_latency={pexels_latency}s llm_latency={llm_latency}s think={think}s")
+    print(f"{'service':<9} {'page 1 ms':>10} {'page 2+ ms':>11} {'wall s':>7} {'llm calls':>10} {'pexels req':>11} {'connections':>12}")
+    prefetch_stats = None
+    for name in ("legacy", "cached", "prefetch"):
+        llm = FakeChatModel(responses=[f"search term {i}" for i in range(users)], latency=llm_latency)
+        with MockPexelsServer(latency=pexels_latency) as pexels:
+            if name == "legacy":
+                service = LegacyImageService(llm, pexels.url)
+            else:
+                os.environ["PEXELS_BASE_URL"] = pexels.url
+                service = ImageService(llm=llm)
+                service.prefetch_depth = depth if name == "prefetch" else 0
+            latencies = []
+            start = time.perf_counter()
+            await asyncio.gather(*(_session(service, t, pages, think, latencies) for t in topics))
+            wall = time.perf_counter() - start
+            if name != "legacy":
+                if name == "prefetch":
+                    prefetch_stats = service.cache_stats()
+                await service.aclose()
+            first, later = _summary(latencies)
+            print(f"{name:<9} {first:>10.1f} {later:>11.1f} {wall:>7.2f} {llm.calls:>10} {pexels.requests:>11} {pexels.connections:>12}")
+    print("prefetch: " + ", ".join(f"{k}={v}" for k, v in prefetch_stats.items() if k.startswith("prefetch")))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--pexels-latency", type=float, default=0.15)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--think", type=float, default=0.5)
+    parser.add_argument("--prefetch-depth", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.pages, args.pexels_latency, args.llm_latency, args.think, args.prefetch_depth))
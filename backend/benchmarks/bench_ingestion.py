@@ -0,0 +1,63 @@
+"""
+Knowledge-upload ingestion throughput with fake embedding / vector-store
+stand-ins (no network). Compares the old embed-everything-then-upsert path
+with IngestionPipeline at a few batch sizes and concurrency levels.
+
+    python -m benchmarks.bench_ingestion --chunks 2000
+"""
+import time
+import uuid
+import argparse
+import asyncio
+
+from benchmarks.fakes import FakeEmbeddings, FakeVectorIndex
+from services.executor import run_blocking, shutdown_executor
+from services.vector_service import IngestionPipeline
+
+def _records(batch, vectors, ids=None):
+    ids = ids or [str(uuid.uuid4()) for _ in batch]
+    return [{"id": i, "values": v, "metadata": {"text": t}} for t, v, i in zip(batch, vectors, ids)]
+
+def legacy_ingest(texts, embeddings, index, embed_batch_size=100, upsert_batch_size=32):
+    # The embedding client splits into API-sized batches but sends them one after another.
+    vectors = []
+    for i in range(0, len(texts), embed_batch_size):
+        vectors.extend(embeddings.embed_documents(texts[i:i + embed_batch_size]))
+    for i in range(0, len(texts), upsert_batch_size):
+        index.upsert(vectors=_records(texts[i:i + upsert_batch_size], vectors[i:i + upsert_batch_size]))
+
+async def pipelined_ingest(texts, embeddings, index, batch_size, concurrency):
+    async def upsert(batch, vectors, ids):
+        await run_blocking(index.upsert, vectors=_records(batch, vectors, ids))
+
+    pipeline = IngestionPipeline(embeddings.aembed_documents, upsert, batch_size=batch_size, max_concurrency=concurrency)
+    await pipeline.run(texts)
+
+def main(chunks: int, call_latency: float, upsert_latency: float):
+    texts = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(chunks)]
+    print(f"chunks={chunks} embed_call_latency={call_latency}s upsert_latency={upsert_latency}s")
+
+    embeddings, index = FakeEmbeddings(call_latency=call_latency), FakeVectorIndex(upsert_latency)
+    start = time.perf_counter()
+    legacy_ingest(texts, embeddings, index)
+    elapsed = time.perf_counter() - start
+    print(f"{'legacy (serial)':<28} {chunks / elapsed:>10.1f} chunks/s")
+
+    for batch_size, concurrency in [(64, 1), (64, 4), (100, 8), (32, 8)]:
+        embeddings, index = FakeEmbeddings(call_latency=call_latency), FakeVectorIndex(upsert_latency)
+        start = time.perf_counter()
+        asyncio.run(pipelined_ingest(texts, embeddings, index, batch_size, concurrency))
+        elapsed = time.perf_counter() - start
+        label = f"pipeline batch={batch_size} c={concurrency}"
+        print(f"{label:<28} {chunks / elapsed:>10.1f} chunks/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--upsert-latency", type=float, default=0.03)
+    args = parser.parse_args()
+    try:
+        main(args.chunks, args.embed_latency, args.upsert_latency)
+    finally:
+        shutdown_executor()
@@ -0,0 +1,318 @@
+"""
+End-to-end load test: boots the FastAPI app from main.py in-process and
+drives a mixed workload (generate, streamed generate, upload, history,
+images) at increasing concurrency, reporting p50/p95/p99 latency and
+throughput per endpoint.
+
+Every external service is replaced by a local stand-in from fakes.py: Gemini
+by FakeChatModel (first-token and per-token latency), embeddings by
+FakeEmbeddings, Pinecone by the in-process LocalVectorBackend, Firestore by
+FakeFirestore and Pexels by MockPexelsServer. Auth goes through the real
+TokenVerifier with tokens minted by LocalTokenIssuer. The app is served by
+uvicorn on a loopback port in a background thread and driven over real HTTP
+with keep-alive, so streamed responses can be timed to the first token. The
+driver still shares the machine (and the GIL) with the app: absolute numbers
+are a lower bound, comparisons between runs are what matter.
+
+    python -m benchmarks.bench_load --levels 1 8 32 64 --requests 400
+    python -m benchmarks.bench_load --save baseline.json
+    python -m benchmarks.bench_load --compare baseline.json --tolerance 0.2
+
+With --compare, the run exits non-zero if any endpoint's p95 at any level is
+more than `tolerance` slower than in the saved baseline.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import threading
+from collections import defaultdict
+
+# Before main.py is imported: nothing is built at startup, nothing rate-limits the driver.
+os.environ.setdefault("LAZY_SERVICE_INIT", "1")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+os.environ.setdefault("RATE_LIMIT_BURST", "1000000")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("PEXELS_API_KEY", "bench")
+
+import httpx
+import uvicorn
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeFirestore, LocalTokenIssuer, MockPexelsServer
+
+DEFAULT_MIX = {"generate": 35, "generate_stream": 10, "history": 25, "images": 20, "upload": 10}
+WORDS = (
+    "growth strategy customer onboarding pricing launch retention platform analytics team "
+    "product roadmap market brand campaign revenue partner support quality security cloud"
+).split()
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def _document(rng: random.Random, sentences: int) -> str:
+    lines = [_sentence(rng, rng.randint(8, 16)) for _ in range(sentences)]
+    return "\n".join(lines)
+
+def _pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+class Environment:
+    """Boots the app against the fakes and seeds every user's knowledge base and history."""
+
+    def __init__(self, args, pexels_url: str):
+        from main import app
+        from services.registry import registry
+        from services.auth_service import PublicKeyCache, TokenVerifier
+        from services.vector_service import VectorService
+        from services.vector_backends import LocalVectorBackend
+        from services.image_service import ImageService
+        from services.knowledge_manifest import InMemoryManifestStore
+
+        self.app = app
+        self.registry = registry
+        os.environ["PEXELS_BASE_URL"] = pexels_url
+
+        rng = random.Random(args.seed)
+        self.issuer = LocalTokenIssuer()
+        self.users = [f"bench-user-{i}" for i in range(args.users)]
+        self.tokens = {uid: self.issuer.mint(uid) for uid in self.users}
+        self.topics = [_sentence(rng, rng.randint(3, 6)).rstrip(".") for _ in range(args.topics)]
+
+        answer = " ".join(_sentence(rng, 12) for _ in range(args.answer_sentences))
+        self.llm = FakeChatModel(responses=[answer], latency=args.llm_latency, token_latency=args.token_latency)
+        embeddings = FakeEmbeddings(size=args.dims, call_latency=args.embed_latency)
+        self.db = FakeFirestore(latency=args.db_latency)
+
+        admission = registry.admission
+        vs = VectorService(
+            backend=LocalVectorBackend(embeddings),
+            embeddings=embeddings,
+            search_limiter=admission.upstream("pinecone")
+        )
+        images = ImageService(
+            llm=FakeChatModel(responses=["city skyline"], latency=args.llm_latency / 4),
+            llm_limiter=admission.upstream("gemini"),
+            limiter=admission.upstream("pexels")
+        )
+        registry.override(
+            llm=self.llm,
+            vector_service=vs,
+            image_service=images,
+            db=self.db,
+            manifest_store=InMemoryManifestStore(),
+            token_verifier=TokenVerifier(self.issuer.project_id, PublicKeyCache(fetch=self.issuer.fetch_keys)),
+        )
+        self._rng = rng
+        self._args = args
+
+    async def seed(self):
+        vs = self.registry.vector_service
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for uid in self.users:
+            chunks = [_document(self._rng, 6) for _ in range(self._args.seed_chunks)]
+            await vs.aadd_texts(chunks, namespace=uid, ids=[f"{uid}-seed-{i}" for i in range(len(chunks))])
+            store = self.db.collections.setdefault("generations", {})
+            for i in range(self._args.seed_history):
+                store[f"{uid}-h{i:04d}"] = {
+                    "uid": uid,
+                    "topic": self._rng.choice(self.topics),
+                    "content_type": "Blog Post",
+                    "answer": "seeded",
+                    "preview": "seeded",
+                    "created_at": now - datetime.timedelta(minutes=i),
+                }
+
+class Driver:
+    def __init__(self, env: Environment, client: httpx.AsyncClient, mix: dict, seed: int):
+        self.env = env
+        self.client = client
+        self.ops = list(mix)
+        self.weights = [mix[name] for name in self.ops]
+        self.rng = random.Random(seed)
+        self.uploads = 0
+
+    def _headers(self, uid: str) -> dict:
+        return {"Authorization": f"Bearer {self.env.tokens[uid]}"}
+
+    def _generate_body(self) -> dict:
+        return {
+            "topic": self.rng.choice(self.env.topics),
+            "content_type": self.rng.choice(["Blog Post", "LinkedIn Post", "Email"]),
+            "tone": self.rng.choice(["Professional", "Casual"]),
+        }
+
+    async def generate(self, uid: str, samples: dict):
+        response = await self.client.post("/api/generate", json=self._generate_body(), headers=self._headers(uid))
+        return response.status_code
+
+    async def generate_stream(self, uid: str, samples: dict):
+        start = time.perf_counter()
+        status = None
+        async with self.client.stream("POST", "/api/generate/stream", json=self._generate_body(), headers=self._headers(uid)) as response:
+            status = response.status_code
+            first = True
+            async for line in response.aiter_lines():
+                if first and line:
+                    samples["generate_stream (first token)"].append(time.perf_counter() - start)
+                    first = False
+                if line and json.loads(line).get("type") == "error":
+                    status = 599
+        return status
+
+    async def history(self, uid: str, samples: dict):
+        response = await self.client.get("/api/history", params={"limit": 20}, headers=self._headers(uid))
+        return response.status_code
+
+    async def images(self, uid: str, samples: dict):
+        body = {"topic": self.rng.choice(self.env.topics)}
+        response = await self.client.post("/api/images", params={"page": self.rng.randint(1, 3)}, json=body)
+        return response.status_code
+
+    async def upload(self, uid: str, samples: dict):
+        self.uploads += 1
+        text = _document(self.rng, self.rng.randint(20, 60))
+        files = {"file": (f"notes-{self.uploads}.txt", text.encode("utf-8"), "text/plain")}
+        response = await self.client.post("/api/knowledge/upload", files=files, headers=self._headers(uid))
+        return response.status_code
+
+    async def run_level(self, concurrency: int, total: int) -> tuple[dict, dict, float]:
+        plan = [
+            (self.rng.choices(self.ops, self.weights)[0], self.rng.choice(self.env.users))
+            for _ in range(total)
+        ]
+        samples = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        queue = iter(plan)
+
+        async def worker():
+            for op, uid in queue:
+                start = time.perf_counter()
+                try:
+                    status = await getattr(self, op)(uid, samples)
+                except Exception as e:
+                    status = type(e).__name__
+                samples[op].append(time.perf_counter() - start)
+                statuses[op][status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, statuses, time.perf_counter() - start
+
+def _report(concurrency: int, samples: dict, statuses: dict, elapsed: float) -> dict:
+    total = sum(len(v) for op, v in samples.items() if op in statuses)
+    print(f"\nconcurrency={concurrency}  requests={total}  elapsed={elapsed:.2f}s  throughput={total / elapsed:.1f} r/s")
+    print(f"{'endpoint':<30} {'n':>5} {'ok':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  other statuses")
+    level = {"throughput": total / elapsed, "endpoints": {}}
+    for op in sorted(samples):
+        values = samples[op]
+        ok = sum(n for status, n in statuses.get(op, {}).items() if isinstance(status, int) and status < 400)
+        others = {str(s): n for s, n in statuses.get(op, {}).items() if not (isinstance(s, int) and s < 400)}
+        row = {"n": len(values), "p50": _pct(values, 0.5), "p95": _pct(values, 0.95), "p99": _pct(values, 0.99)}
+        level["endpoints"][op] = row
+        ok_cell = ok if op in statuses else "-"
+        print(f"{op:<30} {row['n']:>5} {ok_cell:>5} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f}  {others or ''}")
+    return level
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for level, current in results.items():
+        before = baseline.get(level)
+        if not before:
+            continue
+        for op, row in current["endpoints"].items():
+            old = before["endpoints"].get(op)
+            if old and row["p95"] > old["p95"] * (1 + tolerance):
+                regressions.append(f"c={level} {op}: p95 {old['p95']:.1f} -> {row['p95']:.1f} ms")
+    return regressions
+
+class AppServer:
+    """uvicorn serving `app` on a free loopback port from a background thread (lifespan included)."""
+
+    def __init__(self, app):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False))
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> str:
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self._thread.join()
+
+async def main(args) -> int:
+    with MockPexelsServer(latency=args.pexels_latency) as pexels:
+        env = Environment(args, pexels.url)
+        await env.seed()
+        limits = httpx.Limits(max_connections=max(args.levels) + 8, max_keepalive_connections=max(args.levels) + 8)
+        with AppServer(env.app) as base_url:
+            async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+                driver = Driver(env, client, args.mix, args.seed)
+                print(f"mix={args.mix} users={args.users} topics={args.topics} llm_latency={args.llm_latency}s "
+                      f"token_latency={args.token_latency}s embed_latency={args.embed_latency}s "
+                      f"db_latency={args.db_latency}s pexels_latency={args.pexels_latency}s")
+                if args.warmup:
+                    await driver.run_level(min(4, max(args.levels)), args.warmup)
+                results = {}
+                for concurrency in args.levels:
+                    samples, statuses, elapsed = await driver.run_level(concurrency, max(args.requests, concurrency))
+                    results[str(concurrency)] = _report(concurrency, samples, statuses, elapsed)
+
+                stats = (await client.get("/admission/stats")).json()
+                print(f"\nadmission: {json.dumps(stats['upstreams'])}")
+                print(f"llm calls={env.llm.calls} pexels requests={pexels.requests} firestore commits={env.db.commits}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = _compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (p95 more than {args.tolerance:.0%} slower than {args.compare}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nno p95 regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX, help="e.g. generate=50,history=50")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--topics", type=int, default=100)
+    parser.add_argument("--seed-chunks", type=int, default=50, help="knowledge-base chunks per user")
+    parser.add_argument("--seed-history", type=int, default=100, help="history items per user")
+    parser.add_argument("--answer-sentences", type=int, default=15)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per streamed word")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--pexels-latency", type=float, default=0.15)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from --save to check p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
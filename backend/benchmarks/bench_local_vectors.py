@@ -0,0 +1,70 @@
+"""
+LocalVectorBackend query latency vs. namespace size (exact cosine top-k via
+argpartition, compared with a full argsort), plus the cost of bulk upserts,
+compaction after deleting a third of the rows, and a flush + memory-mapped
+reload.
+
+    python -m benchmarks.bench_local_vectors --sizes 1000 10000 50000 --dim 768 --k 5
+"""
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+
+from services.vector_backends import LocalVectorBackend
+
+def _ms(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main(sizes: list[int], dim: int, k: int, queries: int):
+    rng = np.random.default_rng(0)
+    print(f"dim={dim} k={k} queries={queries}")
+    print(f"{'vectors':>8} {'upsert ms':>10} {'top-k ms':>9} {'argsort ms':>11} {'compact ms':>11} "
+          f"{'flush ms':>9} {'reload ms':>10} {'1st query ms':>13}")
+    for size in sizes:
+        path = tempfile.mkdtemp(prefix="local-vectors-")
+        try:
+            backend = LocalVectorBackend(embeddings=None, path=path)
+            vectors = rng.standard_normal((size, dim), dtype=np.float32)
+            ids = [f"chunk-{i}" for i in range(size)]
+            texts = [f"text {i}" for i in range(size)]
+            metadatas = [{} for _ in range(size)]
+
+            def upsert():
+                for start in range(0, size, 1000):
+                    backend.upsert(ids[start:start + 1000], texts[start:start + 1000],
+                                   vectors[start:start + 1000], metadatas[start:start + 1000], "bench")
+            upsert_ms = _ms(upsert)
+
+            probes = rng.standard_normal((queries, dim), dtype=np.float32)
+            topk_ms = _ms(lambda: [backend.search(q, k, "bench") for q in probes]) / queries
+
+            ns = backend._namespace("bench")
+            matrix = ns.matrix[:ns.size]
+            argsort_ms = _ms(lambda: [np.argsort(-(matrix @ q))[:k] for q in probes]) / queries
+
+            backend.delete(ids[: size // 3], "bench")
+            compact_ms = _ms(ns.compact)
+            backend.upsert(ids[: size // 3], texts[: size // 3], vectors[: size // 3], metadatas[: size // 3], "bench")
+
+            flush_ms = _ms(backend.flush)
+            reloaded = LocalVectorBackend(embeddings=None, path=path)
+            reload_ms = _ms(lambda: reloaded._namespace("bench"))
+            first_query_ms = _ms(lambda: reloaded.search(probes[0], k, "bench"))
+            print(f"{size:>8} {upsert_ms:>10.1f} {topk_ms:>9.3f} {argsort_ms:>11.3f} {compact_ms:>11.1f} "
+                  f"{flush_ms:>9.1f} {reload_ms:>10.1f} {first_query_ms:>13.2f}")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    main(args.sizes, args.dim, args.k, args.queries)
@@ -0,0 +1,100 @@
+"""
+Retrieval latency and recall@k on a fixture corpus of product documentation
+where each product is identified by a code like "QX-417": dense only (remote,
+Pinecone-like round trip), BM25 only, hybrid RRF with remote dense hits, and
+hybrid served entirely from the local index. Dense vectors come from the
+lexical HashingEmbeddings fake, so absolute dense recall is pessimistic; the
+point is how much exact-identifier matching BM25 adds, and what skipping the
+remote round trip saves.
+
+    python -m benchmarks.bench_retrieval --products 300 --queries 200 --k 5 --remote-latency 0.04
+"""
+import time
+import random
+import argparse
+import asyncio
+import statistics
+
+from benchmarks.fakes import HashingEmbeddings
+from services.sparse_index import BM25Index, reciprocal_rank_fusion
+
+ASPECTS = {
+    "warranty": "The warranty covers parts and labour for two years from purchase.",
+    "pricing": "Pricing starts at the standard tier with volume discounts for teams.",
+    "battery": "Battery life is rated for ten hours of continuous use.",
+    "installation": "Installation takes about fifteen minutes with the included bracket.",
+}
+FILLER = (
+    "our devices are designed for reliable everyday use in offices and homes "
+    "contact support for help with setup firmware updates and replacement parts"
+).split()
+
+def build_corpus(products: int, seed: int = 7):
+    rng = random.Random(seed)
+    codes = sorted({f"{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}-{rng.randint(100, 999)}"
+                    for _ in range(products)})
+    ids, texts, relevant = [], [], {}
+    for code in codes:
+        for aspect, sentence in ASPECTS.items():
+            doc_id = f"{code}:{aspect}"
+            filler = " ".join(rng.choice(FILLER) for _ in range(rng.randint(6, 14)))
+            ids.append(doc_id)
+            texts.append(f"{code} {aspect}. {sentence} {filler}")
+            relevant[(code, aspect)] = doc_id
+    return ids, texts, relevant
+
+def _recall(retrieved: list[str], relevant: str) -> float:
+    return 1.0 if relevant in retrieved else 0.0
+
+async def main(products: int, queries: int, k: int, remote_latency: float):
+    embeddings = HashingEmbeddings(size=384, call_latency=0, per_text_latency=0)
+    ids, texts, relevant = build_corpus(products)
+    index = BM25Index()
+    index.add(ids, texts, embeddings.embed_documents(texts))
+
+    rng = random.Random(11)
+    workload = [rng.choice(list(relevant)) for _ in range(queries)]
+    candidates = max(k * 4, 20)
+
+    async def dense_remote(query, vector):
+        await asyncio.sleep(remote_latency)
+        return [doc_id for doc_id, _ in index.dense_search(vector, k)]
+
+    async def sparse_only(query, vector):
+        return [doc_id for doc_id, _ in index.search(query, k)]
+
+    async def hybrid_remote(query, vector):
+        await asyncio.sleep(remote_latency)
+        dense = [doc_id for doc_id, _ in index.dense_search(vector, candidates)]
+        sparse = [doc_id for doc_id, _ in index.search(query, candidates)]
+        return [doc_id for doc_id, _ in reciprocal_rank_fusion([dense, sparse])[:k]]
+
+    async def hybrid_local(query, vector):
+        dense = [doc_id for doc_id, _ in index.dense_search(vector, candidates)]
+        sparse = [doc_id for doc_id, _ in index.search(query, candidates)]
+        return [doc_id for doc_id, _ in reciprocal_rank_fusion([dense, sparse])[:k]]
+
+    print(f"chunks={len(ids)} queries={queries} k={k} remote_latency={remote_latency}s")
+    print(f"{'strategy':<16} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, strategy in (("dense (remote)", dense_remote), ("bm25", sparse_only),
+                           ("hybrid (remote)", hybrid_remote), ("hybrid (local)", hybrid_local)):
+        hits, latencies = [], []
+        for code, aspect in workload:
+            query = f"What does the {aspect} look like for the {code}?"
+            vector = embeddings.embed_query(query)
+            start = time.perf_counter()
+            retrieved = await strategy(query, vector)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits.append(_recall(retrieved, relevant[(code, aspect)]))
+        latencies.sort()
+        print(f"{name:<16} {statistics.mean(hits):>9.3f} {latencies[len(latencies) // 2]:>8.2f} "
+              f"{latencies[int(len(latencies) * 0.95)]:>8.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--remote-latency", type=float, default=0.04)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.queries, args.k, args.remote_latency))
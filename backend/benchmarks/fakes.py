@@ -0,0 +1,387 @@
+"""
+Local stand-ins for the external services, shared by the benchmark scripts.
+None of these touch the network.
+"""
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+class FakeEmbeddings:
+    """
+    Deterministic embeddings with API-like latency: a fixed cost per call plus
+    a small cost per text, mimicking a batched embedding endpoint.
+    """
+
+    def __init__(self, size: int = 768, call_latency: float = 0.05, per_text_latency: float = 0.0005):
+        self.size = size
+        self.call_latency = call_latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+
+    def _vector(self, text: str) -> list[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [((digest[i % len(digest)] / 255.0) - 0.5) for i in range(self.size)]
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        self.calls += 1
+        time.sleep(self.call_latency + self.per_text_latency * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.call_latency + self.per_text_latency * len(texts))
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+class HashingEmbeddings(FakeEmbeddings):
+    """
+    FakeEmbeddings whose vectors carry lexical similarity: character trigrams
+    are feature-hashed into `size` buckets, so texts sharing words land close
+    together. Good enough to compare retrieval strategies on a fixture corpus.
+    """
+
+    def _vector(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        for word in text.casefold().split():
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                bucket = int.from_bytes(hashlib.blake2b(padded[i:i + 3].encode("utf-8"), digest_size=4).digest(), "little")
+                vector[bucket % self.size] += 1.0
+        return vector
+
+class FakeVectorIndex:
+    """Pinecone `Index` stand-in: blocking upserts with a fixed round-trip latency."""
+
+    def __init__(self, upsert_latency: float = 0.03):
+        self.upsert_latency = upsert_latency
+        self.namespaces = {}
+
+    def upsert(self, vectors: list[dict], namespace: str = ""):
+        time.sleep(self.upsert_latency)
+        store = self.namespaces.setdefault(namespace, {})
+        for record in vectors:
+            store[record["id"]] = record
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: list[str], namespace: str = ""):
+        time.sleep(self.upsert_latency)
+        store = self.namespaces.get(namespace, {})
+        for vector_id in ids:
+            store.pop(vector_id, None)
+
+class FakeChatModel(FakeListChatModel):
+    """
+    FakeListChatModel with a non-blocking per-call latency, so concurrent
+    ainvoke/abatch calls overlap the way real Gemini calls do.
+    """
+
+    latency: float = 0.2
+    # Streaming: `latency` is the time to the first token, then this much per word.
+    token_latency: float = 0.0
+    calls: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.token_latency * len(self.responses[self.i].split()))
+        text = self._call(messages, stop=stop)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        text = self._call(messages, stop=stop)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == len(words) - 1 else word + " "))
+
+class MockPexelsServer:
+    """
+    Local HTTP/1.1 (keep-alive) server answering Pexels /v1/search requests
+    with synthetic photos after a fixed latency. Use `url` as PEXELS_BASE_URL.
+    """
+
+    def __init__(self, latency: float = 0.15, port: int = 0):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from urllib.parse import urlparse, parse_qs
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                query = params.get("query", [""])[0]
+                page = int(params.get("page", ["1"])[0])
+                per_page = int(params.get("per_page", ["5"])[0])
+                server.requests += 1
+                time.sleep(server.latency)
+                photos = [
+                    {"src": {"medium": f"https://images.example/{query}/{page}/{i}.jpg"}}
+                    for i in range(per_page)
+                ]
+                body = json.dumps({"page": page, "per_page": per_page, "photos": photos}).encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the request (e.g. a cancelled prefetch).
+                    pass
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1/search"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id: str, data: dict | None):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+class FakeDocumentRef:
+    def __init__(self, db, collection: str, doc_id: str):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def _store(self):
+        return self._db.collections.setdefault(self._collection, {})
+
+    def get(self):
+        time.sleep(self._db.latency)
+        return FakeDocumentSnapshot(self.id, self._store.get(self.id))
+
+    def set(self, data: dict):
+        time.sleep(self._db.latency)
+        self._store[self.id] = dict(data)
+
+    def update(self, data: dict):
+        time.sleep(self._db.latency)
+        self._store[self.id].update(data)
+
+    def delete(self):
+        time.sleep(self._db.latency)
+        self._store.pop(self.id, None)
+
+    def collection(self, name: str):
+        return FakeCollection(self._db, f"{self._collection}/{self.id}/{name}")
+
+class FakeQuery:
+    """
+    The slice of the Firestore query API the routes use: equality `where`,
+    `order_by` (including "__name__"), `select`, `start_after`, `limit` and
+    `stream`, evaluated by scanning the collection.
+    """
+
+    def __init__(self, db, collection: str, filters=(), orders=(), cursor=None, max_results=None, fields=None):
+        self._db = db
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._cursor = cursor
+        self._limit = max_results
+        self._fields = fields
+
+    def _with(self, **changes):
+        state = {
+            "filters": self._filters, "orders": self._orders, "cursor": self._cursor,
+            "max_results": self._limit, "fields": self._fields,
+        }
+        state.update(changes)
+        return FakeQuery(self._db, self._collection, **state)
+
+    def where(self, field: str, op: str, value):
+        if op != "==":
+            raise NotImplementedError(f"FakeQuery only supports '==', not {op!r}")
+        return self._with(filters=self._filters + ((field, value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING"):
+        return self._with(orders=self._orders + ((field, direction == "DESCENDING"),))
+
+    def select(self, fields):
+        return self._with(fields=list(fields))
+
+    def start_after(self, values: dict):
+        return self._with(cursor=values)
+
+    def limit(self, count: int):
+        return self._with(max_results=count)
+
+    def _sort_key(self, doc_id: str, data: dict) -> tuple:
+        return tuple(doc_id if field == "__name__" else data.get(field) for field, _ in self._orders)
+
+    def _after_cursor(self, doc_id: str, data: dict) -> bool:
+        for (field, descending), value in zip(self._orders, self._sort_key(doc_id, data)):
+            bound = self._cursor.get(field)
+            if value != bound:
+                return value < bound if descending else value > bound
+        return False
+
+    def stream(self):
+        time.sleep(self._db.latency)
+        store = self._db.collections.get(self._collection, {})
+        rows = [
+            (doc_id, data) for doc_id, data in list(store.items())
+            if all(data.get(field) == value for field, value in self._filters)
+        ]
+        for position in reversed(range(len(self._orders))):
+            field, descending = self._orders[position]
+            rows.sort(key=lambda row: self._sort_key(*row)[position], reverse=descending)
+        if self._cursor is not None:
+            rows = [row for row in rows if self._after_cursor(*row)]
+        for doc_id, data in rows[:self._limit]:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeDocumentSnapshot(doc_id, data)
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name: str):
+        super().__init__(db, name)
+        self.name = name
+
+    def document(self, doc_id: str | None = None):
+        return FakeDocumentRef(self._db, self.name, doc_id or uuid.uuid4().hex[:20])
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data: dict):
+        self._ops.append(("set", ref, dict(data)))
+
+    def update(self, ref, data: dict):
+        self._ops.append(("update", ref, data))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None))
+
+    def commit(self):
+        time.sleep(self._db.latency)
+        self._db.commits += 1
+        if self._db.fail_next_commits > 0:
+            self._db.fail_next_commits -= 1
+            raise RuntimeError("injected commit failure")
+        for op, ref, data in self._ops:
+            store = self._db.collections.setdefault(ref._collection, {})
+            if op == "set":
+                store[ref.id] = data
+            elif op == "update":
+                store[ref.id].update(data)
+            else:
+                store.pop(ref.id, None)
+
+class FakeFirestore:
+    """
+    In-memory Firestore client stand-in (documents, subcollections, simple
+    queries, get_all, WriteBatch) with a fixed round-trip latency per RPC and
+    optional injected commit failures.
+    """
+
+    def __init__(self, latency: float = 0.02, fail_next_commits: int = 0):
+        self.latency = latency
+        self.fail_next_commits = fail_next_commits
+        self.collections = {}
+        self.commits = 0
+
+    def collection(self, name: str):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, refs, field_paths=None):
+        time.sleep(self.latency)
+        for ref in refs:
+            yield FakeDocumentSnapshot(ref.id, ref._store.get(ref.id))
+
+class LocalTokenIssuer:
+    """
+    Mints Firebase-shaped RS256 ID tokens with a locally generated key and
+    serves the matching certificate, standing in for Google's cert endpoint.
+    """
+
+    def __init__(self, project_id: str = "bench-project", kid: str = "bench-key"):
+        import datetime
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        self.project_id = project_id
+        self.kid = kid
+        self.fetches = 0
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.local")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self._key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(self._key, hashes.SHA256())
+        )
+        self._cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+    def fetch_keys(self, max_age: float = 3600.0):
+        """Drop-in for services.auth_service.fetch_firebase_certs."""
+        self.fetches += 1
+        return {self.kid: self._cert_pem}, max_age
+
+    def mint(self, uid: str, ttl_seconds: int = 3600, **overrides) -> str:
+        """Signed ID token for `uid`; `overrides` replace or add claims (e.g. aud, iss)."""
+        import jwt
+
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{self.project_id}",
+            "aud": self.project_id,
+            "sub": uid,
+            "auth_time": now,
+            "iat": now,
+            "exp": now + ttl_seconds,
+            **overrides,
+        }
+        return jwt.encode(claims, self._key, algorithm="RS256", headers={"kid": self.kid})
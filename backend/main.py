@@ -1,40 +1,72 @@
+import time
+
+_import_started = time.perf_counter()
+
 import os
 import json
+import asyncio
 import firebase_admin
+from contextlib import asynccontextmanager
 from firebase_admin import credentials, firestore
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from services.registry import registry
+from services.telemetry import TelemetryMiddleware, get_logger, metrics
+from services.executor import run_blocking, shutdown_executor
+from services.pdf_extraction import shutdown_pdf_pool
+from services.analytics import warm_up_analytics, shutdown_analytics_pool
+
+logger = get_logger("main")
+
 if not firebase_admin._apps:
     try:
         firebase_val = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
         
         if firebase_val:
             if firebase_val.strip().startswith("{"):
-                print("🔐 Detected JSON string in FIREBASE_SERVICE_ACCOUNT")
+                logger.info("Detected JSON string in FIREBASE_SERVICE_ACCOUNT")
                 cred_dict = json.loads(firebase_val)
                 cred = credentials.Certificate(cred_dict)
             else:
-                print(f"📂 Detected path string in FIREBASE_SERVICE_ACCOUNT: {firebase_val}")
+                logger.info("Detected path string in FIREBASE_SERVICE_ACCOUNT: %s", firebase_val)
                 cred = credentials.Certificate(firebase_val)
 
             firebase_admin.initialize_app(cred)
-            print("✅ Firebase initialized successfully from ENV")
+            logger.info("Firebase initialized from ENV")
             
         else:
-            print("❌ ERROR: FIREBASE_SERVICE_ACCOUNT environment variable is missing!")
+            logger.error("FIREBASE_SERVICE_ACCOUNT environment variable is missing")
 
     except Exception as e:
-        print(f"❌ Firebase Init Failed: {e}")
+        logger.error("Firebase init failed: %s", e)
         if firebase_val:
-            print(f"   Value causing error (first 50 chars): {firebase_val[:50]}...")
+            logger.error("Value causing error (first 50 chars): %s...", firebase_val[:50])
+
+with registry.timed("import_routes"):
+    from routes import generate, images, history, knowledge, analytics
 
-from routes import generate, images, history, knowledge
+registry.timings["import_total"] = round((time.perf_counter() - _import_started) * 1000, 2)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # LAZY_SERVICE_INIT=1 defers client construction to the first request that needs it.
+    if os.getenv("LAZY_SERVICE_INIT", "0") != "1":
+        await asyncio.gather(registry.warm_up(), warm_up_analytics())
+        logger.info("Startup timings (ms): %s", registry.timings)
+    yield
+    # Off the loop: queued ingestion jobs still need it to finish their upserts.
+    await run_blocking(knowledge.job_queue.shutdown)
+    shutdown_pdf_pool()
+    shutdown_analytics_pool()
+    await registry.aclose()
+    shutdown_executor(wait=False)
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,11 +74,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+# Outermost, so request timings include CORS handling and every response carries X-Request-ID.
+app.add_middleware(TelemetryMiddleware)
 app.include_router(generate.router, prefix="/api")
 app.include_router(images.router, prefix="/api")
 app.include_router(history.router, prefix="/api")
 app.include_router(knowledge.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
 
 @app.get("/")
 def read_root():
@@ -54,4 +90,20 @@ def read_root():
 
 @app.get("/ping")
 def ping():
-    return {"status": "alive"}
\ No newline at end of file
+    return {"status": "alive"}
+
+@app.get("/startup")
+def startup_timings():
+    return {"timings_ms": registry.timings}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admission/stats")
+def admission_stats():
+    return registry.admission.stats()
+
+@app.get("/resilience/stats")
+def resilience_stats():
+    return registry.resilience.stats()
\ No newline at end of file
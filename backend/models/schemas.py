@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class GenerateRequest(BaseModel):
@@ -9,17 +9,33 @@ class GenerateRequest(BaseModel):
     target_audience: Optional[str] = Field(default="general audience")
     language: str = Field(default="English", description="Language of Content")
 
+class GenerateBatchRequest(BaseModel):
+    variants: List[GenerateRequest] = Field(..., min_length=1, max_length=10)
+
 class AnalyticsData(BaseModel):
     word_count: int
     reading_time: int
     readability_score: float
     sentiment: str
 
+class ContextStats(BaseModel):
+    retrieved_chunks: int = 0
+    used_chunks: int = 0
+    dropped_low_score: int = 0
+    dropped_duplicate: int = 0
+    truncated_chunks: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    token_budget: int = 0
+    # True when retrieval failed and the answer was generated without context.
+    degraded: bool = False
+
 class GenerateResponse(BaseModel):
     answer: str
     topic: str 
     content_type: Optional[str] = "blog post"
     analytics: Optional[AnalyticsData] = None
+    context: Optional[ContextStats] = None
 
 class HistoryItem(BaseModel):
     id: str
@@ -27,6 +43,26 @@ class HistoryItem(BaseModel):
     content_type: str
     created_at: datetime
     answer: str
+    analytics: Optional[AnalyticsData] = None
+
+class HistorySummary(BaseModel):
+    id: str
+    topic: str
+    content_type: str
+    created_at: datetime
+    preview: str = ""
+
+class HistoryPage(BaseModel):
+    items: List[HistorySummary]
+    next_cursor: Optional[str] = None
+
+class AnalyticsBatchRequest(BaseModel):
+    texts: List[str] = Field(default_factory=list, max_length=200)
+    history_ids: List[str] = Field(default_factory=list, max_length=200, description="Re-score these history items and store the result")
+
+class AnalyticsBatchResponse(BaseModel):
+    results: List[AnalyticsData] = []
+    history: Dict[str, AnalyticsData] = {}
 
 class ImageRequest(BaseModel):
     topic: str
@@ -39,5 +75,15 @@ class RegenerateRequest(BaseModel):
     instruction: str  
     context: Optional[str] = "" 
 
+class RegenerateSelection(BaseModel):
+    selected_text: str
+    instruction: Optional[str] = Field(default=None, description="Overrides the batch instruction for this selection")
+
+class RegenerateBatchRequest(BaseModel):
+    selections: List[RegenerateSelection] = Field(..., min_length=1, max_length=20)
+    instruction: str
+    context: Optional[str] = Field(default="", description="The full document the selections come from")
+
 class RegenerateResponse(BaseModel):
-    updated_text: str
\ No newline at end of file
+    updated_text: str
+    cached: bool = False
\ No newline at end of file
@@ -1,13 +1,15 @@
 import os
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
 from services.vector_service import VectorService
+from services.chains import build_chains
 
 load_dotenv()
 
+def format_docs(docs) -> str:
+    return "\n\n".join(d.page_content for d in docs)
+
 def main():
     llm = ChatGoogleGenerativeAI(
         model="gemini-2.5-flash",
@@ -18,19 +20,11 @@ def main():
     
     retriever = vs.vector_store.as_retriever(search_kwargs={"k": 3})
 
-    template = """You are a helpful assistant. Answer the question based ONLY on the following context:
-
-    {context}
-
-    Question: {question}
-    """
-    prompt = ChatPromptTemplate.from_template(template)
+    chains = build_chains(llm)
 
     rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+        | chains.qa
     )
 
     user_question = "What database is Siddharth using?"
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Depends
+from models.schemas import AnalyticsBatchRequest, AnalyticsBatchResponse
+from services.executor import run_blocking
+from services.analytics import compute_analytics_many
+from services.auth_service import get_current_user
+from services.registry import get_db
+from services.telemetry import get_logger
+
+router = APIRouter()
+logger = get_logger("analytics")
+
+def _load_answers(db, uid: str, doc_ids: list[str]) -> dict:
+    refs = [db.collection("generations").document(doc_id) for doc_id in doc_ids]
+    answers = {}
+    for doc in db.get_all(refs, field_paths=["uid", "answer"]):
+        data = doc.to_dict() if doc.exists else None
+        if data and data.get("uid") == uid:
+            answers[doc.id] = data.get("answer", "")
+    return answers
+
+def _store_analytics(db, scored: dict):
+    batch = db.batch()
+    for doc_id, analytics in scored.items():
+        batch.update(db.collection("generations").document(doc_id), {"analytics": analytics.model_dump()})
+    batch.commit()
+
+@router.post("/analytics/batch", response_model=AnalyticsBatchResponse)
+async def analyze_batch(
+    request: AnalyticsBatchRequest,
+    user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """
+    Scores raw `texts` and/or re-scores the caller's `history_ids`. Re-scored
+    history items get their stored analytics updated in one batched write;
+    ids that don't exist or belong to someone else are skipped.
+    """
+    try:
+        answers = {}
+        if request.history_ids:
+            answers = await run_blocking(_load_answers, db, user["uid"], list(dict.fromkeys(request.history_ids)))
+
+        scored = await compute_analytics_many(request.texts + list(answers.values()))
+        results = scored[:len(request.texts)]
+        history = dict(zip(answers.keys(), scored[len(request.texts):]))
+
+        if history:
+            await run_blocking(_store_analytics, db, history)
+
+        return AnalyticsBatchResponse(results=results, history=history)
+    except Exception as e:
+        logger.error("Analytics error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
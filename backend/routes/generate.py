@@ -1,185 +1,614 @@
 import os
+import re
 import json
+import asyncio
 import datetime
-import textstat
-from textblob import TextBlob
-from fastapi import APIRouter, HTTPException, Header, Depends
-from firebase_admin import auth, firestore
-from models.schemas import GenerateRequest, GenerateResponse, AnalyticsData, RegenerateRequest, RegenerateResponse
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from services.vector_service import VectorService
-from google.oauth2 import service_account
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import nullcontext
+from models.schemas import (
+    GenerateRequest, GenerateBatchRequest, GenerateResponse, AnalyticsData, ContextStats,
+    RegenerateRequest, RegenerateBatchRequest, RegenerateResponse
+)
+from services.executor import run_blocking
+from services.analytics import compute_analytics
+from services.context_assembly import assemble_context, context_window
+from services.admission import AdmissionRejected, admit_user, admit_client, get_admission, http_error
+from services.resilience import get_resilience
+from services.telemetry import get_logger, span
+from services.registry import get_chains, get_vector_service, get_db, get_generation_cache, get_history_writer, get_regeneration_cache
+from routes.history import make_preview
 
 router = APIRouter()
-db = firestore.client()
+logger = get_logger("generate")
 
-async def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid header")
-    token = authorization.split("Bearer ")[1]
-    try:
-        return auth.verify_id_token(token)
-    except Exception as e:
-        print(f"Auth Error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-try:
-    vs = VectorService()
-
-    google_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    if google_creds_json:
-        creds_dict = json.loads(google_creds_json)
-        creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash", 
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            credentials=creds
-        )
-    else:
-        print("❌ GOOGLE_APPLICATION_CREDENTIALS missing for Gemini")
-        llm = None
-
-except Exception as e:
-    print(f"Startup Error: {e}")
-    vs = None
+# Upper bounds on concurrent LLM calls for a single /generate/batch or /regenerate/batch request.
+GENERATION_BATCH_CONCURRENCY = int(os.getenv("GENERATION_BATCH_CONCURRENCY", "4"))
+REGENERATE_BATCH_CONCURRENCY = int(os.getenv("REGENERATE_BATCH_CONCURRENCY", "4"))
+# How much of the surrounding document a rewrite sees.
+REGENERATE_CONTEXT_TOKENS = int(os.getenv("REGENERATE_CONTEXT_TOKENS", "600"))
+
+def _build_context(relevant_docs, degraded: bool = False) -> tuple[str, ContextStats]:
+    """Dedupes, filters and packs retrieved chunks into the prompt's token budget."""
+    with span("context_assembly"):
+        context_text, stats = assemble_context(relevant_docs)
+    if stats["retrieved_chunks"]:
+        logger.debug("Context: %s/%s chunks, %s -> %s tokens",
+                     stats["used_chunks"], stats["retrieved_chunks"], stats["tokens_before"], stats["tokens_after"])
+    return context_text, ContextStats(**stats, degraded=degraded)
+
+def _retrieval_failed(policy, error: Exception):
+    """Retrieved context only enriches the prompt: when embedding or search fails, generate without it."""
+    logger.warning("Retrieval failed, generating without context: %s", error)
+    if policy:
+        policy.record_fallback()
+
+async def _lookup_or_retrieve(vs, cache, request: GenerateRequest, user: dict):
+    """
+    Checks the exact cache tier, then embeds the topic once and reuses that
+    vector for both the semantic tier and hybrid retrieval.
+    Returns (cached_payload, context_text, context_stats, embedding, kb_version).
+    """
+    namespace = user['uid']
+    version = await cache.akb_version(namespace) if cache else 0
+    if cache:
+        with span("cache_lookup"):
+            cached = await cache.aget_exact(request, namespace, version)
+        if cached:
+            return cached, "", None, None, version
+
+    embedding = None
+    relevant_docs = []
+    degraded = False
+    if vs:
+        try:
+            with span("embed"):
+                embedding = await vs.aembed_query(request.topic)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            _retrieval_failed(vs.embed_policy, e)
+            degraded = True
+    if embedding is not None:
+        if cache:
+            with span("cache_lookup"):
+                cached = cache.get_semantic(request, namespace, version, embedding)
+            if cached:
+                return cached, "", None, embedding, version
+        try:
+            with span("retrieval"):
+                relevant_docs = await vs.ahybrid_search(request.topic, embedding, namespace=namespace, k=5)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            _retrieval_failed(vs.search_policy, e)
+            degraded = True
+
+    if cache:
+        cache.record_miss()
+    context_text, context_stats = _build_context(relevant_docs, degraded)
+    return None, context_text, context_stats, embedding, version
+
+def _build_chain_inputs(request: GenerateRequest, context_text: str) -> dict:
+    return {
+        "context": context_text,
+        "topic": request.topic,
+        "content_type": request.content_type,
+        "tone": request.tone, 
+        "target_audience": request.target_audience,
+        "language": request.language
+    }
+
+def _generation_record(request: GenerateRequest, user: dict, result: str, analytics: AnalyticsData) -> dict:
+    return {
+        "uid": user["uid"],     
+        "topic": request.topic,
+        "content_type": request.content_type,
+        "tone": request.tone,
+        "language": request.language, 
+        "answer": result,
+        "preview": make_preview(result),
+        "analytics": analytics.model_dump(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc)
+    }
+
+async def _persist_generation(db, writer, request: GenerateRequest, user: dict, result: str, analytics: AnalyticsData) -> str:
+    """Hands the record to the write-behind writer, or writes it inline if there is none or it is full."""
+    with span("persist"):
+        doc_ref = db.collection("generations").document()
+        record = _generation_record(request, user, result, analytics)
+        if not (writer and writer.submit(doc_ref, record)):
+            await run_blocking(doc_ref.set, record)
+    return doc_ref.id
+
+def _save_generations(db, records: list[tuple]):
+    """Writes (doc_ref, record) pairs in a single Firestore batch."""
+    batch = db.batch()
+    for doc_ref, record in records:
+        batch.set(doc_ref, record)
+    batch.commit()
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
 
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_content(
     request: GenerateRequest, 
-    user: dict = Depends(get_current_user) 
+    user: dict = Depends(admit_user),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    vs = Depends(get_vector_service),
+    db = Depends(get_db),
+    cache = Depends(get_generation_cache),
+    writer = Depends(get_history_writer),
+    resilience = Depends(get_resilience)
 ):
-    if not llm:
+    if not chains:
         raise HTTPException(status_code=500, detail="LLM not initialized")
 
-    print(f"\n🚀 GENERATION REQUEST")
-    print(f"Topic: {request.topic}")
-    print(f"User: {user['uid']}")
+    logger.info("Generation request", extra={"uid": user["uid"], "topic": request.topic})
+    gemini = resilience.policy("gemini")
 
     try:
-        relevant_docs = []
-        if vs:
-            retriever = vs.get_retriever(namespace=user['uid'], k=5)
-            relevant_docs = retriever.invoke(request.topic)
-        
-        context_text = "\n\n".join([d.page_content for d in relevant_docs])
-        
-        template = """
-        You are an expert AI content creator.
-        
-        === RETRIEVED CONTEXT (From User's Knowledge Base) ===
-        {context}
-        ======================================================
-        
-        USER REQUEST:
-        Topic: {topic}
-        Tone / Style Description: {tone}
-        Format: {content_type}
-        Audience: {target_audience}
-        Language: {language}
-
-        STRICT INSTRUCTIONS:
-        1. **IF the requested Format is 'LLM System Prompt' or 'AI Prompt'**:
-           - Your task is to act as an Elite Prompt Engineer.
-           - DO NOT write the actual content. 
-           - Write a system prompt.
-           
-        2. **IF the requested Format is 'Midjourney Image Prompt'**:
-           - Output a list of 3-5 highly descriptive image prompts.
-           
-        3. **FOR ALL OTHER FORMATS**:
-           - Write the actual content in {language}.
-           - Structure it accordingly.
-        
-        4. **Handling Tone**:
-           - If a custom persona is provided in 'Tone', MIMIC it exactly.
-           - Otherwise, use the adjective provided.
-        
-        5. **Context Usage**:
-           - Use the 'RETRIEVED CONTEXT' to add factual accuracy and specific company details.
-           - If the context is empty or irrelevant, ignore it.
+        cached, context_text, context_stats, embedding, version = await _lookup_or_retrieve(vs, cache, request, user)
 
-        6. **Formatting**:
-           - NO PREAMBLE. Start directly with the content.
-        """
-        
-        prompt = ChatPromptTemplate.from_template(template)
-        chain = prompt | llm | StrOutputParser()
-        
-        result = chain.invoke({
-            "context": context_text,
-            "topic": request.topic,
-            "content_type": request.content_type,
-            "tone": request.tone, 
-            "target_audience": request.target_audience,
-            "language": request.language
-        })
+        if cached:
+            logger.info("Served from generation cache")
+            result = cached["answer"]
+            analytics_obj = AnalyticsData(**cached["analytics"])
+        else:
+            # Fail fast while Gemini's breaker is open instead of queueing for a slot.
+            gemini.check()
+            with span("admission_wait"):
+                slot = await admission.upstream("gemini").acquire()
+            try:
+                chain = chains.generation_for(request.content_type)
+                inputs = _build_chain_inputs(request, context_text)
+                with span("llm"):
+                    result = await gemini.call(lambda: chain.ainvoke(inputs), hedge_guard=admission.upstream("gemini"))
+            finally:
+                slot.release()
 
-        word_count = len(result.split())
-        reading_time = max(1, round(word_count / 200)) 
-        readability = textstat.flesch_reading_ease(result)
-        
-        blob = TextBlob(result) 
-        polarity = blob.sentiment.polarity
-        if polarity > 0.1: sentiment = "Positive"
-        elif polarity < -0.1: sentiment = "Negative"
-        else: sentiment = "Neutral"
-
-        analytics_obj = AnalyticsData(
-            word_count=word_count,
-            reading_time=reading_time,
-            readability_score=readability,
-            sentiment=sentiment
-        )
+            with span("analytics"):
+                analytics_obj = await compute_analytics(result)
+            # An answer generated without its context is not worth reusing.
+            if cache and not context_stats.degraded:
+                await cache.aput(request, user['uid'], version, {"answer": result, "analytics": analytics_obj.model_dump()}, embedding)
+
+        await _persist_generation(db, writer, request, user, result, analytics_obj)
+
+        return GenerateResponse(answer=result, topic=request.topic,content_type=request.content_type, analytics=analytics_obj, context=context_stats)
+
+    except Exception as e:
+        logger.error("Generation failed: %s", e)
+        raise http_error(e)
+
+@router.post("/generate/stream")
+async def generate_content_stream(
+    request: GenerateRequest, 
+    user: dict = Depends(admit_user),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    vs = Depends(get_vector_service),
+    db = Depends(get_db),
+    cache = Depends(get_generation_cache),
+    writer = Depends(get_history_writer),
+    resilience = Depends(get_resilience)
+):
+    """
+    Streams the generation as NDJSON events: one `token` event per chunk
+    produced by the chain, then a final `done` event with analytics and the
+    Firestore document id (or an `error` event if generation fails midway).
+    """
+    if not chains:
+        raise HTTPException(status_code=500, detail="LLM not initialized")
+
+    logger.info("Streaming generation request", extra={"uid": user["uid"], "topic": request.topic})
+    gemini = resilience.policy("gemini")
+
+    try:
+        cached, context_text, context_stats, embedding, version = await _lookup_or_retrieve(vs, cache, request, user)
+        # Queue for Gemini before the response starts, so shedding is still a plain 503.
+        if not cached:
+            gemini.check()
+        with span("admission_wait"):
+            slot = None if cached else await admission.upstream("gemini").acquire()
+    except Exception as e:
+        logger.error("Streaming generation failed: %s", e)
+        raise http_error(e)
+
+    async def event_stream():
+        parts = []
+        try:
+            if cached:
+                result = cached["answer"]
+                analytics_obj = AnalyticsData(**cached["analytics"])
+                yield _ndjson({"type": "token", "content": result})
+            else:
+                chain = chains.generation_for(request.content_type)
+                inputs = _build_chain_inputs(request, context_text)
+                with span("llm"):
+                    async for token in gemini.stream(lambda: chain.astream(inputs)):
+                        if not token:
+                            continue
+                        parts.append(token)
+                        yield _ndjson({"type": "token", "content": token})
+
+                slot.release()
+                result = "".join(parts)
+                with span("analytics"):
+                    analytics_obj = await compute_analytics(result)
+                if cache and not context_stats.degraded:
+                    await cache.aput(request, user['uid'], version, {"answer": result, "analytics": analytics_obj.model_dump()}, embedding)
+
+            doc_id = await _persist_generation(db, writer, request, user, result, analytics_obj)
+
+            yield _ndjson({
+                "type": "done",
+                "id": doc_id,
+                "topic": request.topic,
+                "content_type": request.content_type,
+                "cached": bool(cached),
+                "analytics": analytics_obj.model_dump(),
+                "context": context_stats.model_dump() if context_stats else None
+            })
+        except Exception as e:
+            logger.error("Streaming error: %s", e)
+            yield _ndjson({"type": "error", "detail": str(e)})
+        finally:
+            if slot:
+                slot.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Covers a client that disconnects before the stream is ever started.
+        background=BackgroundTask(slot.release) if slot else None
+    )
+
+async def _retrieve_topic(vs, namespace: str, topic: str):
+    """(embedding, context_text, context_stats) for one topic; shared by every variant of it in a batch."""
+    if not vs:
+        return None, "", None
+    try:
+        with span("embed"):
+            embedding = await vs.aembed_query(topic)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        _retrieval_failed(vs.embed_policy, e)
+        return (None, *_build_context([], degraded=True))
+    try:
+        with span("retrieval"):
+            relevant_docs = await vs.ahybrid_search(topic, embedding, namespace=namespace, k=5)
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        _retrieval_failed(vs.search_policy, e)
+        return (embedding, *_build_context([], degraded=True))
+    return (embedding, *_build_context(relevant_docs))
 
+async def _invoke_as_completed(runnables: list, inputs: list, max_concurrency: int, limiter=None, policy=None):
+    """
+    Like Runnable.abatch_as_completed(return_exceptions=True), but each input
+    may go to a different chain, every call also holds a `limiter` slot, and
+    goes through `policy` (a ResiliencePolicy) if one is given.
+    Yields (position, output_or_exception).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(position: int):
+        def invoke():
+            return runnables[position].ainvoke(inputs[position])
+
+        async with semaphore:
+            try:
+                async with limiter.slot() if limiter else nullcontext():
+                    if policy:
+                        return position, await policy.call(invoke, hedge_guard=limiter)
+                    return position, await invoke()
+            except Exception as e:
+                return position, e
+
+    tasks = [asyncio.ensure_future(run(position)) for position in range(len(inputs))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.post("/generate/batch")
+async def generate_content_batch(
+    request: GenerateBatchRequest,
+    user: dict = Depends(admit_user),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    vs = Depends(get_vector_service),
+    db = Depends(get_db),
+    cache = Depends(get_generation_cache),
+    writer = Depends(get_history_writer),
+    resilience = Depends(get_resilience)
+):
+    """
+    Generates several variants (formats, tones, languages) in one call.
+    Context is retrieved once per distinct topic, the LLM calls run
+    concurrently (at most GENERATION_BATCH_CONCURRENCY at a time), and each
+    variant is streamed back as an NDJSON `result` (or `error`) event as soon
+    as it finishes, tagged with its `index` in the request. All history
+    documents are handed to the write-behind writer (or written in one
+    Firestore batch without it) before the final `done` event.
+    """
+    if not chains:
+        raise HTTPException(status_code=500, detail="LLM not initialized")
+
+    variants = request.variants
+    namespace = user['uid']
+    logger.info("Batch generation request", extra={"uid": namespace, "variants": len(variants)})
+
+    gemini = resilience.policy("gemini")
+
+    try:
+        # admit_user charged the first variant.
+        admission.charge_batch(f"uid:{namespace}", len(variants))
+        version = await cache.akb_version(namespace) if cache else 0
+        cached = {}
+        if cache:
+            for i, variant in enumerate(variants):
+                hit = await cache.aget_exact(variant, namespace, version)
+                if hit:
+                    cached[i] = hit
+
+        topics = list(dict.fromkeys(v.topic for i, v in enumerate(variants) if i not in cached))
+        retrieved = dict(zip(topics, await asyncio.gather(*(_retrieve_topic(vs, namespace, t) for t in topics))))
+
+        pending = []
+        for i, variant in enumerate(variants):
+            if i in cached:
+                continue
+            embedding = retrieved[variant.topic][0]
+            hit = cache.get_semantic(variant, namespace, version, embedding) if cache and embedding else None
+            if hit:
+                cached[i] = hit
+            else:
+                pending.append(i)
+                if cache:
+                    cache.record_miss()
+        if pending:
+            gemini.check()
+    except Exception as e:
+        logger.error("Batch generation failed: %s", e)
+        raise http_error(e)
+
+    inputs = [_build_chain_inputs(variants[i], retrieved[variants[i].topic][1]) for i in pending]
+
+    async def finish(i: int, result: str, analytics_obj: AnalyticsData, from_cache: bool, records: list):
+        context_stats = None if from_cache else retrieved[variants[i].topic][2]
         doc_ref = db.collection("generations").document()
-        doc_ref.set({
-            "uid": user["uid"],     
-            "topic": request.topic,
-            "content_type": request.content_type,
-            "tone": request.tone,
-            "language": request.language, 
+        records.append((doc_ref, _generation_record(variants[i], user, result, analytics_obj)))
+        return _ndjson({
+            "type": "result",
+            "index": i,
+            "id": doc_ref.id,
+            "topic": variants[i].topic,
+            "content_type": variants[i].content_type,
+            "tone": variants[i].tone,
+            "language": variants[i].language,
             "answer": result,
-            "created_at": datetime.datetime.now(datetime.timezone.utc)
+            "cached": from_cache,
+            "analytics": analytics_obj.model_dump(),
+            "context": context_stats.model_dump() if context_stats else None
         })
 
-        return GenerateResponse(answer=result, topic=request.topic,content_type=request.content_type, analytics=analytics_obj)
+    async def event_stream():
+        records = []
+        failed = 0
+        for i, hit in cached.items():
+            yield await finish(i, hit["answer"], AnalyticsData(**hit["analytics"]), True, records)
 
-    except Exception as e:
-        print(e)
-        raise HTTPException(status_code=500, detail=str(e))
+        if inputs:
+            chain_for = [chains.generation_for(variants[i].content_type) for i in pending]
+            async for position, output in _invoke_as_completed(
+                chain_for, inputs, GENERATION_BATCH_CONCURRENCY, admission.upstream("gemini"), gemini
+            ):
+                i = pending[position]
+                if isinstance(output, Exception):
+                    logger.warning("Batch variant %s failed: %s", i, output)
+                    failed += 1
+                    yield _ndjson({"type": "error", "index": i, "detail": str(output)})
+                    continue
+                try:
+                    analytics_obj = await compute_analytics(output)
+                except Exception as e:
+                    failed += 1
+                    yield _ndjson({"type": "error", "index": i, "detail": str(e)})
+                    continue
+                context_stats = retrieved[variants[i].topic][2]
+                if cache and not (context_stats and context_stats.degraded):
+                    embedding = retrieved[variants[i].topic][0]
+                    await cache.aput(variants[i], namespace, version, {"answer": output, "analytics": analytics_obj.model_dump()}, embedding)
+                yield await finish(i, output, analytics_obj, False, records)
+
+        try:
+            inline = [(ref, record) for ref, record in records if not (writer and writer.submit(ref, record))]
+            if inline:
+                await run_blocking(_save_generations, db, inline)
+            yield _ndjson({"type": "done", "saved": len(records), "failed": failed})
+        except Exception as e:
+            logger.error("Batch save error: %s", e)
+            yield _ndjson({"type": "error", "detail": f"Failed to save history: {e}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/generate/cache/stats")
+async def generation_cache_stats(cache = Depends(get_generation_cache)):
+    return await run_blocking(cache.snapshot) if cache else {}
+
+def _regenerate_inputs(selected_text: str, instruction: str, document: str) -> dict:
+    # The editor sends its HTML; markup only costs tokens and hides the selection from context_window.
+    document = re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", document or ""))
+    return {
+        "selected_text": selected_text,
+        "instruction": instruction,
+        "context": context_window(document, selected_text, REGENERATE_CONTEXT_TOKENS) or "(none)",
+    }
 
 @router.post("/regenerate", response_model=RegenerateResponse)
-async def regenerate_selection(request: RegenerateRequest):
-    if not llm:
+async def regenerate_selection(
+    request: RegenerateRequest,
+    client: str = Depends(admit_client),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    memo = Depends(get_regeneration_cache),
+    resilience = Depends(get_resilience)
+):
+    if not chains:
         raise HTTPException(status_code=500, detail="LLM not initialized")
         
-    print(f"Regenerating text with instruction: {request.instruction}")
+    logger.info("Regenerating text", extra={"instruction": request.instruction})
     
     try:
-        template = """
-        You are a professional editor.
-        TASK: Rewrite the 'Selected Text' according to the 'Instruction'.
-        
-        Selected Text: "{selected_text}"
-        Instruction: {instruction}
-        
-        Return ONLY the rewritten text. Do not add quotes or explanations.
-        """
-        
-        prompt = ChatPromptTemplate.from_template(template)
-        chain = prompt | llm | StrOutputParser()
-        
-        result = chain.invoke({
-            "selected_text": request.selected_text,
-            "instruction": request.instruction
-        })
+        inputs = _regenerate_inputs(request.selected_text, request.instruction, request.context)
+        cached = await memo.aget(request.selected_text, request.instruction, inputs["context"]) if memo else None
+        if cached is not None:
+            return RegenerateResponse(updated_text=cached, cached=True)
+
+        gemini = resilience.policy("gemini")
+        gemini.check()
+        async with admission.upstream("gemini").slot():
+            with span("llm"):
+                result = await gemini.call(lambda: chains.regenerate.ainvoke(inputs), hedge_guard=admission.upstream("gemini"))
+        if memo:
+            await memo.aput(request.selected_text, request.instruction, inputs["context"], result)
         
         return RegenerateResponse(updated_text=result)
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise http_error(e)
+
+@router.post("/regenerate/stream")
+async def regenerate_selection_stream(
+    request: RegenerateRequest,
+    client: str = Depends(admit_client),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    memo = Depends(get_regeneration_cache),
+    resilience = Depends(get_resilience)
+):
+    """
+    Streams the rewrite as NDJSON `token` events, then a `done` event with
+    the full `updated_text`. Memoized rewrites arrive as a single token.
+    """
+    if not chains:
+        raise HTTPException(status_code=500, detail="LLM not initialized")
+
+    logger.info("Regenerating text (stream)", extra={"instruction": request.instruction})
+    inputs = _regenerate_inputs(request.selected_text, request.instruction, request.context)
+    cached = await memo.aget(request.selected_text, request.instruction, inputs["context"]) if memo else None
+    gemini = resilience.policy("gemini")
+    if cached is None:
+        gemini.check()
+    slot = None if cached is not None else await admission.upstream("gemini").acquire()
+
+    async def event_stream():
+        try:
+            if cached is not None:
+                result = cached
+                yield _ndjson({"type": "token", "content": result})
+            else:
+                parts = []
+                async for token in gemini.stream(lambda: chains.regenerate.astream(inputs)):
+                    if not token:
+                        continue
+                    parts.append(token)
+                    yield _ndjson({"type": "token", "content": token})
+                slot.release()
+                result = "".join(parts)
+                if memo:
+                    await memo.aput(request.selected_text, request.instruction, inputs["context"], result)
+            yield _ndjson({"type": "done", "updated_text": result, "cached": cached is not None})
+        except Exception as e:
+            logger.error("Regenerate streaming error: %s", e)
+            yield _ndjson({"type": "error", "detail": str(e)})
+        finally:
+            if slot:
+                slot.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.release) if slot else None
+    )
+
+@router.post("/regenerate/batch")
+async def regenerate_selections_batch(
+    request: RegenerateBatchRequest,
+    client: str = Depends(admit_client),
+    admission = Depends(get_admission),
+    chains = Depends(get_chains),
+    memo = Depends(get_regeneration_cache),
+    resilience = Depends(get_resilience)
+):
+    """
+    Rewrites several selections of one document concurrently (at most
+    REGENERATE_BATCH_CONCURRENCY LLM calls at a time). Each selection sees its
+    own window of the shared `context`. Results are streamed as NDJSON
+    `result` (or `error`) events tagged with the selection's `index`, in
+    completion order, followed by a `done` event.
+    """
+    if not chains:
+        raise HTTPException(status_code=500, detail="LLM not initialized")
+
+    selections = request.selections
+    logger.info("Regenerating selections", extra={"selections": len(selections), "instruction": request.instruction})
+    # admit_client charged the first selection.
+    admission.charge_batch(client, len(selections))
+
+    instructions = [s.instruction or request.instruction for s in selections]
+    inputs = [_regenerate_inputs(s.selected_text, instructions[i], request.context) for i, s in enumerate(selections)]
+    cached = {}
+    if memo:
+        for i, s in enumerate(selections):
+            hit = await memo.aget(s.selected_text, instructions[i], inputs[i]["context"])
+            if hit is not None:
+                cached[i] = hit
+    pending = [i for i in range(len(selections)) if i not in cached]
+
+    async def event_stream():
+        failed = 0
+        for i, result in cached.items():
+            yield _ndjson({"type": "result", "index": i, "updated_text": result, "cached": True})
+
+        runnables = [chains.regenerate] * len(pending)
+        async for position, output in _invoke_as_completed(
+            runnables, [inputs[i] for i in pending], REGENERATE_BATCH_CONCURRENCY,
+            admission.upstream("gemini"), resilience.policy("gemini")
+        ):
+            i = pending[position]
+            if isinstance(output, Exception):
+                logger.warning("Regenerate selection %s failed: %s", i, output)
+                failed += 1
+                yield _ndjson({"type": "error", "index": i, "detail": str(output)})
+                continue
+            if memo:
+                await memo.aput(selections[i].selected_text, instructions[i], inputs[i]["context"], output)
+            yield _ndjson({"type": "result", "index": i, "updated_text": output, "cached": False})
+
+        yield _ndjson({"type": "done", "completed": len(selections) - failed, "failed": failed})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/regenerate/cache/stats")
+async def regeneration_cache_stats(memo = Depends(get_regeneration_cache)):
+    return await run_blocking(memo.snapshot) if memo else {}
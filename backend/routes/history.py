@@ -1,52 +1,157 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
-from firebase_admin import auth, firestore
-from typing import List, Optional
-from models.schemas import HistoryItem
+import json
+import base64
+import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from firebase_admin import firestore
+from typing import Optional
+from models.schemas import HistoryItem, HistorySummary, HistoryPage, AnalyticsData
+from services.executor import run_blocking
+from services.auth_service import get_current_user
+from services.registry import get_db, get_history_writer
+from services.telemetry import get_logger, span
 
 router = APIRouter()
-db = firestore.client()
+logger = get_logger("history")
 
-async def get_current_user(authorization: Optional[str] = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid token")
-    token = authorization.split("Bearer ")[1]
+HISTORY_PREVIEW_CHARS = 200
+SUMMARY_FIELDS = ["topic", "content_type", "created_at", "preview"]
+
+def make_preview(answer: str) -> str:
+    """Truncated answer stored alongside each generation for the list view."""
+    preview = " ".join(answer[:HISTORY_PREVIEW_CHARS * 2].split())
+    return preview if len(preview) <= HISTORY_PREVIEW_CHARS else preview[:HISTORY_PREVIEW_CHARS - 1].rstrip() + "…"
+
+def _backfill_previews(db, doc_ids: list[str]) -> dict:
+    """
+    Documents written before previews were stored have none: derive them
+    from the answer (or the topic) once and write them back, so later pages
+    read them directly.
+    """
+    refs = [db.collection("generations").document(doc_id) for doc_id in doc_ids]
+    previews = {}
+    batch = db.batch()
+    for snapshot in db.get_all(refs, field_paths=["answer", "topic"]):
+        if snapshot.exists:
+            data = snapshot.to_dict() or {}
+            previews[snapshot.id] = make_preview(data.get("answer") or data.get("topic") or "")
+            batch.update(db.collection("generations").document(snapshot.id), {"preview": previews[snapshot.id]})
+    if previews:
+        try:
+            batch.commit()
+        except Exception as e:
+            logger.warning("Could not store backfilled previews: %s", e)
+    return previews
+
+def _encode_cursor(created_at: datetime.datetime, doc_id: str) -> str:
+    raw = json.dumps({"t": created_at.isoformat(), "id": doc_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> dict:
     try:
-        return auth.verify_id_token(token)
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return {"created_at": datetime.datetime.fromisoformat(data["t"]), "__name__": data["id"]}
     except Exception:
-        raise HTTPException(status_code=401, detail="Invalid authentication token")
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/history", response_model=HistoryPage)
+async def get_history(
+    user: dict = Depends(get_current_user),
+    db = Depends(get_db),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None)
+):
+    """
+    Newest-first page of history summaries. Only the summary fields are read
+    from Firestore; pass `next_cursor` back as `cursor` for the next page and
+    fetch /history/{doc_id} for the full answer.
+    """
+    query = (
+        db.collection("generations")
+        .where("uid", "==", user["uid"])
+        .order_by("created_at", direction=firestore.Query.DESCENDING)
+        .order_by("__name__", direction=firestore.Query.DESCENDING)
+        .select(SUMMARY_FIELDS)
+    )
+    if cursor:
+        query = query.start_after(_decode_cursor(cursor))
 
-@router.get("/history", response_model=List[HistoryItem])
-async def get_history(user: dict = Depends(get_current_user)):
     try:
-        docs = (
-            db.collection("generations")
-            .where("uid", "==", user["uid"])
-            .order_by("created_at", direction=firestore.Query.DESCENDING)
-            .limit(20)
-            .stream()
-        )
-        
+        # One extra document tells us whether another page exists.
+        with span("firestore_query"):
+            docs = await run_blocking(lambda: list(query.limit(limit + 1).stream()))
+
+        rows = [(doc.id, doc.to_dict()) for doc in docs[:limit]]
+        missing = [doc_id for doc_id, data in rows if "preview" not in data]
+        previews = await run_blocking(_backfill_previews, db, missing) if missing else {}
+
         history_list = []
-        for doc in docs:
-            data = doc.to_dict()
-            history_list.append(HistoryItem(
-                id=doc.id,
+        for doc_id, data in rows:
+            history_list.append(HistorySummary(
+                id=doc_id,
                 topic=data.get("topic", "Unknown"),
                 content_type=data.get("content_type", "Unknown"),
-                answer=data.get("answer", ""),
+                preview=data.get("preview", previews.get(doc_id, "")),
                 created_at=data.get("created_at")
             ))
+
+        next_cursor = None
+        if len(docs) > limit and history_list:
+            last = history_list[-1]
+            next_cursor = _encode_cursor(last.created_at, last.id)
             
-        return history_list
+        return HistoryPage(items=history_list, next_cursor=next_cursor)
     except Exception as e:
-        print(f"History Error: {e}")
-        return []
+        logger.error("History error: %s", e)
+        return HistoryPage(items=[])
+
+@router.get("/history/writer/stats")
+async def history_writer_stats(writer = Depends(get_history_writer)):
+    return writer.stats() if writer else {}
+
+@router.get("/history/{doc_id}", response_model=HistoryItem)
+async def get_history_item(
+    doc_id: str,
+    user: dict = Depends(get_current_user),
+    db = Depends(get_db),
+    writer = Depends(get_history_writer)
+):
+    # A just-generated item may still be waiting in the write-behind buffer.
+    data = writer.pending_record(doc_id) if writer else None
+    if data is None:
+        doc = await run_blocking(db.collection("generations").document(doc_id).get)
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Item not found")
+        data = doc.to_dict()
+
+    if data.get("uid") != user["uid"]:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    return HistoryItem(
+        id=doc_id,
+        topic=data.get("topic", "Unknown"),
+        content_type=data.get("content_type", "Unknown"),
+        answer=data.get("answer", ""),
+        analytics=AnalyticsData(**data["analytics"]) if data.get("analytics") else None,
+        created_at=data.get("created_at")
+    )
 
 @router.delete("/history/{doc_id}")
-async def delete_history_item(doc_id: str, user: dict = Depends(get_current_user)):
+async def delete_history_item(
+    doc_id: str,
+    user: dict = Depends(get_current_user),
+    db = Depends(get_db),
+    writer = Depends(get_history_writer)
+):
     try:
+        pending = writer.pending_record(doc_id) if writer else None
+        if pending is not None:
+            if pending.get("uid") != user["uid"]:
+                raise HTTPException(status_code=403, detail="Not authorized")
+            if writer.discard(doc_id):
+                return {"status": "success"}
+
         doc_ref = db.collection("generations").document(doc_id)
-        doc = doc_ref.get()
+        doc = await run_blocking(doc_ref.get)
 
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Item not found")
@@ -54,7 +159,7 @@ async def delete_history_item(doc_id: str, user: dict = Depends(get_current_user
         if doc.to_dict().get("uid") != user["uid"]:
             raise HTTPException(status_code=403, detail="Not authorized")
 
-        doc_ref.delete()
+        await run_blocking(doc_ref.delete)
         return {"status": "success"}
 
     except HTTPException as he:
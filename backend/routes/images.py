@@ -1,20 +1,34 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
 from models.schemas import ImageRequest, ImageResponse
-from services.image_service import ImageService
+from services.registry import get_image_service
+from services.admission import AdmissionRejected, admit_client
+from services.executor import run_blocking
+from services.telemetry import get_logger
 
 router = APIRouter()
-image_service = ImageService()
+logger = get_logger("images")
 
-@router.post("/images", response_model=ImageResponse)
-async def get_related_images(request: ImageRequest, page: int = Query(1, ge=1)):
+@router.post("/images", response_model=ImageResponse, dependencies=[Depends(admit_client)])
+async def get_related_images(
+    request: ImageRequest,
+    page: int = Query(1, ge=1),
+    image_service = Depends(get_image_service)
+):
     """
     Fetch related images with pagination support.
     """
-    print(f"Received image request for topic: {request.topic} (Page: {page})")
+    logger.info("Image request", extra={"topic": request.topic, "page": page})
     
     try:
-        urls = image_service.get_images(request.topic, page=page)
+        urls = await image_service.get_images(request.topic, page=page)
         return ImageResponse(images=urls)
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"Error in get_related_images endpoint: {e}")
-        return ImageResponse(images=[])
\ No newline at end of file
+        logger.error("Image request failed: %s", e)
+        return ImageResponse(images=[])
+
+@router.get("/images/cache/stats")
+async def image_cache_stats(image_service = Depends(get_image_service)):
+    # result_pages counts keys, which is a SCAN when results live in Redis.
+    return await run_blocking(image_service.cache_stats) if image_service else {}
@@ -1,83 +1,148 @@
 import os
-import io
-from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Depends
-from firebase_admin import auth
-from services.vector_service import VectorService
+import asyncio
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pypdf import PdfReader
+from services.pdf_extraction import spool_upload, iter_pdf_pages, iter_text_file, iter_chunks
+from services.auth_service import get_current_user
+from services.registry import registry, get_vector_service
+from services.ingestion_jobs import IngestionJob, QueueFullError, build_ingestion_queue
+from services.knowledge_manifest import chunk_id, source_key
+from services.telemetry import get_logger, span
 
 router = APIRouter()
+logger = get_logger("knowledge")
 
-async def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid header")
-    token = authorization.split("Bearer ")[1]
+def _build_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+def _run_upload_job(job: IngestionJob, payload: dict) -> dict:
+    """Runs on an ingestion worker thread: extract -> chunk -> embed/upsert."""
+    # Pages are extracted lazily and flow straight into the splitter, so the
+    # "extracting" stage covers chunking too.
+    job.set_stage("extracting")
     try:
-        return auth.verify_id_token(token)
-    except Exception as e:
-        print(f"Auth Error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+        with span("ingest_extract"):
+            if payload["content_type"] == "application/pdf":
+                pages = iter_pdf_pages(payload["path"])
+            else:
+                pages = iter_text_file(payload["path"])
+            texts = list(iter_chunks(pages, _build_text_splitter()))
+    finally:
+        os.unlink(payload["path"])
+
+    if not texts:
+        raise ValueError("File is empty or text could not be extracted.")
+
+    vs = registry.vector_service
+    if not vs:
+        raise RuntimeError("Vector Service not initialized")
+
+    # Deterministic ids make re-uploads incremental: only chunks the manifest
+    # has not seen are embedded, and chunks that disappeared are deleted.
+    chunks = dict((chunk_id(job.filename, text), text) for text in texts)
+    key = source_key(job.filename)
+    manifest = registry.manifest_store
+    stored_ids = manifest.load(job.uid, key)
+    new_ids = [cid for cid in chunks if cid not in stored_ids]
+    removed_ids = sorted(stored_ids - chunks.keys())
+
+    job.chunks_total = len(new_ids)
+    logger.info("Split %s into %s chunks (%s new, %s unchanged, %s removed)",
+                job.filename, len(chunks), len(new_ids), len(chunks) - len(new_ids), len(removed_ids))
+
+    # Embedding/upsert is async I/O, so it runs on the app's event loop where
+    # the shared clients live; this worker thread just waits for it.
+    job.set_stage("embedding")
+    loop = payload["loop"]
+    with span("ingest_index"):
+        if new_ids:
+            ingestion = vs.aadd_texts(
+                [chunks[cid] for cid in new_ids],
+                namespace=job.uid,
+                ids=new_ids,
+                metadata={"source": job.filename},
+                on_progress=job.add_progress
+            )
+            asyncio.run_coroutine_threadsafe(ingestion, loop).result()
+        if removed_ids:
+            asyncio.run_coroutine_threadsafe(vs.adelete(removed_ids, namespace=job.uid), loop).result()
+        manifest.save(job.uid, key, job.filename, list(chunks))
+
+    cache = registry.generation_cache
+    if cache and (new_ids or removed_ids):
+        cache.invalidate(job.uid)
 
-try:
-    vs = VectorService()
-except Exception as e:
-    print(f"Vector Service Error: {e}")
-    vs = None
+    return {
+        "chunks_added": len(new_ids),
+        "chunks_skipped": len(chunks) - len(new_ids),
+        "chunks_removed": len(removed_ids)
+    }
 
-@router.post("/knowledge/upload")
+job_queue = build_ingestion_queue(_run_upload_job)
+
+@router.post("/knowledge/upload", status_code=202)
 async def upload_knowledge(
     file: UploadFile = File(...),
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    vs = Depends(get_vector_service)
 ):
     """
-    Uploads a PDF or TXT file, chunks it, and stores it in Pinecone 
-    under the user's specific namespace.
+    Accepts a PDF or TXT file and queues it for background ingestion into
+    the user's Pinecone namespace. Poll /knowledge/jobs/{job_id} for progress.
     """
     if not vs:
         raise HTTPException(status_code=500, detail="Vector Service not initialized")
 
     filename = file.filename
     content_type = file.content_type
-    print(f"📂 User {user['uid']} uploading: {filename} ({content_type})")
+    logger.info("Upload received", extra={"uid": user["uid"], "filename": filename, "content_type": content_type})
 
-    try:
-        text_content = ""
-
-        if content_type == "application/pdf":
-            pdf_bytes = await file.read()
-            pdf_file = io.BytesIO(pdf_bytes)
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                text_content += page.extract_text() + "\n"
-        
-        elif content_type in ["text/plain", "text/markdown"]:
-            content_bytes = await file.read()
-            text_content = content_bytes.decode("utf-8")
-            
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or TXT.")
-
-        if not text_content.strip():
-            raise HTTPException(status_code=400, detail="File is empty or text could not be extracted.")
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        texts = text_splitter.split_text(text_content)
-        
-        print(f"✂️ Split document into {len(texts)} chunks.")
-
-        vs.add_texts(texts, namespace=user['uid'])
-
-        return {
-            "status": "success", 
-            "filename": filename, 
-            "chunks_added": len(texts),
-            "message": "Knowledge added to your brain successfully! 🧠"
-        }
+    if content_type not in ["application/pdf", "text/plain", "text/markdown"]:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or TXT.")
 
+    path = None
+    try:
+        with span("spool"):
+            path = await spool_upload(file, suffix=os.path.splitext(filename or "")[1])
+        job = IngestionJob(uid=user['uid'], filename=filename)
+        with span("enqueue"):
+            job_queue.submit(job, {
+                "content_type": content_type,
+                "path": path,
+                "loop": asyncio.get_running_loop()
+            })
+    except QueueFullError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
-        print(f"❌ Upload Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Upload error: %s", e)
+        if path and os.path.exists(path):
+            os.unlink(path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "filename": filename,
+        "message": "Upload received! Your brain is learning in the background. 🧠"
+    }
+
+@router.get("/knowledge/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if not job or job.uid != user['uid']:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@router.get("/knowledge/embedding-cache/stats")
+async def embedding_cache_stats(vs = Depends(get_vector_service)):
+    return vs.embedding_cache_stats() if vs else {}
+
+
+@router.get("/knowledge/retrieval/stats")
+async def retrieval_stats(vs = Depends(get_vector_service)):
+    return vs.retrieval_stats_snapshot() if vs else {}
@@ -0,0 +1,310 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Depends, Request
+from services.auth_service import get_current_user
+
+# Per-caller request budget: a token bucket refilled at RATE_LIMIT_PER_MINUTE
+# with room for RATE_LIMIT_BURST back-to-back requests.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+# Most a batch route charges in total, however many items it carries. Kept
+# well under the burst so a batch still fits after a few earlier requests.
+RATE_LIMIT_BATCH_MAX_COST = int(os.getenv("RATE_LIMIT_BATCH_MAX_COST", str(max(1, RATE_LIMIT_BURST // 2))))
+# Upstream queues: how many callers may wait for a slot, and for how long.
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+UPSTREAM_CONCURRENCY = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+    "pinecone": int(os.getenv("PINECONE_MAX_CONCURRENCY", "32")),
+    "pexels": int(os.getenv("PEXELS_MAX_CONCURRENCY", "8")),
+}
+
+class AdmissionRejected(HTTPException):
+    """429 (caller over its rate) or 503 (upstream saturated), with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an upstream error (Gemini, Pinecone, ...) is a rate-limit or quota rejection."""
+    text = f"{type(error).__name__} {error}".lower()
+    return "429" in text or "resourceexhausted" in text or "rate limit" in text or "quota" in text
+
+def http_error(error: Exception) -> HTTPException:
+    """
+    Maps an exception caught by a route to the response it should produce:
+    HTTPExceptions (admission rejections included) pass through, upstream
+    rate limits become 503 with Retry-After, anything else is a 500.
+    """
+    if isinstance(error, HTTPException):
+        return error
+    if is_rate_limited(error):
+        return AdmissionRejected(503, "Upstream rate limit reached, please retry", 30)
+    return HTTPException(status_code=500, detail=str(error))
+
+class InMemoryRateLimiter:
+    """
+    Token buckets keyed by caller, held in process memory (one replica, or
+    tests). Idle buckets are dropped LRU-first beyond `max_keys`.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int, max_keys: int = 100_000, clock=time.monotonic):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: int = 1) -> float:
+        """Takes `cost` tokens and returns 0, or returns the seconds until they would be available."""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / self.rate if self.rate > 0 else float("inf")
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+class RedisRateLimiter:
+    """Same interface as InMemoryRateLimiter, shared across replicas through Redis."""
+
+    SCRIPT = """
+    local burst = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, rate_per_second: float, burst: int, prefix: str = "contentflow:rate"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self.rate = rate_per_second
+        self.burst = burst
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def acquire(self, key: str, cost: int = 1) -> float:
+        return float(self._script(keys=[f"{self.prefix}:{key}"], args=[self.burst, self.rate, time.time(), cost]))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}:*"))
+
+class Slot:
+    """A held upstream slot; release() is idempotent."""
+
+    def __init__(self, limiter: "UpstreamLimiter | None"):
+        self._limiter = limiter
+        self._acquired_at = limiter.clock() if limiter else 0.0
+
+    def release(self):
+        if self._limiter is not None:
+            self._limiter._release(self._limiter.clock() - self._acquired_at)
+            self._limiter = None
+
+class UpstreamLimiter:
+    """
+    Global concurrency cap for one upstream (max_concurrent <= 0 means
+    unlimited), with a bounded FIFO wait queue. A caller is shed with 503 and
+    Retry-After when the queue is full, when the wait estimated from recent
+    hold times already exceeds its deadline, or when its deadline passes
+    while queued.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 64, max_wait: float = 10.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+        self._in_flight = 0
+        self._waiters = []
+        # EWMA of how long a slot is held, for predictive shedding.
+        self._avg_hold = 0.0
+        self.metrics = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0, "max_queue_depth": 0}
+
+    def estimated_wait(self) -> float:
+        if self.max_concurrent <= 0 or self._in_flight < self.max_concurrent:
+            return 0.0
+        return (len(self._waiters) + 1) / self.max_concurrent * self._avg_hold
+
+    def _shed(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.metrics[reason] += 1
+        return AdmissionRejected(503, f"{self.name} is at capacity, please retry", retry_after)
+
+    def try_acquire(self) -> Slot | None:
+        """A slot only if one is free right now (for speculative work such as prefetching)."""
+        if self.max_concurrent <= 0:
+            return Slot(None)
+        if self._in_flight < self.max_concurrent and not self._waiters:
+            self._in_flight += 1
+            self.metrics["admitted"] += 1
+            return Slot(self)
+        return None
+
+    async def acquire(self, timeout: float | None = None) -> Slot:
+        slot = self.try_acquire()
+        if slot is not None:
+            return slot
+
+        timeout = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("shed_queue_full", self.estimated_wait() or 1)
+        if self.estimated_wait() > timeout:
+            raise self._shed("shed_deadline", self.estimated_wait())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.metrics["queued"] += 1
+        self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                raise self._shed("shed_deadline", self.estimated_wait() or 1)
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on.
+                self._release(None)
+            raise
+        self.metrics["admitted"] += 1
+        return Slot(self)
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = None):
+        """`async with limiter.slot(): ...` holds a slot for the block."""
+        held = await self.acquire(timeout)
+        try:
+            yield held
+        finally:
+            held.release()
+
+    def _release(self, held_for: float | None):
+        if held_for is not None:
+            self._avg_hold = held_for if not self._avg_hold else 0.8 * self._avg_hold + 0.2 * held_for
+        # Hand the slot straight to the oldest waiter, so in_flight is unchanged.
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "avg_hold_ms": round(self._avg_hold * 1000, 2),
+        }
+
+class AdmissionController:
+    """Per-caller rate limiting plus one UpstreamLimiter per upstream service."""
+
+    def __init__(self, rate_limiter, upstreams: dict[str, UpstreamLimiter], batch_max_cost: int | None = None):
+        self.rate_limiter = rate_limiter
+        self.upstreams = upstreams
+        self.batch_max_cost = min(batch_max_cost or rate_limiter.burst, rate_limiter.burst)
+        self.metrics = {"allowed": 0, "rate_limited": 0}
+
+    def upstream(self, name: str) -> UpstreamLimiter:
+        return self.upstreams[name]
+
+    def check_rate(self, key: str, cost: int = 1, retry_cost: int | None = None):
+        """
+        Charges `cost` requests to `key`; raises 429 with Retry-After when over
+        budget. `retry_cost` is what a retry will charge in total, when that is
+        more than `cost` (a batch whose first item the route dependency took).
+        """
+        if cost <= 0:
+            return
+        if cost > self.rate_limiter.burst:
+            # The bucket never holds more than the burst: a 429 could never be retried successfully.
+            raise HTTPException(status_code=413, detail=f"Request costs {cost} requests, more than the limit of {self.rate_limiter.burst}")
+        wait = self.rate_limiter.acquire(key, cost)
+        if wait > 0 and retry_cost and retry_cost > cost and self.rate_limiter.rate > 0:
+            wait += (retry_cost - cost) / self.rate_limiter.rate
+        if wait > 0:
+            self.metrics["rate_limited"] += 1
+            raise AdmissionRejected(429, "Too many requests, please slow down", wait)
+        self.metrics["allowed"] += 1
+
+    def charge_batch(self, key: str, items: int, charged: int = 1):
+        """
+        Charges a batch of `items` requests to `key`, `charged` of which the
+        route dependency already took. The whole batch costs at most
+        `batch_max_cost`, so it never needs more than the bucket can hold.
+        """
+        cost = min(items, self.batch_max_cost)
+        self.check_rate(key, cost - charged, retry_cost=cost)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "tracked_callers": len(self.rate_limiter),
+            "upstreams": {name: limiter.stats() for name, limiter in self.upstreams.items()},
+        }
+
+def build_admission_controller() -> AdmissionController:
+    rate = RATE_LIMIT_PER_MINUTE / 60
+    if os.getenv("CACHE_BACKEND", "memory") == "redis":
+        rate_limiter = RedisRateLimiter(os.getenv("REDIS_URL", "redis://localhost:6379/0"), rate, RATE_LIMIT_BURST)
+    else:
+        rate_limiter = InMemoryRateLimiter(rate, RATE_LIMIT_BURST)
+    return AdmissionController(rate_limiter, {
+        name: UpstreamLimiter(name, limit, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+        for name, limit in UPSTREAM_CONCURRENCY.items()
+    }, batch_max_cost=RATE_LIMIT_BATCH_MAX_COST)
+
+def get_admission():
+    from services.registry import registry
+
+    return registry.admission
+
+async def admit_user(user: dict = Depends(get_current_user), admission = Depends(get_admission)):
+    """Route dependency: one request from the authenticated user's budget."""
+    admission.check_rate(f"uid:{user['uid']}")
+    return user
+
+async def admit_client(request: Request, admission = Depends(get_admission)) -> str:
+    """Route dependency for unauthenticated routes: one request from the client address's budget. Returns the rate key."""
+    host = request.client.host if request.client else "unknown"
+    admission.check_rate(f"ip:{host}")
+    return f"ip:{host}"
@@ -0,0 +1,101 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from models.schemas import AnalyticsData
+from services.executor import run_blocking
+from services.telemetry import get_logger
+
+logger = get_logger("analytics")
+
+# 0 runs analytics on the shared thread pool instead of separate processes.
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "2"))
+# Texts per process-pool task when scoring in bulk, to amortize pickling.
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "16"))
+
+_textstat = None
+_TextBlob = None
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _load_analyzers():
+    """Imports textstat/TextBlob and runs each once so their lazy setup is paid up front."""
+    global _textstat, _TextBlob
+    if _TextBlob is not None:
+        return
+    import textstat
+    from textblob import TextBlob
+
+    textstat.flesch_reading_ease("Warm up the analyzers.")
+    TextBlob("Warm up the analyzers.").sentiment
+    _textstat, _TextBlob = textstat, TextBlob
+
+def _sentiment_label(polarity: float) -> str:
+    if polarity > 0.1: return "Positive"
+    if polarity < -0.1: return "Negative"
+    return "Neutral"
+
+def analyze_text(text: str) -> dict:
+    _load_analyzers()
+    word_count = len(text.split())
+    return {
+        "word_count": word_count,
+        "reading_time": max(1, round(word_count / 200)),
+        "readability_score": _textstat.flesch_reading_ease(text),
+        "sentiment": _sentiment_label(_TextBlob(text).sentiment.polarity),
+    }
+
+def analyze_many(texts: list[str]) -> list[dict]:
+    return [analyze_text(text) for text in texts]
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process is multi-threaded.
+            _pool = ProcessPoolExecutor(
+                max_workers=ANALYTICS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_analyzers
+            )
+        return _pool
+
+def shutdown_analytics_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+async def _run(func, *args):
+    global _pool
+    if ANALYTICS_WORKERS <= 0:
+        return await run_blocking(func, *args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+    except BrokenProcessPool as e:
+        logger.error("Analytics pool crashed, falling back to threads: %s", e)
+        with _pool_lock:
+            _pool = None
+        return await run_blocking(func, *args)
+
+async def warm_up_analytics():
+    """Starts every worker (and its analyzers) before the first request needs one."""
+    if ANALYTICS_WORKERS <= 0:
+        return
+    try:
+        await asyncio.gather(*(_run(analyze_many, []) for _ in range(ANALYTICS_WORKERS)))
+    except Exception as e:
+        logger.warning("Analytics warm-up failed: %s", e)
+
+async def compute_analytics(text: str) -> AnalyticsData:
+    return AnalyticsData(**await _run(analyze_text, text))
+
+async def compute_analytics_many(texts: list[str]) -> list[AnalyticsData]:
+    """Scores many texts, spread across the pool in batches of ANALYTICS_BATCH_SIZE."""
+    batches = [texts[i:i + ANALYTICS_BATCH_SIZE] for i in range(0, len(texts), ANALYTICS_BATCH_SIZE)]
+    results = await asyncio.gather(*(_run(analyze_many, batch) for batch in batches))
+    return [AnalyticsData(**item) for batch in results for item in batch]
@@ -0,0 +1,179 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import jwt
+import requests
+from cryptography import x509
+from fastapi import HTTPException, Header
+from firebase_admin import auth
+from services.executor import run_blocking
+from services.registry import registry
+from services.telemetry import get_logger, span
+
+logger = get_logger("auth")
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+def fetch_firebase_certs(url: str = FIREBASE_CERTS_URL) -> tuple[dict, float]:
+    """Returns ({kid: pem_certificate}, max_age_seconds) from Google's cert endpoint."""
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+    return response.json(), float(match.group(1)) if match else 3600.0
+
+class PublicKeyCache:
+    """
+    Signing keys for Firebase ID tokens, refreshed only when the endpoint's
+    Cache-Control max-age runs out (or an unknown kid shows up, at most once
+    per `min_refresh_interval`).
+    """
+
+    def __init__(self, fetch=fetch_firebase_certs, min_refresh_interval: float = 30.0):
+        self.fetch = fetch
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        certs, max_age = self.fetch()
+        self._keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+            for kid, pem in certs.items()
+        }
+        now = time.monotonic()
+        self._expires_at = now + max_age
+        self._last_refresh = now
+
+    def get(self, kid: str):
+        with self._lock:
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            unknown = kid not in self._keys and now - self._last_refresh >= self.min_refresh_interval
+            if stale or unknown:
+                self._refresh()
+            return self._keys.get(kid)
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens locally (RS256 against the cached keys, plus
+    the aud/iss/sub/auth_time checks the Admin SDK does) and memoizes the
+    decoded claims per token until the token's own `exp`, in a bounded LRU.
+    """
+
+    def __init__(self, project_id: str, key_cache: PublicKeyCache,
+                 max_entries: int = 10000, clock_skew_seconds: int = 5):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.key_cache = key_cache
+        self.max_entries = max_entries
+        self.clock_skew_seconds = clock_skew_seconds
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def cached(self, token: str) -> Optional[dict]:
+        """Claims for an already-verified, unexpired token, or None."""
+        key = self._token_key(token)
+        with self._lock:
+            entry = self._claims.get(key)
+            if entry is None:
+                return None
+            claims, exp = entry
+            if exp <= time.time():
+                del self._claims[key]
+                return None
+            self._claims.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def verify(self, token: str) -> dict:
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+
+        self.misses += 1
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise ValueError("ID token must be RS256-signed and carry a kid")
+        public_key = self.key_cache.get(header["kid"])
+        if public_key is None:
+            raise ValueError("ID token signed with an unknown key")
+
+        claims = jwt.decode(
+            token,
+            public_key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=self.issuer,
+            leeway=self.clock_skew_seconds,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("ID token has an invalid subject")
+        if claims.get("auth_time", 0) > time.time() + self.clock_skew_seconds:
+            raise ValueError("ID token auth_time is in the future")
+        claims["uid"] = subject
+
+        with self._lock:
+            self._claims[self._token_key(token)] = (claims, claims["exp"])
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+        return claims
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._claims),
+        }
+
+def build_token_verifier() -> Optional[TokenVerifier]:
+    """
+    Local verifier for the Firebase project, or None when the project id is
+    unknown or the Auth emulator (unsigned tokens) is in use, in which case
+    the Admin SDK is used instead.
+    """
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        return None
+    project_id = os.getenv("FIREBASE_PROJECT_ID")
+    if not project_id:
+        try:
+            import firebase_admin
+            project_id = firebase_admin.get_app().project_id
+        except Exception:
+            project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        logger.warning("Firebase project id unknown, falling back to Admin SDK token verification")
+        return None
+    return TokenVerifier(project_id, PublicKeyCache())
+
+async def get_current_user(authorization: Optional[str] = Header(None)):
+    """FastAPI dependency shared by every authenticated route."""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+    token = authorization.split("Bearer ")[1]
+    verifier = registry.token_verifier
+    try:
+        with span("auth"):
+            if verifier:
+                # Memoized claims are served straight from the event loop; only a
+                # first sighting of a token pays for RSA verification on the pool.
+                return verifier.cached(token) or await run_blocking(verifier.verify, token)
+            return await run_blocking(auth.verify_id_token, token)
+    except Exception as e:
+        logger.warning("Auth error: %s", e)
+        raise HTTPException(status_code=401, detail="Invalid token")
@@ -0,0 +1,323 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from services.executor import run_blocking
+
+class InMemoryCache:
+    """Thread-safe LRU cache with a per-entry TTL (seconds, None = never expires)."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float | None = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl_seconds: float | None = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def incr(self, key: str) -> int:
+        # Counters live outside the LRU so eviction can never roll a version back.
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Async surface for request handlers; nothing here blocks, so no thread hop.
+    async def aget(self, key: str):
+        return self.get(key)
+
+    async def aset(self, key: str, value, ttl_seconds: float | None = None):
+        self.set(key, value, ttl_seconds)
+
+    async def acounter(self, key: str) -> int:
+        return self.counter(key)
+
+class RedisCache:
+    """
+    Same interface as InMemoryCache, backed by Redis (JSON-serialized values).
+    The client is synchronous: the async methods run it on the blocking-I/O
+    pool so a Redis round trip never stalls the event loop.
+    """
+
+    def __init__(self, url: str, prefix: str = "contentflow", ttl_seconds: float | None = 3600):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str):
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl_seconds: float | None = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.client.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self._key(f"counter:{key}")))
+
+    def counter(self, key: str) -> int:
+        raw = self.client.get(self._key(f"counter:{key}"))
+        return int(raw) if raw is not None else 0
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}:*"))
+
+    async def aget(self, key: str):
+        return await run_blocking(self.get, key)
+
+    async def aset(self, key: str, value, ttl_seconds: float | None = None):
+        await run_blocking(self.set, key, value, ttl_seconds)
+
+    async def acounter(self, key: str) -> int:
+        return await run_blocking(self.counter, key)
+
+def build_cache_backend(prefix: str, max_entries: int, ttl_seconds: float | None):
+    """Picks the backend from CACHE_BACKEND (memory | redis)."""
+    if os.getenv("CACHE_BACKEND", "memory") == "redis":
+        return RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), prefix=prefix, ttl_seconds=ttl_seconds)
+    return InMemoryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+def _normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().casefold()
+
+class GenerationCache:
+    """
+    Two-tier cache in front of the generation chain.
+
+    The exact tier is keyed on the normalized request parameters plus the
+    namespace's knowledge-base version, so any upload to that namespace makes
+    older entries unreachable. The optional semantic tier reuses the topic
+    embedding computed for retrieval and returns a cached answer whose topic
+    is close enough (cosine >= threshold) with otherwise identical parameters.
+    Semantic entries are grouped into one bucket per (namespace, version,
+    parameters), capped per bucket and by a global LRU across all buckets;
+    expired entries and empty buckets are dropped on every insert.
+    """
+
+    PARAMS = ("content_type", "tone", "target_audience", "language")
+
+    def __init__(self, backend=None, semantic_enabled: bool = True,
+                 semantic_threshold: float = 0.95, semantic_max_entries: int = 256,
+                 semantic_max_total: int = 4096, ttl_seconds: float | None = 3600):
+        self.backend = backend if backend is not None else InMemoryCache(ttl_seconds=ttl_seconds)
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self.semantic_max_entries = semantic_max_entries
+        self.semantic_max_total = semantic_max_total
+        self.ttl_seconds = ttl_seconds
+        self._semantic = {}
+        # (bucket_key, topic) across all buckets: least recently used first, and
+        # in insertion order, which is expiry order since every entry gets the same TTL.
+        self._semantic_lru = OrderedDict()
+        self._semantic_expiry = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    async def akb_version(self, namespace: str) -> int:
+        return await self.backend.acounter(f"kb_version:{namespace}")
+
+    def invalidate(self, namespace: str):
+        """Called after texts are added to a namespace."""
+        self.backend.incr(f"kb_version:{namespace}")
+        with self._lock:
+            for bucket_key in [k for k in self._semantic if k[0] == namespace]:
+                for topic in list(self._semantic[bucket_key]):
+                    self._drop_semantic(bucket_key, topic)
+            self.stats["invalidations"] += 1
+
+    def _drop_semantic(self, bucket_key: tuple, topic: str):
+        """Removes one semantic entry, and its bucket once empty. Caller holds the lock."""
+        bucket = self._semantic.get(bucket_key)
+        if bucket is not None:
+            bucket.pop(topic, None)
+            if not bucket:
+                del self._semantic[bucket_key]
+        self._semantic_lru.pop((bucket_key, topic), None)
+        self._semantic_expiry.pop((bucket_key, topic), None)
+
+    def _prune_expired(self, now: float):
+        """Caller holds the lock."""
+        while self._semantic_expiry:
+            (bucket_key, topic), expires_at = next(iter(self._semantic_expiry.items()))
+            if expires_at is None or expires_at >= now:
+                break
+            self._drop_semantic(bucket_key, topic)
+
+    def _params_key(self, request) -> str:
+        return json.dumps([_normalize(getattr(request, p)) for p in self.PARAMS])
+
+    def _exact_key(self, request, namespace: str, version: int) -> str:
+        raw = json.dumps([namespace, version, _normalize(request.topic), self._params_key(request)])
+        return "gen:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def aget_exact(self, request, namespace: str, version: int):
+        value = await self.backend.aget(self._exact_key(request, namespace, version))
+        if value is not None:
+            self.stats["exact_hits"] += 1
+        return value
+
+    def get_semantic(self, request, namespace: str, version: int, embedding):
+        if not self.semantic_enabled or embedding is None:
+            return None
+        bucket_key = (namespace, version, self._params_key(request))
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= (np.linalg.norm(query) or 1.0)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._semantic.get(bucket_key)
+            if not bucket:
+                return None
+            for entry_key in [k for k, (_, _, expires_at) in bucket.items() if expires_at and expires_at < now]:
+                self._drop_semantic(bucket_key, entry_key)
+            if bucket_key not in self._semantic:
+                return None
+            keys = list(bucket.keys())
+            matrix = np.stack([bucket[k][0] for k in keys])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.semantic_threshold:
+                return None
+            bucket.move_to_end(keys[best])
+            self._semantic_lru.move_to_end((bucket_key, keys[best]))
+            self.stats["semantic_hits"] += 1
+            return bucket[keys[best]][1]
+
+    def record_miss(self):
+        self.stats["misses"] += 1
+
+    async def aput(self, request, namespace: str, version: int, value: dict, embedding=None):
+        await self.backend.aset(self._exact_key(request, namespace, version), value)
+        self.stats["stores"] += 1
+        if not self.semantic_enabled or embedding is None:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= (np.linalg.norm(vector) or 1.0)
+        now = time.monotonic()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        bucket_key = (namespace, version, self._params_key(request))
+        topic = _normalize(request.topic)
+        with self._lock:
+            self._prune_expired(now)
+            self._drop_semantic(bucket_key, topic)
+            bucket = self._semantic.setdefault(bucket_key, OrderedDict())
+            bucket[topic] = (vector, value, expires_at)
+            self._semantic_lru[(bucket_key, topic)] = None
+            self._semantic_expiry[(bucket_key, topic)] = expires_at
+            if len(bucket) > self.semantic_max_entries:
+                self._drop_semantic(bucket_key, next(iter(bucket)))
+            while len(self._semantic_lru) > self.semantic_max_total:
+                self._drop_semantic(*next(iter(self._semantic_lru)))
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "exact_entries": len(self.backend),
+            "semantic_entries": len(self._semantic_lru),
+            "semantic_buckets": len(self._semantic),
+        }
+
+def build_generation_cache() -> GenerationCache:
+    ttl = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "3600"))
+    return GenerationCache(
+        backend=build_cache_backend("gen", int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1024")), ttl),
+        semantic_enabled=os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1",
+        semantic_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        semantic_max_total=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "4096")),
+        ttl_seconds=ttl,
+    )
+
+class RegenerationCache:
+    """
+    LRU memo for /regenerate: (selected_text, instruction, hash of the
+    context actually sent) -> rewritten text, so undo/redo and repeated
+    edits of the same selection skip the LLM.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else InMemoryCache(max_entries=2048, ttl_seconds=3600)
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def _key(selected_text: str, instruction: str, context: str) -> str:
+        context_hash = hashlib.sha256((context or "").encode("utf-8")).hexdigest()
+        raw = json.dumps([selected_text, _normalize(instruction), context_hash])
+        return "regen:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def aget(self, selected_text: str, instruction: str, context: str) -> str | None:
+        value = await self.backend.aget(self._key(selected_text, instruction, context))
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def aput(self, selected_text: str, instruction: str, context: str, updated_text: str):
+        await self.backend.aset(self._key(selected_text, instruction, context), updated_text)
+        self.stats["stores"] += 1
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+def build_regeneration_cache() -> RegenerationCache:
+    return RegenerationCache(build_cache_backend(
+        "regen",
+        int(os.getenv("REGENERATE_CACHE_MAX_ENTRIES", "2048")),
+        float(os.getenv("REGENERATE_CACHE_TTL_SECONDS", "3600")),
+    ))
@@ -0,0 +1,107 @@
+import re
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+# Shared by every generation template.
+_CONTEXT_BLOCK = """=== RETRIEVED CONTEXT (From User's Knowledge Base) ===
+{context}
+======================================================
+Use the context for factual accuracy and specific company details; ignore it if it is empty or irrelevant.
+
+USER REQUEST:
+Topic: {topic}
+Tone / Style Description: {tone}
+Format: {content_type}
+Audience: {target_audience}
+Language: {language}
+"""
+
+_TONE_RULE = "If a custom persona is provided in 'Tone', MIMIC it exactly; otherwise use the adjective provided."
+
+CONTENT_TEMPLATE = f"""You are an expert AI content creator.
+
+{_CONTEXT_BLOCK}
+INSTRUCTIONS:
+- Write the actual content in {{language}}, structured the way the requested Format is usually structured.
+- {_TONE_RULE}
+- NO PREAMBLE. Start directly with the content.
+"""
+
+SYSTEM_PROMPT_TEMPLATE = f"""You are an Elite Prompt Engineer.
+
+{_CONTEXT_BLOCK}
+INSTRUCTIONS:
+- DO NOT write the content itself. Write a system prompt that makes an LLM produce it.
+- {_TONE_RULE}
+- NO PREAMBLE. Start directly with the system prompt.
+"""
+
+IMAGE_PROMPT_TEMPLATE = f"""You are an expert Midjourney prompt writer.
+
+{_CONTEXT_BLOCK}
+INSTRUCTIONS:
+- Output a list of 3-5 highly descriptive image prompts.
+- {_TONE_RULE}
+- NO PREAMBLE. Start directly with the list.
+"""
+
+REGENERATE_TEMPLATE = """You are a professional editor.
+TASK: Rewrite the 'Selected Text' according to the 'Instruction'.
+
+Surrounding document (for consistency of facts, terminology and voice; do NOT rewrite it):
+{context}
+
+Selected Text: "{selected_text}"
+Instruction: {instruction}
+
+Return ONLY the rewritten text. Do not add quotes or explanations.
+"""
+
+QA_TEMPLATE = """You are a helpful assistant. Answer the question based ONLY on the following context:
+
+{context}
+
+Question: {question}
+"""
+
+# Parsed once at import; ChatPromptTemplate is immutable and safe to share.
+GENERATION_PROMPTS = {
+    "content": ChatPromptTemplate.from_template(CONTENT_TEMPLATE),
+    "system_prompt": ChatPromptTemplate.from_template(SYSTEM_PROMPT_TEMPLATE),
+    "image_prompt": ChatPromptTemplate.from_template(IMAGE_PROMPT_TEMPLATE),
+}
+REGENERATE_PROMPT = ChatPromptTemplate.from_template(REGENERATE_TEMPLATE)
+QA_PROMPT = ChatPromptTemplate.from_template(QA_TEMPLATE)
+
+_SYSTEM_PROMPT_TYPES = re.compile(r"\b(llm|ai|system)\s+(system\s+)?prompt\b")
+_IMAGE_PROMPT_TYPES = re.compile(r"\b(midjourney|image)\b.*\bprompt\b|\bmidjourney\b")
+
+def template_kind(content_type: str) -> str:
+    """Which generation template a requested format uses: system_prompt, image_prompt or content."""
+    value = (content_type or "").casefold()
+    if _IMAGE_PROMPT_TYPES.search(value):
+        return "image_prompt"
+    if _SYSTEM_PROMPT_TYPES.search(value):
+        return "system_prompt"
+    return "content"
+
+class ChainSet:
+    """
+    The app's LLM chains, composed once per LLM client and shared by every
+    request. There is one generation chain per template kind; the route picks
+    it from the content type before the call, so each prompt only carries the
+    instructions it needs.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        parser = StrOutputParser()
+        self.generation = {kind: prompt | llm | parser for kind, prompt in GENERATION_PROMPTS.items()}
+        self.regenerate = REGENERATE_PROMPT | llm | parser
+        self.qa = QA_PROMPT | llm | parser
+
+    def generation_for(self, content_type: str):
+        return self.generation[template_kind(content_type)]
+
+def build_chains(llm) -> ChainSet | None:
+    return ChainSet(llm) if llm else None
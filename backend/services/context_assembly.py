@@ -0,0 +1,129 @@
+import os
+import math
+
+# Chunks are cut with a 200-char overlap; anything at least this long that
+# repeats across a chunk boundary is treated as duplicated text.
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 400
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.25"))
+# A chunk is only truncated to fill the budget if at least this many tokens remain.
+MIN_PARTIAL_TOKENS = 64
+
+def count_tokens(text: str) -> int:
+    """Cheap, tokenizer-free estimate (~4 characters per token for Gemini on English text)."""
+    return math.ceil(len(text) / 4)
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of `head` that is also a prefix of `tail`."""
+    window = head[-MAX_OVERLAP_CHARS:]
+    probe = tail[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = window.find(probe)
+    while start != -1:
+        size = len(window) - start
+        if tail.startswith(window[start:]):
+            return size
+        start = window.find(probe, start + 1)
+    return 0
+
+def _strip_duplicates(text: str, kept: list[str]) -> str:
+    """Removes the parts of `text` already present in `kept` (containment and boundary overlaps)."""
+    for other in kept:
+        if text in other:
+            return ""
+        cut = _overlap(other, text)
+        if cut:
+            text = text[cut:]
+        cut = _overlap(text, other)
+        if cut:
+            text = text[:-cut]
+    return text.strip()
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer ending on a sentence, then on a word.
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    return cut[:boundary + 1].rstrip() if boundary > 0 else cut
+
+def context_window(document: str, selection: str, max_tokens: int) -> str:
+    """
+    The part of `document` around `selection`, at most `max_tokens` long, so
+    an edit sees its surroundings without the whole document in the prompt.
+    Falls back to the start of the document when the selection is not found.
+    """
+    document = (document or "").strip()
+    limit = max_tokens * 4
+    if len(document) <= limit:
+        return document
+    start = document.find(selection.strip()[:200]) if selection.strip() else -1
+    if start == -1:
+        return _truncate(document, max_tokens)
+    begin = max(0, start - (limit - len(selection)) // 2)
+    end = min(len(document), begin + limit)
+    begin = max(0, end - limit)
+    # Snap inward to whitespace so the window does not open or close mid-word.
+    if begin > 0:
+        begin = document.find(" ", begin) + 1 or begin
+    if end < len(document):
+        space = document.rfind(" ", begin, end)
+        if space > begin:
+            end = space
+    return document[begin:end].strip()
+
+def assemble_context(docs, token_budget: int = None, min_score: float = None) -> tuple[str, dict]:
+    """
+    Builds the prompt context from ranked retrieval results: drops chunks whose
+    relevance `metadata["score"]` (cosine) is below `min_score` (chunks without
+    a score, e.g. keyword-only hits, are kept), strips text already included
+    through an overlapping neighbour, and packs what remains, best first, into
+    `token_budget` tokens. Returns (context_text, stats).
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    min_score = CONTEXT_MIN_SCORE if min_score is None else min_score
+
+    raw = [d.page_content for d in docs]
+    stats = {
+        "retrieved_chunks": len(docs),
+        "used_chunks": 0,
+        "dropped_low_score": 0,
+        "dropped_duplicate": 0,
+        "truncated_chunks": 0,
+        "tokens_before": count_tokens("\n\n".join(raw)),
+        "tokens_after": 0,
+        "token_budget": token_budget,
+    }
+
+    kept = []
+    used = 0
+    for doc in docs:
+        score = (doc.metadata or {}).get("score")
+        if score is not None and score < min_score:
+            stats["dropped_low_score"] += 1
+            continue
+        text = _strip_duplicates(doc.page_content.strip(), kept)
+        if not text:
+            stats["dropped_duplicate"] += 1
+            continue
+        tokens = count_tokens(text)
+        remaining = token_budget - used
+        if tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            text = _truncate(text, remaining)
+            tokens = count_tokens(text)
+            stats["truncated_chunks"] += 1
+        kept.append(text)
+        used += tokens
+
+    context_text = "\n\n".join(kept)
+    stats["used_chunks"] = len(kept)
+    stats["tokens_after"] = count_tokens(context_text)
+    return context_text, stats
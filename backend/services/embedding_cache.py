@@ -0,0 +1,210 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from services.telemetry import get_logger
+
+logger = get_logger("embedding_cache")
+
+class EmbeddingStore:
+    """
+    Fixed-capacity LRU store of float32 vectors.
+
+    Vectors live in one contiguous (max_entries x dim) matrix and the LRU only
+    tracks key -> row, so evicting an entry just frees its row for reuse. With
+    `path` set the matrix is a memory-mapped .npy file and the key index is
+    written next to it on flush(), so the cache survives restarts.
+
+    Each row also carries a digest of the key it holds, written alongside the
+    vector and checked on every read and on load. An index left stale by a
+    crash (rows reused since the last flush) then yields misses instead of
+    other texts' vectors.
+    """
+
+    def __init__(self, max_entries: int = 20000, path: str | None = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._rows = OrderedDict()
+        self._free = []
+        self._matrix = None
+        self._tags = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    def _matrix_file(self):
+        return os.path.join(self.path, "vectors.npy")
+
+    def _index_file(self):
+        return os.path.join(self.path, "index.json")
+
+    def _tags_file(self):
+        return os.path.join(self.path, "keys.npy")
+
+    @staticmethod
+    def _tag(key: str) -> np.ndarray:
+        return np.frombuffer(hashlib.sha256(key.encode("utf-8")).digest(), dtype=np.uint8)
+
+    def _load(self):
+        files = (self._matrix_file(), self._tags_file(), self._index_file())
+        if not all(os.path.exists(f) for f in files):
+            return
+        try:
+            matrix = np.lib.format.open_memmap(self._matrix_file(), mode="r+")
+            tags = np.lib.format.open_memmap(self._tags_file(), mode="r+")
+            with open(self._index_file()) as f:
+                rows = json.load(f)
+            if matrix.shape[0] != self.max_entries or tags.shape != (self.max_entries, 32):
+                return
+            self._matrix = matrix
+            self._tags = tags
+            self._rows = OrderedDict(
+                (key, row) for key, row in rows
+                if 0 <= row < self.max_entries and np.array_equal(tags[row], self._tag(key))
+            )
+            if len(self._rows) < len(rows):
+                logger.warning("Dropped %d stale embedding cache entries from %s", len(rows) - len(self._rows), self.path)
+            used = set(self._rows.values())
+            self._free = [r for r in range(self.max_entries) if r not in used]
+        except Exception as e:
+            logger.warning("Could not load embedding cache from %s: %s", self.path, e)
+
+    def _allocate(self, dim: int):
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            self._matrix = np.lib.format.open_memmap(
+                self._matrix_file(), mode="w+", dtype=np.float32, shape=(self.max_entries, dim)
+            )
+            self._tags = np.lib.format.open_memmap(
+                self._tags_file(), mode="w+", dtype=np.uint8, shape=(self.max_entries, 32)
+            )
+        else:
+            self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+            self._tags = np.zeros((self.max_entries, 32), dtype=np.uint8)
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def get_many(self, keys: list[str]) -> list:
+        """Returns a vector (list of floats) or None per key."""
+        results = []
+        with self._lock:
+            for key in keys:
+                row = self._rows.get(key)
+                if row is not None and not np.array_equal(self._tags[row], self._tag(key)):
+                    del self._rows[key]
+                    self._free.append(row)
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._rows.move_to_end(key)
+                    results.append(self._matrix[row].tolist())
+        return results
+
+    def put_many(self, keys: list[str], vectors: list[list[float]]):
+        if not keys:
+            return
+        with self._lock:
+            if self._matrix is None:
+                self._allocate(len(vectors[0]))
+            for key, vector in zip(keys, vectors):
+                row = self._rows.get(key)
+                if row is None:
+                    if not self._free:
+                        _, row = self._rows.popitem(last=False)
+                    else:
+                        row = self._free.pop()
+                    self._rows[key] = row
+                self._rows.move_to_end(key)
+                # Untag the row first: a crash mid-write must not leave the
+                # old key's tag on the new vector.
+                self._tags[row] = 0
+                self._matrix[row] = vector
+                self._tags[row] = self._tag(key)
+
+    def flush(self):
+        if not self.path or self._matrix is None:
+            return
+        with self._lock:
+            self._matrix.flush()
+            self._tags.flush()
+            tmp = self._index_file() + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(list(self._rows.items()), f)
+            os.replace(tmp, self._index_file())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._rows),
+            "max_entries": self.max_entries,
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model with an EmbeddingStore. Lookups are batched so
+    only the misses (deduplicated) are sent to the underlying model. Keys
+    include the model name and whether the text is a query or a document,
+    since the two are embedded with different task types.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, store: EmbeddingStore):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _split(self, kind: str, texts: list[str]):
+        keys = [self._key(kind, t) for t in texts]
+        vectors = self.store.get_many(keys)
+        missing = OrderedDict()
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        return keys, vectors, missing
+
+    def _merge(self, keys, vectors, missing, fresh):
+        self.store.put_many(list(missing.keys()), fresh)
+        by_key = dict(zip(missing.keys(), fresh))
+        return [v if v is not None else list(by_key[k]) for k, v in zip(keys, vectors)]
+
+    def embed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        keys, vectors, missing = self._split("document", texts)
+        fresh = self.underlying.embed_documents(list(missing.values()), **kwargs) if missing else []
+        return self._merge(keys, vectors, missing, fresh)
+
+    async def aembed_documents(self, texts: list[str], **kwargs) -> list[list[float]]:
+        keys, vectors, missing = self._split("document", texts)
+        fresh = await self.underlying.aembed_documents(list(missing.values()), **kwargs) if missing else []
+        return self._merge(keys, vectors, missing, fresh)
+
+    def embed_query(self, text: str) -> list[float]:
+        keys, vectors, missing = self._split("query", [text])
+        fresh = [self.underlying.embed_query(text)] if missing else []
+        return self._merge(keys, vectors, missing, fresh)[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        keys, vectors, missing = self._split("query", [text])
+        fresh = [await self.underlying.aembed_query(text)] if missing else []
+        return self._merge(keys, vectors, missing, fresh)[0]
+
+def build_cached_embeddings(underlying: Embeddings, model_name: str) -> Embeddings:
+    """Wraps `underlying` unless EMBEDDING_CACHE_ENABLED=0."""
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "1":
+        return underlying
+    store = EmbeddingStore(
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000")),
+        path=os.getenv("EMBEDDING_CACHE_DIR") or None
+    )
+    return CachedEmbeddings(underlying, model_name, store)
@@ -0,0 +1,18 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking SDK calls (Firestore, Pinecone, PyPDF, requests) are pushed onto this
+# bounded pool so a slow upstream never stalls the uvicorn event loop.
+MAX_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="blocking-io")
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking callable on the shared I/O pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_executor(wait: bool = True):
+    _executor.shutdown(wait=wait)
@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import random
+import threading
+from services.telemetry import get_logger
+
+logger = get_logger("history_writer")
+
+class HistoryWriter:
+    """
+    Write-behind buffer for generation history.
+
+    Callers pre-allocate a document reference, hand the record over with
+    submit() and return the id immediately; a background thread groups
+    pending records into Firestore WriteBatch commits of up to `batch_size`,
+    flushing whenever a batch fills up or `flush_interval` seconds after its
+    first record arrived. Failed commits are retried with backoff; a batch
+    that still fails is split and its records written one by one. The queue
+    is bounded by `max_pending`: when it is full submit() returns False and
+    the caller should write synchronously instead.
+    """
+
+    def __init__(self, db, batch_size: int = 100, flush_interval: float = 0.5,
+                 max_pending: int = 2000, max_retries: int = 3, backoff_seconds: float = 0.5):
+        self.db = db
+        # Firestore caps a WriteBatch at 500 writes.
+        self.batch_size = min(batch_size, 500)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._in_flight = set()
+        self._discarded = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.metrics = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "split_batches": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "high_water_mark": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, doc_ref, record: dict) -> bool:
+        """Queues a record for doc_ref. Returns False (and counts a rejection) when full or closed."""
+        if self._closed:
+            return False
+        self._ensure_thread()
+        with self._lock:
+            self._pending[doc_ref.id] = record
+        try:
+            self._queue.put_nowait(doc_ref)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(doc_ref.id, None)
+                self.metrics["rejected"] += 1
+            return False
+        with self._lock:
+            self.metrics["submitted"] += 1
+            self.metrics["high_water_mark"] = max(self.metrics["high_water_mark"], self._queue.qsize())
+        return True
+
+    def pending_record(self, doc_id: str) -> dict | None:
+        """A record that was accepted but not yet committed (read-your-writes)."""
+        with self._lock:
+            return self._pending.get(doc_id)
+
+    def discard(self, doc_id: str) -> bool:
+        """
+        Drops a not-yet-committed record, e.g. when it is deleted right after
+        creation. If its batch is already being committed, the document is
+        deleted once that commit lands.
+        """
+        with self._lock:
+            if self._pending.pop(doc_id, None) is None:
+                return False
+            if doc_id in self._in_flight:
+                self._discarded.add(doc_id)
+            return True
+
+    def _collect(self, first) -> list:
+        refs = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(refs) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: flush what we have, then stop.
+                self._queue.put_nowait(None)
+                break
+            refs.append(item)
+        return refs
+
+    def _commit(self, refs: list):
+        with self._lock:
+            writes = [(ref, self._pending[ref.id]) for ref in refs if ref.id in self._pending]
+            self._in_flight.update(ref.id for ref, _ in writes)
+        if not writes:
+            return
+        try:
+            self._commit_with_retries(writes)
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(ref.id for ref, _ in writes)
+
+    def _commit_batch(self, writes: list, retries: int) -> Exception | None:
+        """Commits `writes` as one WriteBatch; returns the last error if every attempt failed."""
+        for attempt in range(retries + 1):
+            try:
+                batch = self.db.batch()
+                for ref, record in writes:
+                    batch.set(ref, record)
+                batch.commit()
+                return None
+            except Exception as e:
+                if attempt == retries:
+                    return e
+                with self._lock:
+                    self.metrics["retries"] += 1
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+
+    def _commit_with_retries(self, writes: list):
+        start = time.perf_counter()
+        error = self._commit_batch(writes, self.max_retries)
+        if error is None:
+            committed, failed, commits = writes, [], 1
+        elif len(writes) == 1:
+            committed, failed, commits = [], writes, 0
+        else:
+            # One bad record must not take the rest of the batch down with it:
+            # write them one at a time and drop only the ones that still fail.
+            logger.warning("History batch of %s failed after %s attempts (%s), writing records one by one",
+                           len(writes), self.max_retries + 1, error)
+            committed, failed = [], []
+            for write in writes:
+                record_error = self._commit_batch([write], 0)
+                if record_error is None:
+                    committed.append(write)
+                else:
+                    failed.append(write)
+                    error = record_error
+            commits = len(committed)
+            with self._lock:
+                self.metrics["split_batches"] += 1
+        if failed:
+            logger.error("%s history records dropped: %s", len(failed), error)
+        with self._lock:
+            for ref, _ in failed:
+                self._pending.pop(ref.id, None)
+                self._discarded.discard(ref.id)
+            self.metrics["dropped"] += len(failed)
+            for ref, _ in committed:
+                self._pending.pop(ref.id, None)
+            self.metrics["written"] += len(committed)
+            self.metrics["batches"] += commits
+            self.metrics["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            discarded = [ref for ref, _ in committed if ref.id in self._discarded]
+            self._discarded.difference_update(ref.id for ref in discarded)
+        for ref in discarded:
+            try:
+                ref.delete()
+            except Exception as e:
+                logger.warning("Could not delete discarded history item %s: %s", ref.id, e)
+
+    def _work(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._commit(self._collect(first))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.metrics,
+                "pending": self._queue.qsize(),
+                "max_pending": self.max_pending,
+                "utilization": round(self._queue.qsize() / self.max_pending, 4),
+            }
+
+    def close(self, timeout: float = 10.0):
+        """Stops accepting records and flushes everything still queued."""
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        if self._pending:
+            logger.warning("%s history records were not flushed on shutdown", len(self._pending))
+
+def build_history_writer(db) -> HistoryWriter | None:
+    """None when HISTORY_WRITE_BEHIND=0, in which case history is written inline."""
+    if os.getenv("HISTORY_WRITE_BEHIND", "1") != "1":
+        return None
+    return HistoryWriter(
+        db,
+        batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "100")),
+        flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "500")) / 1000,
+        max_pending=int(os.getenv("HISTORY_MAX_PENDING", "2000")),
+        max_retries=int(os.getenv("HISTORY_MAX_RETRIES", "3")),
+    )
@@ -1,39 +1,132 @@
 import os
-import requests
-import json
-from google.oauth2 import service_account
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import time
+import asyncio
+import hashlib
+import httpx
+from collections import OrderedDict
+from contextlib import nullcontext
 from langchain_core.messages import HumanMessage
+from services.cache import InMemoryCache, build_cache_backend
+from services.admission import AdmissionRejected
+from services.telemetry import get_logger, span
+
+PEXELS_TIMEOUT_SECONDS = float(os.getenv("PEXELS_TIMEOUT_SECONDS", "8"))
+# Photo URLs for a query page are stable for hours; refined search terms for much longer.
+PEXELS_RESULT_TTL_SECONDS = float(os.getenv("PEXELS_RESULT_TTL_SECONDS", "3600"))
+SEARCH_TERM_TTL_SECONDS = float(os.getenv("IMAGE_SEARCH_TERM_TTL_SECONDS", "86400"))
+# How many pages past the one just served to fetch speculatively (0 disables, max 2).
+PREFETCH_DEPTH = min(2, int(os.getenv("IMAGE_PREFETCH_DEPTH", "1")))
+PREFETCH_MAX_PAGES = int(os.getenv("IMAGE_PREFETCH_MAX_PAGES", "256"))
+PREFETCH_TTL_SECONDS = float(os.getenv("IMAGE_PREFETCH_TTL_SECONDS", "300"))
+# After Pexels answers 429, prefetching stops for this long; user-driven fetches continue.
+PREFETCH_RATE_LIMIT_PAUSE_SECONDS = 60.0
+# A search term that takes longer than this is not worth waiting for: the raw topic is used instead.
+SEARCH_TERM_TIMEOUT_SECONDS = float(os.getenv("IMAGE_SEARCH_TERM_TIMEOUT_SECONDS", "2"))
+
+logger = get_logger("images")
+
+class PrefetchBuffer:
+    """
+    Speculatively fetched pages, grouped per (query, per_page). Holds at most
+    `max_pages_per_query` pages per query and `max_pages` overall; whatever
+    is evicted or expires before being served is counted as wasted.
+    """
+
+    def __init__(self, max_pages: int = 256, max_pages_per_query: int = 2, ttl_seconds: float = 300):
+        self.max_pages = max_pages
+        self.max_pages_per_query = max_pages_per_query
+        self.ttl_seconds = ttl_seconds
+        self._queries = OrderedDict()
+        self._size = 0
+        self.wasted = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item):
+        key, page = item
+        return page in self._queries.get(key, {})
+
+    def put(self, key: str, page: int, urls: list[str]):
+        pages = self._queries.setdefault(key, {})
+        self._queries.move_to_end(key)
+        if page not in pages:
+            self._size += 1
+        pages[page] = (urls, time.monotonic() + self.ttl_seconds)
+        while len(pages) > self.max_pages_per_query:
+            # Keep the pages closest to where the user is now.
+            del pages[max(pages)]
+            self._size -= 1
+            self.wasted += 1
+        while self._size > self.max_pages:
+            _, oldest = self._queries.popitem(last=False)
+            self._size -= len(oldest)
+            self.wasted += len(oldest)
+
+    def pop(self, key: str, page: int) -> list[str] | None:
+        pages = self._queries.get(key)
+        if not pages or page not in pages:
+            return None
+        urls, expires_at = pages.pop(page)
+        self._size -= 1
+        # Pages behind the one being read will not be asked for again.
+        for stale in [p for p in pages if p < page]:
+            del pages[stale]
+            self._size -= 1
+            self.wasted += 1
+        if not pages:
+            del self._queries[key]
+        if expires_at < time.monotonic():
+            self.wasted += 1
+            return None
+        return urls
 
 class ImageService:
-    def __init__(self):
+    def __init__(self, llm=None, llm_limiter=None, limiter=None, llm_policy=None):
         self.api_key = os.getenv("PEXELS_API_KEY")
-        self.base_url = "https://api.pexels.com/v1/search"
-        
-        google_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-        self.llm = None
-        
-        if google_creds_json:
-            try:
-                creds_dict = json.loads(google_creds_json)
-                creds = service_account.Credentials.from_service_account_info(
-                    creds_dict,
-                    scopes=["https://www.googleapis.com/auth/cloud-platform"]
-                )
-                
-                self.llm = ChatGoogleGenerativeAI(
-                    model="gemini-2.5-flash", 
-                    credentials=creds
-                )
-            except Exception as e:
-                print(f"Warning: Could not init Gemini in ImageService: {e}")
-        else:
-            print("Warning: GOOGLE_APPLICATION_CREDENTIALS not found for ImageService")
-
-    def _generate_search_term(self, user_query: str) -> str:
+        self.base_url = os.getenv("PEXELS_BASE_URL", "https://api.pexels.com/v1/search")
+        # Shared Gemini client from the service registry; without it the raw
+        # topic is used as the search query.
+        self.llm = llm
         if not self.llm:
-            return user_query
+            logger.warning("No Gemini client for ImageService, search terms will not be refined")
+        # Optional UpstreamLimiters for Gemini and Pexels calls, and the
+        # ResiliencePolicy (deadline, breaker) for search-term refinements.
+        self.llm_limiter = llm_limiter
+        self.limiter = limiter
+        self.llm_policy = llm_policy
+
+        # One pooled keep-alive client for every Pexels call.
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": self.api_key or ""},
+            timeout=httpx.Timeout(PEXELS_TIMEOUT_SECONDS, connect=3.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0),
+        )
+        self.search_terms = InMemoryCache(max_entries=2048, ttl_seconds=SEARCH_TERM_TTL_SECONDS)
+        self.results = build_cache_backend(
+            "pexels", int(os.getenv("PEXELS_CACHE_MAX_ENTRIES", "2048")), PEXELS_RESULT_TTL_SECONDS
+        )
+        # Concurrent requests for the same topic share one refinement call.
+        self._term_tasks = {}
+        self.prefetch_depth = PREFETCH_DEPTH
+        self.prefetched = PrefetchBuffer(PREFETCH_MAX_PAGES, max(1, PREFETCH_DEPTH), PREFETCH_TTL_SECONDS)
+        self._prefetch_tasks = {}
+        self._prefetch_paused_until = 0.0
+        self.stats = {
+            "term_hits": 0, "term_misses": 0, "term_fallbacks": 0, "result_hits": 0, "result_misses": 0, "fetch_errors": 0,
+            "prefetch_issued": 0, "prefetch_hits": 0, "prefetch_errors": 0, "prefetch_skipped": 0,
+        }
 
+    @staticmethod
+    def _topic_key(user_query: str) -> str:
+        return re.sub(r"\s+", " ", user_query).strip().casefold()
+
+    @staticmethod
+    def _result_key(query: str, page: int, per_page: int) -> str:
+        return hashlib.sha256(f"{query.casefold()}\0{page}\0{per_page}".encode("utf-8")).hexdigest()
+
+    async def _refine_search_term(self, user_query: str) -> str:
         try:
             prompt = (
                 f"Act as a search engine optimizer for a stock photo site (Pexels). "
@@ -42,36 +135,157 @@ class ImageService:
                 f"Return ONLY the keywords. \n\n"
                 f"Topic: {user_query}"
             )
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            started = time.monotonic()
+            async with self.llm_limiter.slot(SEARCH_TERM_TIMEOUT_SECONDS) if self.llm_limiter else nullcontext():
+                remaining = SEARCH_TERM_TIMEOUT_SECONDS - (time.monotonic() - started)
+                if remaining <= 0:
+                    # The wait for a slot used up the budget: don't start a call we won't wait for.
+                    raise TimeoutError("no time left to refine the search term")
+                if self.llm_policy:
+                    response = await self.llm_policy.call(
+                        lambda: self.llm.ainvoke([HumanMessage(content=prompt)]), timeout=remaining
+                    )
+                else:
+                    response = await asyncio.wait_for(self.llm.ainvoke([HumanMessage(content=prompt)]), remaining)
             cleaned_query = response.content.strip().replace('"', '').replace("'", "")
-            print(f"Refined Image Query: '{user_query}' -> '{cleaned_query}'")
-            return cleaned_query
+            logger.debug("Refined image query %r -> %r", user_query, cleaned_query)
+            return cleaned_query or user_query
         except Exception as e:
-            print(f"Error generating search term (using fallback): {e}")
+            logger.warning("Error generating search term (using fallback): %s", e)
+            self.stats["term_fallbacks"] += 1
+            if self.llm_policy:
+                self.llm_policy.record_fallback()
+            return None
+
+    async def _generate_search_term(self, user_query: str) -> str:
+        if not self.llm:
             return user_query
 
-    def get_images(self, query: str, per_page: int = 5, page: int = 1):
-        if not self.api_key:
-            print("WARNING: PEXELS_API_KEY not found in .env")
-            return []
+        key = self._topic_key(user_query)
+        cached = self.search_terms.get(key)
+        if cached:
+            self.stats["term_hits"] += 1
+            return cached
 
-        optimized_query = self._generate_search_term(query)
+        self.stats["term_misses"] += 1
+        task = self._term_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refine_search_term(user_query))
+            self._term_tasks[key] = task
+            task.add_done_callback(lambda _: self._term_tasks.pop(key, None))
+        term = await asyncio.shield(task)
+        if term is None:
+            # Failed refinements are not cached, so the next page retries.
+            return user_query
+        self.search_terms.set(key, term)
+        return term
 
-        headers = {"Authorization": self.api_key}
+    async def _request_page(self, optimized_query: str, per_page: int, page: int) -> list[str]:
         params = {
-            "query": optimized_query, 
-            "per_page": per_page, 
+            "query": optimized_query,
+            "per_page": per_page,
             "page": page,
             "orientation": "landscape"
         }
-        
+        response = await self.client.get(self.base_url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        return [photo["src"]["medium"] for photo in data.get("photos", [])]
+
+    async def _fetch_page(self, optimized_query: str, per_page: int, page: int) -> list[str]:
+        async with self.limiter.slot() if self.limiter else nullcontext():
+            return await self._request_page(optimized_query, per_page, page)
+
+    async def _prefetch(self, optimized_query: str, per_page: int, page: int, slot=None):
+        key = self._result_key(optimized_query, 0, per_page)
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            image_urls = [photo["src"]["medium"] for photo in data.get("photos", [])]
-            return image_urls
+            urls = await self._request_page(optimized_query, per_page, page)
+            self.prefetched.put(key, page, urls)
         except Exception as e:
-            print(f"Error fetching images: {e}")
-            return []
\ No newline at end of file
+            self.stats["prefetch_errors"] += 1
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+                self._prefetch_paused_until = time.monotonic() + PREFETCH_RATE_LIMIT_PAUSE_SECONDS
+                logger.warning("Pexels rate limit hit, pausing image prefetch")
+        finally:
+            if slot is not None:
+                slot.release()
+            self._prefetch_tasks.pop((key, page), None)
+
+    async def _schedule_prefetch(self, optimized_query: str, per_page: int, page: int, urls: list[str]):
+        # A short page means there is nothing after it.
+        if self.prefetch_depth <= 0 or len(urls) < per_page or time.monotonic() < self._prefetch_paused_until:
+            return
+        key = self._result_key(optimized_query, 0, per_page)
+        for next_page in range(page + 1, page + 1 + self.prefetch_depth):
+            if (key, next_page) in self.prefetched or (key, next_page) in self._prefetch_tasks:
+                continue
+            if await self.results.aget(self._result_key(optimized_query, next_page, per_page)) is not None:
+                continue
+            # Speculative fetches never queue for Pexels behind real requests.
+            slot = self.limiter.try_acquire() if self.limiter else None
+            if self.limiter and slot is None:
+                self.stats["prefetch_skipped"] += 1
+                return
+            self.stats["prefetch_issued"] += 1
+            self._prefetch_tasks[(key, next_page)] = asyncio.ensure_future(
+                self._prefetch(optimized_query, per_page, next_page, slot)
+            )
+
+    async def _take_prefetched(self, optimized_query: str, per_page: int, page: int) -> list[str] | None:
+        key = self._result_key(optimized_query, 0, per_page)
+        task = self._prefetch_tasks.get((key, page))
+        if task is not None:
+            # The user caught up with an in-flight prefetch: wait for it rather than fetch twice.
+            await asyncio.shield(task)
+        urls = self.prefetched.pop(key, page)
+        if urls is not None:
+            self.stats["prefetch_hits"] += 1
+        return urls
+
+    async def get_images(self, query: str, per_page: int = 5, page: int = 1):
+        if not self.api_key:
+            logger.warning("PEXELS_API_KEY not found in .env")
+            return []
+
+        with span("search_term"):
+            optimized_query = await self._generate_search_term(query)
+        key = self._result_key(optimized_query, page, per_page)
+        image_urls = await self._take_prefetched(optimized_query, per_page, page)
+        if image_urls is not None:
+            await self.results.aset(key, image_urls)
+        else:
+            image_urls = await self.results.aget(key)
+            if image_urls is not None:
+                self.stats["result_hits"] += 1
+            else:
+                self.stats["result_misses"] += 1
+                try:
+                    with span("pexels_fetch"):
+                        image_urls = await self._fetch_page(optimized_query, per_page, page)
+                    await self.results.aset(key, image_urls)
+                except AdmissionRejected:
+                    raise
+                except Exception as e:
+                    self.stats["fetch_errors"] += 1
+                    logger.error("Error fetching images: %s", e)
+                    return []
+
+        await self._schedule_prefetch(optimized_query, per_page, page, image_urls)
+        return image_urls
+
+    def cache_stats(self) -> dict:
+        issued = self.stats["prefetch_issued"]
+        return {
+            **self.stats,
+            "prefetch_wasted": self.prefetched.wasted,
+            "prefetch_hit_rate": round(self.stats["prefetch_hits"] / issued, 4) if issued else 0.0,
+            "prefetch_buffered_pages": len(self.prefetched),
+            "prefetch_in_flight": len(self._prefetch_tasks),
+            "search_terms": len(self.search_terms),
+            "result_pages": len(self.results),
+        }
+
+    async def aclose(self):
+        for task in list(self._prefetch_tasks.values()):
+            task.cancel()
+        await self.client.aclose()
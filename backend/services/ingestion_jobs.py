@@ -0,0 +1,142 @@
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from services.telemetry import get_logger
+
+logger = get_logger("ingestion_jobs")
+
+class QueueFullError(Exception):
+    """Raised when the pending-job queue is at capacity."""
+
+@dataclass
+class IngestionJob:
+    uid: str
+    filename: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued | running | completed | failed
+    stage: str = "queued"   # queued | extracting | embedding | done
+    chunks_total: int = 0
+    chunks_processed: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    embedding_started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    result: dict = field(default_factory=dict)
+
+    def set_stage(self, stage: str):
+        self.stage = stage
+        if stage == "embedding":
+            self.embedding_started_at = time.time()
+
+    def add_progress(self, n: int):
+        self.chunks_processed += n
+
+    def snapshot(self) -> dict:
+        throughput = 0.0
+        if self.embedding_started_at and self.chunks_processed:
+            elapsed = (self.finished_at or time.time()) - self.embedding_started_at
+            throughput = round(self.chunks_processed / elapsed, 2) if elapsed > 0 else 0.0
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "chunks_total": self.chunks_total,
+            "chunks_processed": self.chunks_processed,
+            "chunks_per_second": throughput,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            **self.result,
+        }
+
+class IngestionJobQueue:
+    """
+    In-process job queue with a fixed pool of worker threads.
+
+    `handler(job, payload)` runs on a worker thread and is responsible for
+    moving the job through its stages. Pending jobs are bounded by
+    `max_pending` so a burst of uploads is rejected instead of buffered in
+    memory, and finished jobs are kept (up to `max_retained`) for polling.
+    """
+
+    def __init__(self, handler, workers: int = 2, max_pending: int = 16, max_retained: int = 500):
+        self.handler = handler
+        self.workers = workers
+        self.max_retained = max_retained
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingestion-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, job: IngestionJob, payload) -> IngestionJob:
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((job, payload))
+        except queue.Full:
+            raise QueueFullError("Ingestion queue is full, try again shortly")
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_retained:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.status in ("queued", "running"):
+                    break
+                del self._jobs[oldest_id]
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            job, payload = item
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self.handler(job, payload) or {}
+                job.status = "completed"
+                job.stage = "done"
+            except Exception as e:
+                logger.error("Ingestion job %s failed: %s", job.id, e)
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+def build_ingestion_queue(handler) -> IngestionJobQueue:
+    return IngestionJobQueue(
+        handler,
+        workers=int(os.getenv("INGESTION_WORKERS", "2")),
+        max_pending=int(os.getenv("INGESTION_MAX_PENDING", "16")),
+    )
@@ -0,0 +1,85 @@
+import hashlib
+import datetime
+import threading
+
+def source_key(filename: str) -> str:
+    return hashlib.sha256((filename or "").encode("utf-8")).hexdigest()[:16]
+
+def chunk_id(filename: str, text: str) -> str:
+    """Deterministic vector id: the same chunk of the same file always maps to the same id."""
+    return f"{source_key(filename)}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+# Ids are ~50 bytes, so a shard stays far below Firestore's 1 MiB document limit.
+MANIFEST_SHARD_SIZE = 5000
+# Firestore caps a WriteBatch at 500 writes.
+MAX_BATCH_WRITES = 500
+
+class FirestoreManifestStore:
+    """
+    Per-namespace record of which chunk ids are stored for each source file,
+    kept at knowledge_manifests/{namespace}/sources/{source_key}. The ids are
+    split across shard documents in that document's `shards` subcollection,
+    so large files never outgrow Firestore's document size limit.
+    """
+
+    def __init__(self, db, shard_size: int = MANIFEST_SHARD_SIZE):
+        self.db = db
+        self.shard_size = shard_size
+
+    def _doc(self, namespace: str, key: str):
+        return self.db.collection("knowledge_manifests").document(namespace).collection("sources").document(key)
+
+    def load(self, namespace: str, key: str) -> set[str]:
+        source = self._doc(namespace, key)
+        doc = source.get()
+        if not doc.exists:
+            return set()
+        data = doc.to_dict()
+        if "chunk_ids" in data:
+            # Written before manifests were sharded.
+            return set(data["chunk_ids"])
+        refs = [source.collection("shards").document(str(i)) for i in range(data.get("shards", 0))]
+        ids = set()
+        for shard in self.db.get_all(refs):
+            if shard.exists:
+                ids.update(shard.to_dict().get("chunk_ids", []))
+        return ids
+
+    def save(self, namespace: str, key: str, filename: str, ids: list[str]):
+        source = self._doc(namespace, key)
+        previous = source.get()
+        stale = previous.to_dict().get("shards", 0) if previous.exists else 0
+        shards = [ids[i:i + self.shard_size] for i in range(0, len(ids), self.shard_size)]
+
+        writes = [(source.collection("shards").document(str(i)), {"chunk_ids": shard}) for i, shard in enumerate(shards)]
+        writes += [(source.collection("shards").document(str(i)), None) for i in range(len(shards), stale)]
+        # The source document goes last, so it never points at shards that were not written yet.
+        writes.append((source, {
+            "filename": filename,
+            "chunk_count": len(ids),
+            "shards": len(shards),
+            "updated_at": datetime.datetime.now(datetime.timezone.utc)
+        }))
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for ref, data in writes[start:start + MAX_BATCH_WRITES]:
+                if data is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data)
+            batch.commit()
+
+class InMemoryManifestStore:
+    """Process-local manifest for running without Firestore."""
+
+    def __init__(self):
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def load(self, namespace: str, key: str) -> set[str]:
+        with self._lock:
+            return set(self._manifests.get((namespace, key), {}).get("chunk_ids", []))
+
+    def save(self, namespace: str, key: str, filename: str, ids: list[str]):
+        with self._lock:
+            self._manifests[(namespace, key)] = {"filename": filename, "chunk_ids": list(ids)}
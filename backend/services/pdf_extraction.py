@@ -0,0 +1,143 @@
+import os
+import mmap
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from services.executor import run_blocking
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Below this many pages the process pool's startup/pickling cost outweighs the gain.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process is multi-threaded.
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+async def spool_upload(upload, suffix: str = "") -> str:
+    """Copies an UploadFile to a named temp file in 1 MiB blocks and returns its path."""
+    def copy():
+        upload.file.seek(0)
+        with tempfile.NamedTemporaryFile(delete=False, prefix="upload-", suffix=suffix) as out:
+            shutil.copyfileobj(upload.file, out, length=1 << 20)
+            return out.name
+    return await run_blocking(copy)
+
+def _open_mapped(path: str):
+    handle = open(path, "rb")
+    try:
+        return handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception:
+        handle.close()
+        raise
+
+def _extract_page_range(path: str, start: int, end: int) -> list[str]:
+    """Process-pool task: extracts pages [start, end) from the memory-mapped PDF."""
+    handle, mapped = _open_mapped(path)
+    try:
+        reader = PdfReader(mapped)
+        return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+    finally:
+        mapped.close()
+        handle.close()
+
+def iter_pdf_pages(path: str):
+    """
+    Yields page texts in document order. Large PDFs are split into page ranges
+    extracted in parallel across the process pool, with a bounded number of
+    ranges in flight so memory stays flat regardless of document size.
+    """
+    handle, mapped = _open_mapped(path)
+    try:
+        reader = PdfReader(mapped)
+        page_count = len(reader.pages)
+        if page_count < PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+    finally:
+        mapped.close()
+        handle.close()
+
+    pool = _get_pool()
+    ranges = [(i, min(i + PAGES_PER_TASK, page_count)) for i in range(0, page_count, PAGES_PER_TASK)]
+    window = PDF_EXTRACT_WORKERS * 2
+    in_flight = [pool.submit(_extract_page_range, path, start, end) for start, end in ranges[:window]]
+    next_range = len(in_flight)
+    try:
+        while in_flight:
+            pages = in_flight.pop(0).result()
+            if next_range < len(ranges):
+                start, end = ranges[next_range]
+                in_flight.append(pool.submit(_extract_page_range, path, start, end))
+                next_range += 1
+            yield from pages
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+def iter_text_file(path: str, encoding: str = "utf-8", block_chars: int = 1 << 20):
+    """
+    Yields a text file in blocks of about `block_chars` characters, so memory
+    stays flat however large the upload. Blocks end at a line break, which is
+    left out: iter_chunks puts a newline back between the texts it is fed.
+    A line longer than a block is cut where the block ends.
+    """
+    carry = ""
+    with open(path, "r", encoding=encoding) as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                break
+            text = carry + block
+            cut = text.rfind("\n")
+            if cut < 0:
+                carry = ""
+                yield text
+            else:
+                carry = text[cut + 1:]
+                yield text[:cut]
+    if carry:
+        yield carry
+
+def iter_chunks(page_texts, splitter, flush_chars: int = 20000):
+    """
+    Feeds page texts into a text splitter without building the whole document
+    string. Text is buffered until `flush_chars`, split, and every chunk but
+    the last is emitted; the last one is carried into the next buffer so
+    chunks still flow across page boundaries.
+    """
+    buffer = []
+    buffered = 0
+    for text in page_texts:
+        buffer.append(text)
+        buffer.append("\n")
+        buffered += len(text) + 1
+        if buffered >= flush_chars:
+            chunks = splitter.split_text("".join(buffer))
+            yield from chunks[:-1]
+            buffer = [chunks[-1]] if chunks else []
+            buffered = len(buffer[0]) if buffer else 0
+    tail = "".join(buffer)
+    if tail.strip():
+        yield from splitter.split_text(tail)
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from google.oauth2 import service_account
+from services.executor import run_blocking
+from services.telemetry import get_logger
+
+logger = get_logger("registry")
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+class ServiceRegistry:
+    """
+    Process-wide home for the expensive clients (Gemini, Pinecone, embeddings,
+    Firestore, Pexels). Each one is built at most once, either lazily on first
+    use or concurrently during app startup, and then shared by every router.
+    """
+
+    def __init__(self):
+        self._instances = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.timings = {}
+
+    @contextmanager
+    def timed(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _get(self, name: str, factory):
+        if name in self._instances:
+            return self._instances[name]
+        with self._lock_for(name):
+            if name not in self._instances:
+                with self.timed(f"build_{name}"):
+                    try:
+                        self._instances[name] = factory()
+                    except Exception as e:
+                        logger.error("Could not initialize %s: %s", name, e)
+                        self._instances[name] = None
+        return self._instances[name]
+
+    def override(self, **instances):
+        """Replaces clients with pre-built ones (fakes in tests and benchmarks)."""
+        self._instances.update(instances)
+
+    def _build_google_credentials(self):
+        google_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+        if not google_creds_json:
+            logger.error("GOOGLE_APPLICATION_CREDENTIALS missing for Gemini")
+            return None
+        return service_account.Credentials.from_service_account_info(
+            json.loads(google_creds_json),
+            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+
+    def _build_llm(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        if not self.google_credentials:
+            return None
+        return ChatGoogleGenerativeAI(
+            model=GEMINI_MODEL,
+            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+            credentials=self.google_credentials
+        )
+
+    def _build_chains(self):
+        from services.chains import build_chains
+
+        return build_chains(self.llm)
+
+    def _build_vector_service(self):
+        from services.vector_service import VectorService
+
+        return VectorService(
+            credentials=self.google_credentials,
+            search_limiter=self.admission.upstream("pinecone"),
+            search_policy=self.resilience.policy("pinecone"),
+            embed_policy=self.resilience.policy("embeddings")
+        )
+
+    def _build_image_service(self):
+        from services.image_service import ImageService
+
+        return ImageService(
+            llm=self.llm,
+            llm_limiter=self.admission.upstream("gemini"),
+            limiter=self.admission.upstream("pexels"),
+            llm_policy=self.resilience.policy("gemini_search_term")
+        )
+
+    def _build_admission(self):
+        from services.admission import build_admission_controller
+
+        return build_admission_controller()
+
+    def _build_resilience(self):
+        from services.resilience import build_resilience
+
+        return build_resilience()
+
+    def _build_generation_cache(self):
+        from services.cache import build_generation_cache
+
+        return build_generation_cache()
+
+    def _build_regeneration_cache(self):
+        from services.cache import build_regeneration_cache
+
+        return build_regeneration_cache()
+
+    def _build_manifest_store(self):
+        from services.knowledge_manifest import FirestoreManifestStore, InMemoryManifestStore
+
+        return FirestoreManifestStore(self.db) if self.db else InMemoryManifestStore()
+
+    def _build_token_verifier(self):
+        from services.auth_service import build_token_verifier
+
+        return build_token_verifier()
+
+    def _build_history_writer(self):
+        from services.history_writer import build_history_writer
+
+        return build_history_writer(self.db) if self.db else None
+
+    def _build_db(self):
+        from firebase_admin import firestore
+
+        return firestore.client()
+
+    @property
+    def google_credentials(self):
+        return self._get("google_credentials", self._build_google_credentials)
+
+    @property
+    def llm(self):
+        return self._get("llm", self._build_llm)
+
+    @property
+    def chains(self):
+        return self._get("chains", self._build_chains)
+
+    @property
+    def vector_service(self):
+        return self._get("vector_service", self._build_vector_service)
+
+    @property
+    def image_service(self):
+        return self._get("image_service", self._build_image_service)
+
+    @property
+    def db(self):
+        return self._get("db", self._build_db)
+
+    @property
+    def admission(self):
+        return self._get("admission", self._build_admission)
+
+    @property
+    def resilience(self):
+        return self._get("resilience", self._build_resilience)
+
+    @property
+    def generation_cache(self):
+        return self._get("generation_cache", self._build_generation_cache)
+
+    @property
+    def regeneration_cache(self):
+        return self._get("regeneration_cache", self._build_regeneration_cache)
+
+    @property
+    def token_verifier(self):
+        return self._get("token_verifier", self._build_token_verifier)
+
+    @property
+    def history_writer(self):
+        return self._get("history_writer", self._build_history_writer)
+
+    @property
+    def manifest_store(self):
+        return self._get("manifest_store", self._build_manifest_store)
+
+    def close(self):
+        """
+        Lets built clients persist state (e.g. the embedding cache) on shutdown.
+        Closed in reverse build order, so e.g. the history writer flushes
+        before the Firestore client it depends on goes away.
+        """
+        for name, instance in reversed(list(self._instances.items())):
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning("Error closing %s: %s", name, e)
+
+    async def aclose(self):
+        """close() for use inside the event loop; awaits `aclose()` on async clients."""
+        for name, instance in reversed(list(self._instances.items())):
+            try:
+                if callable(getattr(instance, "aclose", None)):
+                    await instance.aclose()
+                elif callable(getattr(instance, "close", None)):
+                    await run_blocking(instance.close)
+            except Exception as e:
+                logger.warning("Error closing %s: %s", name, e)
+
+    async def warm_up(self):
+        """Builds every client concurrently so the first request pays nothing."""
+        start = time.perf_counter()
+        await asyncio.gather(
+            run_blocking(lambda: self.chains),
+            run_blocking(lambda: self.vector_service),
+            run_blocking(lambda: self.image_service),
+            run_blocking(lambda: self.history_writer),
+        )
+        self.timings["warm_up"] = round((time.perf_counter() - start) * 1000, 2)
+
+registry = ServiceRegistry()
+
+def get_llm():
+    return registry.llm
+
+def get_chains():
+    return registry.chains
+
+def get_vector_service():
+    return registry.vector_service
+
+def get_image_service():
+    return registry.image_service
+
+def get_db():
+    return registry.db
+
+def get_generation_cache():
+    return registry.generation_cache
+
+def get_history_writer():
+    return registry.history_writer
+
+def get_regeneration_cache():
+    return registry.regeneration_cache
@@ -0,0 +1,312 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from fastapi import HTTPException
+from services.telemetry import get_logger, metrics
+
+logger = get_logger("resilience")
+
+# Per-call deadlines. Gemini's covers a whole non-streamed generation, or the
+# first token of a streamed one. Image search-term refinement also calls
+# Gemini but has its own policy: its short deadline and latencies must not
+# trip the generation breaker or skew the generation hedge delay.
+UPSTREAM_TIMEOUTS = {
+    "gemini": float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60")),
+    "gemini_search_term": float(os.getenv("IMAGE_SEARCH_TERM_TIMEOUT_SECONDS", "2")),
+    "embeddings": float(os.getenv("EMBEDDINGS_TIMEOUT_SECONDS", "5")),
+    "pinecone": float(os.getenv("PINECONE_TIMEOUT_SECONDS", "5")),
+}
+# Upstreams that get a second, hedged request once a call outlives the recent p95.
+HEDGED_UPSTREAMS = set(filter(None, os.getenv("HEDGED_UPSTREAMS", "gemini,embeddings,pinecone").split(",")))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05"))
+# Hedges may add at most this fraction of extra calls.
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+# Consecutive failures that open a breaker, and how long it stays open before a probe.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+EVENTS = metrics.counter(
+    "contentflow_resilience_events_total",
+    "Timeouts, hedges, breaker trips, short circuits and fallbacks per upstream.",
+    ("upstream", "event")
+)
+
+class UpstreamUnavailable(HTTPException):
+    """503 with Retry-After, raised without calling an upstream whose breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503, detail=f"{upstream} is unavailable, please retry",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+class DeadlineExceeded(HTTPException):
+    """504, raised when an upstream call misses its deadline."""
+
+    def __init__(self, upstream: str, timeout: float):
+        self.upstream = upstream
+        super().__init__(status_code=504, detail=f"{upstream} did not answer within {timeout:g}s")
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_seconds`; then lets a single probe through (half-open), which
+    closes the breaker on success or re-opens it on failure.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = "closed"
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self):
+        """Raises UpstreamUnavailable if the call must not go out."""
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_seconds - self.clock()
+            if remaining > 0:
+                raise UpstreamUnavailable(self.name, remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                raise UpstreamUnavailable(self.name, 1)
+            self._probing = True
+
+    def check(self):
+        """Raises UpstreamUnavailable while open, without taking the half-open probe."""
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_seconds - self.clock()
+            if remaining > 0:
+                raise UpstreamUnavailable(self.name, remaining)
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        self.state = "closed"
+
+    def record_failure(self) -> bool:
+        """Counts a failure; returns True if it tripped the breaker."""
+        self._failures += 1
+        self._probing = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            tripped = self.state != "open"
+            self.state = "open"
+            self._opened_at = self.clock()
+            self.trips += tripped
+            return tripped
+        return False
+
+    def record_abandoned(self):
+        """The call ended without telling us anything (cancelled, or shed locally)."""
+        self._probing = False
+
+class ResiliencePolicy:
+    """
+    Deadline, hedging and circuit breaking for calls to one upstream. A
+    hedged call sends a second request once the first has been running for
+    the p95 of recent call latencies, and returns whichever answers first.
+    """
+
+    def __init__(self, name: str, timeout: float, hedge: bool = True, breaker: CircuitBreaker | None = None,
+                 window: int = 200, max_hedge_ratio: float = HEDGE_MAX_RATIO):
+        self.name = name
+        self.timeout = timeout
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker(name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+        self.max_hedge_ratio = max_hedge_ratio
+        self.latencies = deque(maxlen=window)
+        self.metrics = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "short_circuited": 0,
+            "hedges_fired": 0, "hedges_won": 0, "hedges_skipped": 0, "fallbacks": 0,
+        }
+
+    def _count(self, event: str):
+        self.metrics[event] += 1
+        EVENTS.inc(upstream=self.name, event=event)
+
+    def hedge_delay(self) -> float | None:
+        if not self.hedge or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return max(HEDGE_MIN_DELAY_SECONDS, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def record_fallback(self):
+        """Called by callers that degrade instead of failing when this upstream does."""
+        self._count("fallbacks")
+
+    def check(self):
+        """Fails fast before any work is done for a call that would be short-circuited anyway."""
+        try:
+            self.breaker.check()
+        except UpstreamUnavailable:
+            self._count("short_circuited")
+            raise
+
+    def _before_call(self):
+        try:
+            self.breaker.before_call()
+        except UpstreamUnavailable:
+            self._count("short_circuited")
+            raise
+        self.metrics["calls"] += 1
+
+    def _success(self, latency: float | None):
+        self.metrics["successes"] += 1
+        self.breaker.record_success()
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def _failure(self, error: Exception):
+        self._count("timeouts" if isinstance(error, DeadlineExceeded) else "failures")
+        if self.breaker.record_failure():
+            EVENTS.inc(upstream=self.name, event="breaker_trips")
+            logger.warning("Circuit breaker for %s opened after: %s", self.name, error)
+
+    async def call(self, factory, timeout: float | None = None, hedge_guard=None):
+        """
+        Awaits `factory()` (a coroutine function; called again for the hedge)
+        within `timeout` seconds. A hedge needs a free slot from `hedge_guard`
+        (an UpstreamLimiter) if one is given, so it never queues behind real
+        requests. Raises UpstreamUnavailable while the breaker is open and
+        DeadlineExceeded when the deadline passes.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._before_call()
+        start = time.monotonic()
+        try:
+            result = await self._attempts(factory, timeout, hedge_guard)
+        except DeadlineExceeded as e:
+            self._failure(e)
+            raise
+        except HTTPException:
+            # Shed by our own admission control: says nothing about the upstream.
+            self.breaker.record_abandoned()
+            raise
+        except Exception as e:
+            self._failure(e)
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        self._success(time.monotonic() - start)
+        return result
+
+    async def _attempts(self, factory, timeout: float, hedge_guard):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        hedge_at = self.hedge_delay()
+        tasks = {asyncio.ensure_future(factory())}
+        hedge_task = None
+        hedge_slot = None
+        first_error = None
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise DeadlineExceeded(self.name, timeout)
+                wait = min(remaining, hedge_at) if hedge_at is not None else remaining
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge_task:
+                            self._count("hedges_won")
+                        return task.result()
+                    first_error = first_error or error
+                if not tasks:
+                    raise first_error
+                if not done and hedge_at is not None:
+                    hedge_at = None
+                    if self.metrics["hedges_fired"] >= self.max_hedge_ratio * self.metrics["calls"]:
+                        self._count("hedges_skipped")
+                        continue
+                    hedge_slot = hedge_guard.try_acquire() if hedge_guard else None
+                    if hedge_guard and hedge_slot is None:
+                        self._count("hedges_skipped")
+                        continue
+                    self._count("hedges_fired")
+                    hedge_task = asyncio.ensure_future(factory())
+                    tasks.add(hedge_task)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if hedge_slot is not None:
+                hedge_slot.release()
+
+    async def stream(self, factory, timeout: float | None = None):
+        """
+        Iterates `factory()` (an async iterator) under the breaker, with the
+        deadline applied to the first item only. Streams are not hedged.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._before_call()
+        iterator = aiter(factory())
+        try:
+            try:
+                async with asyncio.timeout(timeout):
+                    first = await anext(iterator)
+            except TimeoutError:
+                raise DeadlineExceeded(self.name, timeout) from None
+            except StopAsyncIteration:
+                pass
+            else:
+                yield first
+                async for item in iterator:
+                    yield item
+        except DeadlineExceeded as e:
+            self._failure(e)
+            raise
+        except HTTPException:
+            self.breaker.record_abandoned()
+            raise
+        except Exception as e:
+            self._failure(e)
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+        self._success(None)
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            **self.metrics,
+            "breaker_state": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "timeout_seconds": self.timeout,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+        }
+
+class Resilience:
+    """One ResiliencePolicy per upstream."""
+
+    def __init__(self, policies: dict[str, ResiliencePolicy]):
+        self.policies = policies
+
+    def policy(self, name: str) -> ResiliencePolicy:
+        return self.policies[name]
+
+    def stats(self) -> dict:
+        return {name: policy.stats() for name, policy in self.policies.items()}
+
+def build_resilience() -> Resilience:
+    return Resilience({
+        name: ResiliencePolicy(name, timeout, hedge=name in HEDGED_UPSTREAMS)
+        for name, timeout in UPSTREAM_TIMEOUTS.items()
+    })
+
+def get_resilience():
+    from services.registry import registry
+
+    return registry.resilience
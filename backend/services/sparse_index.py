@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import math
+import threading
+from array import array
+from collections import OrderedDict
+import numpy as np
+from services.telemetry import get_logger
+
+logger = get_logger("sparse_index")
+
+_TOKEN = re.compile(r"[0-9a-z]+(?:[._\-+][0-9a-z]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased word tokens. Dotted/hyphenated identifiers ("gpt-4o", "v2.1")
+    are kept whole and also split into parts, so both spellings match.
+    """
+    tokens = []
+    for match in _TOKEN.findall(text.casefold()):
+        if match in _STOPWORDS:
+            continue
+        tokens.append(match)
+        parts = re.split(r"[._\-+]", match)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in _STOPWORDS)
+    return tokens
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """Fuses ranked id lists: score(id) = sum(1 / (k + rank)), best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class BM25Index:
+    """
+    Okapi BM25 over one namespace's chunks.
+
+    Postings are kept per term as two flat int32 arrays (row, term frequency),
+    so the index costs a few bytes per token occurrence and a query is a
+    handful of vectorized numpy updates. Removed chunks are tombstoned and the
+    arrays are rebuilt once tombstones pass a quarter of the rows.
+
+    Optionally also keeps the chunks' float32 embeddings, which lets small
+    namespaces answer dense queries locally as well.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, keep_vectors: bool = True):
+        self.k1 = k1
+        self.b = b
+        self.keep_vectors = keep_vectors
+        self.ids = []
+        self.texts = []
+        self.lengths = array("i")
+        self.alive = array("b")
+        self.postings = {}
+        self.row_of = {}
+        self.vectors = None
+        self._total_length = 0
+        self._dead = 0
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def _index_row(self, row: int, text: str):
+        counts = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            rows, tfs = self.postings.setdefault(token, (array("i"), array("i")))
+            rows.append(row)
+            tfs.append(tf)
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self._total_length += length
+
+    def add(self, ids: list[str], texts: list[str], vectors=None):
+        fresh = [(i, doc_id) for i, doc_id in enumerate(ids) if doc_id not in self.row_of]
+        if not fresh:
+            return
+        if self.keep_vectors and vectors is not None:
+            block = np.asarray([vectors[i] for i, _ in fresh], dtype=np.float32)
+            block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+            self.vectors = block if self.vectors is None else np.vstack([self.vectors, block])
+        else:
+            self.drop_vectors()
+        for i, doc_id in fresh:
+            row = len(self.ids)
+            self.ids.append(doc_id)
+            self.texts.append(texts[i])
+            self.alive.append(1)
+            self.row_of[doc_id] = row
+            self._index_row(row, texts[i])
+
+    def drop_vectors(self):
+        self.keep_vectors = False
+        self.vectors = None
+
+    def remove(self, ids: list[str]):
+        for doc_id in ids:
+            row = self.row_of.pop(doc_id, None)
+            if row is None:
+                continue
+            self.alive[row] = 0
+            self._total_length -= self.lengths[row]
+            self._dead += 1
+        if self._dead and self._dead * 4 > len(self.ids):
+            self._compact()
+
+    def _compact(self):
+        keep = [row for row in range(len(self.ids)) if self.alive[row]]
+        ids = [self.ids[row] for row in keep]
+        texts = [self.texts[row] for row in keep]
+        vectors = self.vectors[keep] if self.vectors is not None else None
+        keep_vectors = self.keep_vectors
+        self.__init__(self.k1, self.b, keep_vectors)
+        self.add(ids, texts, vectors)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        if not self.row_of:
+            return []
+        n_rows = len(self.ids)
+        n_docs = len(self.row_of)
+        lengths = np.frombuffer(self.lengths, dtype=np.int32).astype(np.float32)
+        avg_length = self._total_length / n_docs or 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        scores = np.zeros(n_rows, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            rows = np.frombuffer(posting[0], dtype=np.int32)
+            tfs = np.frombuffer(posting[1], dtype=np.int32).astype(np.float32)
+            idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+        scores[np.frombuffer(self.alive, dtype=np.int8) == 0] = 0
+        return self._top(scores, k)
+
+    def dense_search(self, vector, k: int) -> list[tuple[str, float]]:
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.vectors @ query
+        scores[np.frombuffer(self.alive, dtype=np.int8) == 0] = -np.inf
+        return self._top(scores, k, positive_only=False)
+
+    def _top(self, scores, k: int, positive_only: bool = True) -> list[tuple[str, float]]:
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self.ids[row], float(scores[row]))
+            for row in top
+            if self.alive[row] and (scores[row] > 0 or not positive_only)
+        ]
+
+    def text(self, doc_id: str) -> str:
+        return self.texts[self.row_of[doc_id]]
+
+    def save(self, path: str):
+        keep = [row for row in range(len(self.ids)) if self.alive[row]]
+        tmp = path + ".tmp.json"
+        with open(tmp, "w") as f:
+            json.dump({"ids": [self.ids[r] for r in keep], "texts": [self.texts[r] for r in keep]}, f)
+        os.replace(tmp, path + ".json")
+        if self.vectors is not None:
+            np.save(path + ".vectors.npy", self.vectors[keep])
+        elif os.path.exists(path + ".vectors.npy"):
+            os.unlink(path + ".vectors.npy")
+
+    @classmethod
+    def load(cls, path: str, keep_vectors: bool = True) -> "BM25Index":
+        with open(path + ".json") as f:
+            data = json.load(f)
+        vectors = None
+        if os.path.exists(path + ".vectors.npy"):
+            vectors = np.load(path + ".vectors.npy", mmap_mode="r")
+        index = cls(keep_vectors=keep_vectors and vectors is not None)
+        index.add(data["ids"], data["texts"], vectors)
+        return index
+
+class SparseIndexStore:
+    """
+    One BM25Index per namespace, kept in sync by the ingestion path.
+
+    Embeddings are only retained for namespaces of up to `local_max_chunks`;
+    once a namespace grows past that it keeps text only. The store holds at
+    most `max_chunks` chunks in total and evicts the least recently used
+    namespaces beyond that. With `path` set each namespace is saved there on
+    flush() (and before eviction) and reloaded on first use.
+    """
+
+    def __init__(self, local_max_chunks: int = 500, path: str | None = None, max_chunks: int = 200000):
+        self.local_max_chunks = local_max_chunks
+        self.path = path
+        self.max_chunks = max_chunks
+        self._indexes = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _file(self, namespace: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_-]", "_", namespace)
+        return os.path.join(self.path, safe)
+
+    def _evict(self, keep: str):
+        """Drops least recently used namespaces until the store fits. Caller holds the lock."""
+        total = sum(len(i) for i in self._indexes.values())
+        while total > self.max_chunks and len(self._indexes) > 1:
+            namespace = next(ns for ns in self._indexes if ns != keep)
+            index = self._indexes.pop(namespace)
+            if namespace in self._dirty and self.path:
+                try:
+                    os.makedirs(self.path, exist_ok=True)
+                    index.save(self._file(namespace))
+                except Exception as e:
+                    logger.warning("Could not save evicted sparse index for %s: %s", namespace, e)
+            self._dirty.discard(namespace)
+            total -= len(index)
+            self.evictions += 1
+
+    def get(self, namespace: str) -> BM25Index | None:
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is not None:
+                self._indexes.move_to_end(namespace)
+            elif self.path and os.path.exists(self._file(namespace) + ".json"):
+                try:
+                    index = BM25Index.load(self._file(namespace))
+                    self._indexes[namespace] = index
+                    self._evict(keep=namespace)
+                except Exception as e:
+                    logger.warning("Could not load sparse index for %s: %s", namespace, e)
+            return index
+
+    def add(self, namespace: str, ids: list[str], texts: list[str], vectors=None):
+        self.get(namespace)
+        with self._lock:
+            index = self._indexes.setdefault(namespace, BM25Index())
+            index.add(ids, texts, vectors)
+            if index.keep_vectors and len(index) > self.local_max_chunks:
+                index.drop_vectors()
+            self._dirty.add(namespace)
+            self._evict(keep=namespace)
+
+    def remove(self, namespace: str, ids: list[str]):
+        self.get(namespace)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is not None:
+                index.remove(ids)
+                self._dirty.add(namespace)
+
+    def replace(self, namespace: str, index: BM25Index):
+        with self._lock:
+            if index.keep_vectors and len(index) > self.local_max_chunks:
+                index.drop_vectors()
+            self._indexes[namespace] = index
+            self._indexes.move_to_end(namespace)
+            self._dirty.add(namespace)
+            self._evict(keep=namespace)
+
+    def flush(self):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            dirty = [(ns, self._indexes[ns]) for ns in self._dirty if ns in self._indexes]
+            self._dirty.clear()
+            for namespace, index in dirty:
+                index.save(self._file(namespace))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "namespaces": len(self._indexes),
+                "chunks": sum(len(i) for i in self._indexes.values()),
+                "local_namespaces": sum(1 for i in self._indexes.values() if i.vectors is not None),
+                "max_chunks": self.max_chunks,
+                "evictions": self.evictions,
+            }
+
+def build_sparse_store() -> SparseIndexStore:
+    return SparseIndexStore(
+        local_max_chunks=int(os.getenv("HYBRID_LOCAL_MAX_CHUNKS", "500")),
+        path=os.getenv("SPARSE_INDEX_DIR") or None,
+        max_chunks=int(os.getenv("HYBRID_SPARSE_MAX_CHUNKS", "200000"))
+    )
@@ -0,0 +1,259 @@
+import os
+import json
+import bisect
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" for humans, "json" for log shippers (one object per line).
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "0") == "1"
+
+# Seconds; spans range from sub-millisecond cache hits to multi-second LLM calls.
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_id = ContextVar("request_id", default=None)
+_request_stages = ContextVar("request_stages", default=None)
+
+def get_logger(name: str) -> logging.Logger:
+    """Loggers live under "contentflow" so LOG_LEVEL/LOG_FORMAT apply to the app only."""
+    return logging.getLogger(f"contentflow.{name}")
+
+logger = get_logger("telemetry")
+
+# --- Logging ---------------------------------------------------------------
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get() or "-"
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; fields passed through `extra=` become top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": record.request_id,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable line with `extra=` fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        extras = [f"{k}={v}" for k, v in record.__dict__.items() if k not in _STANDARD_ATTRS and not k.startswith("_")]
+        return f"{line} {' '.join(extras)}" if extras else line
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    root = logging.getLogger("contentflow")
+    root.setLevel(level)
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler()
+    handler.addFilter(_RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root.addHandler(handler)
+
+configure_logging()
+
+# --- Metrics ---------------------------------------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple([str(labels.get(name, "")) for name in self.labelnames])
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple([str(labels.get(name, "")) for name in self.labelnames])
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for key, value in snapshot:
+            labels = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DURATION_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, labelnames, buckets)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text, labelnames)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    "contentflow_request_duration_seconds", "HTTP request latency, first byte in to last byte out.",
+    ("method", "route", "status")
+)
+STAGE_SECONDS = metrics.histogram(
+    "contentflow_stage_duration_seconds", "Time spent in one stage of a request (auth, retrieval, llm, ...).",
+    ("stage",)
+)
+
+# --- Tracing ---------------------------------------------------------------
+
+def _build_tracer():
+    if not OTEL_ENABLED:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("OTEL_ENABLED=1 but opentelemetry-api is not installed; spans are metrics-only")
+        return None
+    return trace.get_tracer("contentflow")
+
+_tracer = _build_tracer()
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times a stage of the current request: observed into the stage histogram,
+    added to the request's stage breakdown, and (with OTEL_ENABLED=1 and
+    opentelemetry installed) emitted as a child span of the active trace.
+    """
+    otel = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel is not None:
+        otel.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+        if otel is not None:
+            otel.__exit__(None, None, None)
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware: assigns a request id (X-Request-ID, echoed back), times
+    every HTTP request into the request histogram by route template, and
+    logs one line per request with its per-stage breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        request_id = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex[:16]
+        id_token = _request_id.set(request_id)
+        stages = {}
+        stages_token = _request_stages.set(stages)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route_path, status=status["code"])
+            if logger.isEnabledFor(logging.INFO) and route_path != "/metrics":
+                logger.info(
+                    "%s %s -> %s in %.1f ms", scope["method"], route_path, status["code"], elapsed * 1000,
+                    extra={"stages_ms": {k: round(v * 1000, 2) for k, v in stages.items()}} if stages else None
+                )
+            _request_stages.reset(stages_token)
+            _request_id.reset(id_token)
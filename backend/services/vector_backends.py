@@ -0,0 +1,376 @@
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from services.executor import run_blocking
+from services.telemetry import get_logger
+
+logger = get_logger("vector_backends")
+
+# A vector backend stores (id, text, vector, metadata) records per namespace and
+# exposes them to VectorService through:
+#   upsert(ids, texts, vectors, metadatas, namespace)   blocking
+#   delete(ids, namespace)                              blocking
+#   count(namespace) -> int                             blocking
+#   iter_records(namespace) -> (ids, texts, vectors)    blocking, in batches
+#   vector_store                                        a LangChain VectorStore
+#   close()
+
+class PineconeBackend:
+    """Pinecone serverless index; one Pinecone namespace per user."""
+
+    def __init__(self, embeddings, dimension: int = 768):
+        from pinecone import Pinecone
+        from langchain_pinecone import PineconeVectorStore
+
+        self.api_key = os.getenv("PINECONE_API_KEY")
+        self.index_name = os.getenv("PINECONE_INDEX_NAME", "genai-content-index")
+        if not self.api_key:
+            raise ValueError("PINECONE_API_KEY is not set")
+
+        self.pc = Pinecone(api_key=self.api_key)
+        self.dimension = dimension
+        self._ensure_index_exists()
+
+        # Reuse this client's connection pool instead of letting the store open its own.
+        self.index = self.pc.Index(self.index_name)
+        self.vector_store = PineconeVectorStore(
+            index=self.index,
+            embedding=embeddings
+        )
+
+    def _ensure_index_exists(self):
+        from pinecone import ServerlessSpec
+
+        existing_indexes = [i.name for i in self.pc.list_indexes()]
+
+        if self.index_name not in existing_indexes:
+            logger.info("Creating Pinecone index %s", self.index_name)
+            try:
+                self.pc.create_index(
+                    name=self.index_name,
+                    dimension=self.dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                )
+                while not self.pc.describe_index(self.index_name).status['ready']:
+                    time.sleep(1)
+                logger.info("Index created")
+            except Exception as e:
+                logger.error("Error creating index: %s", e)
+
+    def upsert(self, ids, texts, vectors, metadatas, namespace: str):
+        records = [
+            {"id": chunk_id, "values": vector, "metadata": {**(metadata or {}), "text": text}}
+            for chunk_id, text, vector, metadata in zip(ids, texts, vectors, metadatas)
+        ]
+        self.index.upsert(vectors=records, namespace=namespace)
+
+    def delete(self, ids, namespace: str):
+        self.index.delete(ids=ids, namespace=namespace)
+
+    def count(self, namespace: str) -> int:
+        from pinecone.exceptions import NotFoundException
+
+        # Stats for this namespace only, not the whole index.
+        try:
+            description = self.index.describe_namespace(namespace=namespace)
+        except NotFoundException:
+            return 0
+        return int(description.record_count or 0)
+
+    def iter_records(self, namespace: str):
+        for id_page in self.index.list(namespace=namespace):
+            for start in range(0, len(id_page), 100):
+                fetched = self.index.fetch(ids=id_page[start:start + 100], namespace=namespace).vectors
+                ids = list(fetched)
+                yield (
+                    ids,
+                    [(fetched[i].metadata or {}).get("text", "") for i in ids],
+                    [fetched[i].values for i in ids]
+                )
+
+    def close(self):
+        pass
+
+class _LocalNamespace:
+    """
+    One namespace of the local backend: an append-only float32 matrix of
+    unit-normalized rows (capacity doubles as it fills) plus parallel id,
+    text and metadata lists. Deletes only clear the row's alive flag; the
+    matrix is compacted once a quarter of its rows are dead.
+
+    Rows below `size` are never rewritten in place (upserts append, growth and
+    compaction build new arrays), so readers take a snapshot under `lock` and
+    do the heavy work outside it.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 1024, matrix=None):
+        self.dimension = dimension
+        self.matrix = matrix if matrix is not None else np.zeros((capacity, dimension), dtype=np.float32)
+        self.alive = np.zeros(len(self.matrix), dtype=bool)
+        self.size = 0
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.row_of = {}
+        self.dead = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def _grow(self, needed: int):
+        if needed <= len(self.matrix):
+            return
+        # A namespace saved empty loads as a (0, dim) matrix: doubling needs a floor.
+        capacity = max(len(self.matrix), 1024)
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.matrix, self.alive = matrix, alive
+
+    def snapshot(self):
+        """(size, matrix, alive, ids, texts, metadatas) as of now. Caller holds `lock`."""
+        return self.size, self.matrix, self.alive[:self.size].copy(), self.ids, self.texts, self.metadatas
+
+    def upsert(self, ids, texts, vectors, metadatas):
+        block = np.array(vectors, dtype=np.float32)
+        if len(set(ids)) < len(ids):
+            # The same id twice in one batch: the last occurrence wins.
+            last = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            keep = sorted(last.values())
+            ids, texts, metadatas = [ids[i] for i in keep], [texts[i] for i in keep], [metadatas[i] for i in keep]
+            block = block[keep]
+        block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+        # Re-upserting an id replaces it: the old row becomes a tombstone.
+        self.delete([i for i in ids if i in self.row_of], compact=False)
+        self._grow(self.size + len(ids))
+        start = self.size
+        self.matrix[start:start + len(ids)] = block
+        self.alive[start:start + len(ids)] = True
+        for offset, chunk_id in enumerate(ids):
+            self.row_of[chunk_id] = start + offset
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.size += len(ids)
+
+    def delete(self, ids, compact: bool = True):
+        for chunk_id in ids:
+            row = self.row_of.pop(chunk_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.dead += 1
+        if compact and self.dead * 4 > self.size:
+            self.compact()
+
+    def compact(self):
+        keep = np.flatnonzero(self.alive[:self.size])
+        capacity = max(1024, 1 << int(len(keep) * 2 - 1).bit_length()) if len(keep) else 1024
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        matrix[:len(keep)] = self.matrix[keep]
+        self.matrix = matrix
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.alive[:len(keep)] = True
+        self.ids = [self.ids[r] for r in keep]
+        self.texts = [self.texts[r] for r in keep]
+        self.metadatas = [self.metadatas[r] for r in keep]
+        self.row_of = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.size = len(keep)
+        self.dead = 0
+
+    def search(self, vector, k: int) -> list[tuple[str, str, dict, float]]:
+        """Top-k (id, text, metadata, score); the matrix multiply runs without the lock."""
+        with self.lock:
+            if not self.row_of:
+                return []
+            size, matrix, alive, ids, texts, metadatas = self.snapshot()
+            live = len(self.row_of)
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = matrix[:size] @ query
+        scores[~alive] = -np.inf
+        k = min(k, live)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[row], texts[row], metadatas[row], float(scores[row])) for row in top]
+
+class LocalVectorBackend:
+    """
+    In-process cosine-similarity store: one contiguous float32 matrix per
+    namespace, exact top-k via argpartition. With `path` set, each namespace's
+    matrix is written as an .npy file (memory-mapped back on load) next to a
+    JSON sidecar with ids, texts and metadata, on flush()/close().
+
+    The backend lock only guards the namespace table; each namespace has its
+    own lock, so namespaces never wait on each other. Take the backend lock
+    before a namespace lock, never the other way round.
+    """
+
+    def __init__(self, embeddings, path: str | None = None):
+        self.path = path
+        self._namespaces = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self.vector_store = LocalVectorStore(self, embeddings)
+
+    def _files(self, namespace: str):
+        base = os.path.join(self.path, re.sub(r"[^A-Za-z0-9_-]", "_", namespace))
+        return base + ".npy", base + ".json"
+
+    def _load(self, namespace: str) -> _LocalNamespace | None:
+        matrix_file, meta_file = self._files(namespace)
+        if not (os.path.exists(matrix_file) and os.path.exists(meta_file)):
+            return None
+        with open(meta_file) as f:
+            meta = json.load(f)
+        # Copy-on-write mapping: pages are read lazily, growth allocates in RAM.
+        matrix = np.load(matrix_file, mmap_mode="c")
+        ns = _LocalNamespace(matrix.shape[1], matrix=matrix)
+        ns.size = len(meta["ids"])
+        ns.alive[:ns.size] = True
+        ns.ids, ns.texts, ns.metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        ns.row_of = {chunk_id: row for row, chunk_id in enumerate(ns.ids)}
+        return ns
+
+    def _namespace(self, namespace: str, dimension: int | None = None) -> _LocalNamespace | None:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None and self.path:
+                ns = self._load(namespace)
+            if ns is None and dimension:
+                ns = _LocalNamespace(dimension)
+            if ns is not None:
+                self._namespaces[namespace] = ns
+            return ns
+
+    def upsert(self, ids, texts, vectors, metadatas, namespace: str):
+        if not ids:
+            return
+        ns = self._namespace(namespace, len(vectors[0]))
+        with ns.lock:
+            ns.upsert(ids, texts, vectors, metadatas)
+        with self._lock:
+            self._dirty.add(namespace)
+
+    def delete(self, ids, namespace: str):
+        ns = self._namespace(namespace)
+        if ns is None:
+            return
+        with ns.lock:
+            ns.delete(ids)
+        with self._lock:
+            self._dirty.add(namespace)
+
+    def count(self, namespace: str) -> int:
+        ns = self._namespace(namespace)
+        if ns is None:
+            return 0
+        with ns.lock:
+            return len(ns)
+
+    def iter_records(self, namespace: str):
+        ns = self._namespace(namespace)
+        if not ns:
+            return
+        with ns.lock:
+            size, matrix, alive, ids, texts, _ = ns.snapshot()
+        rows = np.flatnonzero(alive)
+        for start in range(0, len(rows), 1000):
+            batch = rows[start:start + 1000]
+            yield [ids[r] for r in batch], [texts[r] for r in batch], matrix[batch]
+
+    def search(self, vector, k: int, namespace: str) -> list[tuple[Document, float]]:
+        ns = self._namespace(namespace)
+        if ns is None:
+            return []
+        return [
+            (Document(id=chunk_id, page_content=text, metadata=dict(metadata)), score)
+            for chunk_id, text, metadata, score in ns.search(vector, k)
+        ]
+
+    def flush(self):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            for namespace in list(self._dirty):
+                ns = self._namespaces[namespace]
+                with ns.lock:
+                    if ns.dead:
+                        ns.compact()
+                    size, matrix, _, ids, texts, metadatas = ns.snapshot()
+                    ids, texts, metadatas = ids[:size], texts[:size], metadatas[:size]
+                matrix_file, meta_file = self._files(namespace)
+                if not size:
+                    # Every row was deleted: nothing to load back.
+                    for stale in (matrix_file, meta_file):
+                        if os.path.exists(stale):
+                            os.remove(stale)
+                    continue
+                np.save(matrix_file + ".tmp.npy", np.asarray(matrix[:size]))
+                with open(meta_file + ".tmp", "w") as f:
+                    json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f)
+                os.replace(matrix_file + ".tmp.npy", matrix_file)
+                os.replace(meta_file + ".tmp", meta_file)
+            self._dirty.clear()
+
+    def close(self):
+        self.flush()
+
+class LocalVectorStore(VectorStore):
+    """LangChain VectorStore view of a LocalVectorBackend (for as_retriever() etc.)."""
+
+    def __init__(self, backend: LocalVectorBackend, embedding):
+        self.backend = backend
+        self._embedding = embedding
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, namespace: str = "", **kwargs):
+        texts = list(texts)
+        ids = ids or [os.urandom(16).hex() for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.backend.upsert(ids, texts, vectors, metadatas or [{} for _ in texts], namespace)
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, namespace: str = "", **kwargs):
+        return self.backend.search(embedding, k, namespace)
+
+    async def asimilarity_search_by_vector_with_score(self, embedding, *, k: int = 4, namespace: str = "", **kwargs):
+        return await run_blocking(self.backend.search, embedding, k, namespace)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, namespace: str = "", **kwargs):
+        return [doc for doc, _ in self.backend.search(embedding, k, namespace)]
+
+    async def asimilarity_search_by_vector(self, embedding, k: int = 4, namespace: str = "", **kwargs):
+        return await run_blocking(self.similarity_search_by_vector, embedding, k, namespace)
+
+    def similarity_search(self, query: str, k: int = 4, namespace: str = "", **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, namespace)
+
+    async def asimilarity_search(self, query: str, k: int = 4, namespace: str = "", **kwargs):
+        embedding = await self._embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k, namespace)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        store = LocalVectorBackend(embedding).vector_store
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+def build_vector_backend(embeddings):
+    """Picks the backend from VECTOR_BACKEND (pinecone | local)."""
+    if os.getenv("VECTOR_BACKEND", "pinecone") == "local":
+        return LocalVectorBackend(embeddings, path=os.getenv("LOCAL_VECTOR_DIR") or None)
+    return PineconeBackend(embeddings)
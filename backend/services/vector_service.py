@@ -1,76 +1,357 @@
 import os
 import json
 import time
+import uuid
+import random
+import asyncio
+from contextlib import nullcontext
+from langchain_core.documents import Document
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
 from google.oauth2 import service_account 
 from dotenv import load_dotenv
+from services.executor import run_blocking
+from services.embedding_cache import CachedEmbeddings, build_cached_embeddings
+from services.sparse_index import BM25Index, build_sparse_store, reciprocal_rank_fusion
+from services.vector_backends import LocalVectorBackend, build_vector_backend
+from services.admission import AdmissionRejected, is_rate_limited
+from services.telemetry import get_logger
+
+logger = get_logger("vector_service")
 
 load_dotenv()
 
-class VectorService:
-    def __init__(self):
-        self.api_key = os.getenv("PINECONE_API_KEY")
-        self.index_name = os.getenv("PINECONE_INDEX_NAME", "genai-content-index")
-        self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT") 
-        
-        if not self.api_key:
-            raise ValueError("PINECONE_API_KEY is not set")
-
-        google_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-        if not google_creds_json:
-            raise ValueError("GOOGLE_APPLICATION_CREDENTIALS not found")
-            
-        creds_dict = json.loads(google_creds_json)
-        
-        self.creds = service_account.Credentials.from_service_account_info(
-            creds_dict,
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
+# How long a namespace's backend vector count is trusted before re-checking
+# that the local sparse index still covers every chunk.
+NAMESPACE_VERIFY_SECONDS = 300.0
+# Sparse-index rebuilds list and fetch every vector of a namespace from the
+# backend: at most this many run at once, and a namespace is not rebuilt
+# again within the retry window.
+HYDRATE_CONCURRENCY = int(os.getenv("HYBRID_HYDRATE_CONCURRENCY", "1"))
+HYDRATE_RETRY_SECONDS = float(os.getenv("HYBRID_HYDRATE_RETRY_SECONDS", "600"))
 
-        self.pc = Pinecone(api_key=self.api_key)
+class IngestionPipeline:
+    """
+    Embeds chunks in fixed-size batches with bounded concurrency and overlaps
+    each batch's upsert with the embedding of the batches behind it.
 
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004", 
-            project=self.project_id,
-            location="us-central1",
-            credentials=self.creds 
-        )
+    `embed_batch(texts) -> vectors` and `upsert_batch(texts, vectors, ids)` are
+    both async callables. Every batch is retried with exponential backoff; a
+    rate-limit error also pauses all embedding workers until the backoff expires
+    so the pipeline slows down as a whole instead of hammering the quota.
+    """
 
-        self._ensure_index_exists()
+    def __init__(self, embed_batch, upsert_batch, batch_size: int = 64,
+                 max_concurrency: int = 4, max_retries: int = 3, backoff_seconds: float = 1.0):
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._paused_until = 0.0
 
-        self.vector_store = PineconeVectorStore(
-            index_name=self.index_name,
-            embedding=self.embeddings
-        )
+    async def _wait_if_paused(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
 
-    def _ensure_index_exists(self):
-        existing_indexes = [i.name for i in self.pc.list_indexes()]
-        
-        if self.index_name not in existing_indexes:
-            print(f"Creating Pinecone index: {self.index_name}...")
+    async def _with_retry(self, func, *args):
+        for attempt in range(self.max_retries + 1):
             try:
-                self.pc.create_index(
-                    name=self.index_name,
-                    dimension=768, 
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
-                )
-                while not self.pc.describe_index(self.index_name).status['ready']:
-                    time.sleep(1)
-                print("Index created successfully!")
+                return await func(*args)
             except Exception as e:
-                print(f"Error creating index: {e}")
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * (1 + random.random() / 2)
+                if is_rate_limited(e):
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning("Ingestion batch failed (%s), retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+
+    async def run(self, texts: list[str], ids: list[str] | None = None, on_progress=None) -> int:
+        """Ingests all texts; `on_progress(n)` is called after each batch is stored."""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        embed_slots = asyncio.Semaphore(self.max_concurrency)
+        upsert_slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed(batch):
+            await self._wait_if_paused()
+            return await self.embed_batch(batch)
+
+        async def process(start):
+            batch = texts[start:start + self.batch_size]
+            batch_ids = ids[start:start + self.batch_size]
+            async with embed_slots:
+                vectors = await self._with_retry(embed, batch)
+            # The embed slot is released before uploading so the next batch
+            # starts embedding while this one is in flight to the vector store.
+            async with upsert_slots:
+                await self._with_retry(self.upsert_batch, batch, vectors, batch_ids)
+            if on_progress:
+                on_progress(len(batch))
+
+        # The first failed batch cancels the rest, so nothing more is written
+        # after the job is reported failed (an upsert already in flight on an
+        # executor thread still completes).
+        try:
+            async with asyncio.TaskGroup() as group:
+                for start in range(0, len(texts), self.batch_size):
+                    group.create_task(process(start))
+        except ExceptionGroup as e:
+            raise e.exceptions[0] from None
+        return len(texts)
+
+class VectorService:
+    """
+    Embeddings plus a vector backend (Pinecone by default, or the in-process
+    LocalVectorBackend with VECTOR_BACKEND=local). Both can be passed in
+    directly, e.g. fakes for running without the network.
+    """
+
+    def __init__(self, credentials=None, backend=None, embeddings=None, search_limiter=None,
+                 search_policy=None, embed_policy=None):
+        self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT") 
+        self.embedding_model = "models/text-embedding-004"
+
+        if embeddings is None:
+            if credentials is None:
+                google_creds_json = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+                if not google_creds_json:
+                    raise ValueError("GOOGLE_APPLICATION_CREDENTIALS not found")
+                    
+                creds_dict = json.loads(google_creds_json)
+                
+                credentials = service_account.Credentials.from_service_account_info(
+                    creds_dict,
+                    scopes=["https://www.googleapis.com/auth/cloud-platform"]
+                )
+            embeddings = build_cached_embeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model=self.embedding_model, 
+                    project=self.project_id,
+                    location="us-central1",
+                    credentials=credentials 
+                ),
+                model_name=self.embedding_model
+            )
+        self.creds = credentials
+        self.embeddings = embeddings
+
+        self.embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        self.embed_concurrency = int(os.getenv("EMBED_CONCURRENCY", "4"))
+        self.ingest_max_retries = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+
+        self.backend = backend or build_vector_backend(self.embeddings)
+        self.vector_store = self.backend.vector_store
+        # Optional UpstreamLimiter shared by every query against the backend,
+        # and ResiliencePolicies (deadline, hedging, breaker) for queries and
+        # query embeddings.
+        self.search_limiter = search_limiter
+        self.search_policy = search_policy
+        self.embed_policy = embed_policy
+
+        self.hybrid_enabled = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+        self.hydrate_max_chunks = int(os.getenv("HYBRID_HYDRATE_MAX_CHUNKS", "5000"))
+        self.sparse = build_sparse_store()
+        if isinstance(self.backend, LocalVectorBackend):
+            # Dense search is already local; don't hold the vectors twice.
+            self.sparse.local_max_chunks = 0
+        self._remote_counts = {}
+        self._hydrating = set()
+        self._hydrated_at = {}
+        self.retrieval_stats = {"local": 0, "hybrid": 0, "dense": 0, "empty": 0, "hydrations": 0, "sparse_fallbacks": 0}
 
     def add_texts(self, texts: list[str], namespace: str):
         """Adds text chunks to a specific user's namespace."""
-        print(f"Adding {len(texts)} documents to namespace: {namespace}...")
+        logger.info("Adding %s documents to namespace %s", len(texts), namespace)
         self.vector_store.add_texts(texts, namespace=namespace)
-        print("Done!")
+
+    async def aadd_texts(self, texts: list[str], namespace: str, ids: list[str] | None = None,
+                         metadata: dict | None = None, on_progress=None) -> int:
+        """Adds text chunks through the batched, pipelined ingestion path."""
+        logger.info("Ingesting %s documents into namespace %s", len(texts), namespace)
+
+        async def embed_batch(batch):
+            return await self.embeddings.aembed_documents(batch, batch_size=len(batch))
+
+        async def upsert_batch(batch, vectors, batch_ids):
+            metadatas = [dict(metadata or {}) for _ in batch]
+            await run_blocking(self.backend.upsert, batch_ids, batch, vectors, metadatas, namespace)
+            self.sparse.add(namespace, batch_ids, batch, vectors)
+            self._adjust_remote_count(namespace, len(batch_ids))
+
+        pipeline = IngestionPipeline(
+            embed_batch,
+            upsert_batch,
+            batch_size=self.embed_batch_size,
+            max_concurrency=self.embed_concurrency,
+            max_retries=self.ingest_max_retries
+        )
+        return await pipeline.run(texts, ids=ids, on_progress=on_progress)
+
+    async def adelete(self, ids: list[str], namespace: str, batch_size: int = 1000):
+        """Removes vectors by id from a namespace."""
+        for start in range(0, len(ids), batch_size):
+            await run_blocking(self.backend.delete, ids[start:start + batch_size], namespace)
+        self.sparse.remove(namespace, ids)
+        self._adjust_remote_count(namespace, -len(ids))
 
     def get_retriever(self, namespace: str, k=3):
         """Returns a retriever scoped to a specific user's namespace."""
         return self.vector_store.as_retriever(
             search_kwargs={"k": k, "namespace": namespace}
-        )
\ No newline at end of file
+        )
+
+    def embedding_cache_stats(self) -> dict:
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.store.stats()
+        return {}
+
+    def retrieval_stats_snapshot(self) -> dict:
+        return {**self.retrieval_stats, **self.sparse.stats(), "hydrating": len(self._hydrating)}
+
+    def close(self):
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.store.flush()
+        self.sparse.flush()
+        self.backend.close()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embeds a query once so callers can reuse the vector (e.g. the semantic cache)."""
+        if self.embed_policy:
+            return await self.embed_policy.call(lambda: self.embeddings.aembed_query(text))
+        return await self.embeddings.aembed_query(text)
+
+    async def asearch_by_vector(self, embedding: list[float], namespace: str, k=3):
+        """
+        Dense similarity search in a namespace using a precomputed query vector.
+        Each document's cosine similarity is kept in metadata["score"].
+        """
+        def search():
+            return self.vector_store.asimilarity_search_by_vector_with_score(embedding, k=k, namespace=namespace)
+
+        async with self.search_limiter.slot() if self.search_limiter else nullcontext():
+            if self.search_policy:
+                scored = await self.search_policy.call(search, hedge_guard=self.search_limiter)
+            else:
+                scored = await search()
+        for doc, score in scored:
+            doc.metadata["score"] = float(score)
+        return [doc for doc, _ in scored]
+
+    def _adjust_remote_count(self, namespace: str, delta: int):
+        entry = self._remote_counts.get(namespace)
+        if entry is not None:
+            self._remote_counts[namespace] = (max(0, entry[0] + delta), entry[1])
+
+    def _hydrate(self, namespace: str, keep_vectors: bool):
+        """Rebuilds a namespace's sparse index from the texts stored in the backend."""
+        index = BM25Index(keep_vectors=keep_vectors)
+        for ids, texts, vectors in self.backend.iter_records(namespace):
+            index.add(ids, texts, vectors if keep_vectors else None)
+        self.sparse.replace(namespace, index)
+        self.retrieval_stats["hydrations"] += 1
+
+    async def _run_hydration(self, namespace: str, keep_vectors: bool):
+        try:
+            await run_blocking(self._hydrate, namespace, keep_vectors)
+            logger.info("Sparse index for %s rebuilt from the vector store", namespace)
+        except Exception as e:
+            logger.warning("Could not rebuild sparse index for %s: %s", namespace, e)
+        finally:
+            self._hydrating.discard(namespace)
+
+    async def _synced_index(self, namespace: str):
+        """
+        The namespace's sparse index if it covers every chunk stored in the
+        vector backend, else None (and a background rebuild is started when the
+        namespace is small enough). Returns (index, remote_count).
+        """
+        entry = self._remote_counts.get(namespace)
+        if entry is None or time.monotonic() - entry[1] > NAMESPACE_VERIFY_SECONDS:
+            entry = (await run_blocking(self.backend.count, namespace), time.monotonic())
+            self._remote_counts[namespace] = entry
+        remote_count = entry[0]
+
+        index = self.sparse.get(namespace)
+        if (len(index) if index else 0) == remote_count:
+            return index, remote_count
+        if self._may_hydrate(namespace, remote_count):
+            now = time.monotonic()
+            self._hydrating.add(namespace)
+            self._hydrated_at = {ns: t for ns, t in self._hydrated_at.items() if now - t <= HYDRATE_RETRY_SECONDS}
+            self._hydrated_at[namespace] = now
+            keep_vectors = remote_count <= self.sparse.local_max_chunks
+            # Runs off the request path; this request is answered dense-only.
+            asyncio.ensure_future(self._run_hydration(namespace, keep_vectors))
+        return None, remote_count
+
+    def _may_hydrate(self, namespace: str, remote_count: int) -> bool:
+        if remote_count > self.hydrate_max_chunks or namespace in self._hydrating:
+            return False
+        if len(self._hydrating) >= HYDRATE_CONCURRENCY:
+            return False
+        last = self._hydrated_at.get(namespace)
+        return last is None or time.monotonic() - last > HYDRATE_RETRY_SECONDS
+
+    async def ahybrid_search(self, query: str, embedding: list[float], namespace: str, k=5) -> list[Document]:
+        """
+        Dense + BM25 retrieval fused by reciprocal rank. Namespaces whose
+        chunks (and embeddings) are all held locally never touch Pinecone;
+        larger ones fuse the backend's dense hits with the local BM25 hits, and
+        namespaces without a complete sparse index fall back to dense only.
+        Documents found by the dense side carry their cosine similarity in
+        metadata["score"]; keyword-only hits have none.
+        """
+        if not self.hybrid_enabled:
+            return await self.asearch_by_vector(embedding, namespace=namespace, k=k)
+
+        try:
+            index, remote_count = await self._synced_index(namespace)
+        except Exception as e:
+            logger.warning("Sparse index unavailable for %s: %s", namespace, e)
+            index, remote_count = None, -1
+
+        if remote_count == 0:
+            self.retrieval_stats["empty"] += 1
+            return []
+        if index is None:
+            self.retrieval_stats["dense"] += 1
+            return await self.asearch_by_vector(embedding, namespace=namespace, k=k)
+
+        candidates = max(k * 4, 20)
+        sparse_ids = [doc_id for doc_id, _ in index.search(query, candidates)]
+        if index.vectors is not None:
+            self.retrieval_stats["local"] += 1
+            dense_hits = index.dense_search(embedding, candidates)
+            dense_ids = [doc_id for doc_id, _ in dense_hits]
+            dense_scores = dict(dense_hits)
+            documents = {}
+        else:
+            self.retrieval_stats["hybrid"] += 1
+            try:
+                dense_docs = await self.asearch_by_vector(embedding, namespace=namespace, k=candidates)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                # The local BM25 index still covers the whole namespace.
+                logger.warning("Dense search failed for %s, using keyword results only: %s", namespace, e)
+                self.retrieval_stats["sparse_fallbacks"] += 1
+                if self.search_policy:
+                    self.search_policy.record_fallback()
+                dense_docs = []
+            dense_ids = [doc.id or doc.page_content for doc in dense_docs]
+            documents = dict(zip(dense_ids, dense_docs))
+            dense_scores = {}
+
+        results = []
+        for doc_id, _ in reciprocal_rank_fusion([dense_ids, sparse_ids])[:k]:
+            doc = documents.get(doc_id)
+            if doc is None and doc_id in index.row_of:
+                doc = Document(id=doc_id, page_content=index.text(doc_id))
+                if doc_id in dense_scores:
+                    doc.metadata["score"] = dense_scores[doc_id]
+            if doc is not None:
+                results.append(doc)
+        return results
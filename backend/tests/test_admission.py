@@ -0,0 +1,218 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from services.admission import (
+    AdmissionController, AdmissionRejected, InMemoryRateLimiter, UpstreamLimiter,
+    admit_client, get_admission, http_error,
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_bucket_allows_the_burst_then_reports_the_wait(clock):
+    limiter = InMemoryRateLimiter(rate_per_second=2.0, burst=3, clock=clock)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    assert limiter.acquire("b") == 0.0
+
+def test_bucket_refills_with_time_up_to_the_burst(clock):
+    limiter = InMemoryRateLimiter(rate_per_second=2.0, burst=3, clock=clock)
+    for _ in range(3):
+        limiter.acquire("a")
+
+    clock.advance(0.5)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+
+    clock.advance(3600)
+    assert [limiter.acquire("a") for _ in range(4)][:3] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") > 0
+
+def test_idle_buckets_are_dropped_beyond_max_keys(clock):
+    limiter = InMemoryRateLimiter(rate_per_second=1.0, burst=1, max_keys=2, clock=clock)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert len(limiter) == 2
+    # "a" was evicted, so it starts from a full bucket again.
+    assert limiter.acquire("a") == 0.0
+
+def test_check_rate_raises_429_with_retry_after(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1 / 60, 1, clock=clock), {})
+    admission.check_rate("uid:u1")
+    with pytest.raises(AdmissionRejected) as info:
+        admission.check_rate("uid:u1")
+    assert info.value.status_code == 429
+    assert info.value.headers["Retry-After"] == "60"
+    assert admission.stats()["rate_limited"] == 1
+
+def test_rate_limited_route_returns_429(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1.0, 1, clock=clock), {})
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(key: str = Depends(admit_client)):
+        return {"key": key}
+
+    app.dependency_overrides[get_admission] = lambda: admission
+    client = TestClient(app)
+    assert client.get("/ping").status_code == 200
+    response = client.get("/ping")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+def test_cost_above_the_burst_is_rejected_with_413_not_429(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1.0, 10, clock=clock), {})
+    with pytest.raises(HTTPException) as info:
+        admission.check_rate("ip:a", 15)
+    assert info.value.status_code == 413
+    assert not isinstance(info.value, AdmissionRejected)
+    # Nothing was charged.
+    assert admission.rate_limiter.acquire("ip:a", 10) == 0.0
+
+def test_batch_charge_is_capped_below_the_burst(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1 / 60, 10, clock=clock), {}, batch_max_cost=5)
+    # A 20-item batch, first item taken by the route dependency.
+    admission.check_rate("ip:a")
+    admission.charge_batch("ip:a", 20)
+    assert admission.rate_limiter.acquire("ip:a", 5) == 0.0
+    assert admission.rate_limiter.acquire("ip:a") > 0
+
+def test_batch_max_cost_never_exceeds_the_burst(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1.0, 4, clock=clock), {}, batch_max_cost=50)
+    assert admission.batch_max_cost == 4
+
+def test_full_size_batch_fits_after_earlier_requests(clock):
+    admission = AdmissionController(InMemoryRateLimiter(1 / 60, 10, clock=clock), {}, batch_max_cost=5)
+    app = FastAPI()
+
+    @app.post("/batch/{items}")
+    async def batch(items: int, key: str = Depends(admit_client)):
+        admission.charge_batch(key, items)
+        return {"items": items}
+
+    app.dependency_overrides[get_admission] = lambda: admission
+    client = TestClient(app)
+    assert client.post("/batch/1").status_code == 200
+    assert client.post("/batch/10").status_code == 200
+    response = client.post("/batch/20")
+    assert response.status_code == 429
+    # The advertised wait is enough for the retry to pass.
+    clock.advance(int(response.headers["Retry-After"]))
+    assert client.post("/batch/20").status_code == 200
+
+def test_upstream_rate_limits_map_to_503():
+    error = http_error(RuntimeError("429 ResourceExhausted: quota exceeded"))
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+    assert http_error(ValueError("boom")).status_code == 500
+
+def test_full_queue_is_shed_with_503():
+    async def scenario():
+        limiter = UpstreamLimiter("gemini", max_concurrent=1, max_queue=1, max_wait=5)
+        held = await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as info:
+            await limiter.acquire()
+        held.release()
+        (await queued).release()
+        return info.value, limiter.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+    assert stats["shed_queue_full"] == 1
+    assert stats["in_flight"] == 0
+
+def test_waiters_get_released_slots_in_order():
+    async def scenario():
+        limiter = UpstreamLimiter("pinecone", max_concurrent=1, max_queue=4, max_wait=5)
+        held = await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            slot = await limiter.acquire()
+            order.append(name)
+            slot.release()
+
+        waiters = [asyncio.ensure_future(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        held.release()
+        await asyncio.gather(*waiters)
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["first", "second"]
+    assert stats["queued"] == 2
+    assert stats["in_flight"] == 0
+
+def test_waiter_past_its_deadline_is_shed():
+    async def scenario():
+        limiter = UpstreamLimiter("pexels", max_concurrent=1, max_queue=4, max_wait=5)
+        held = await limiter.acquire()
+        with pytest.raises(AdmissionRejected) as info:
+            await limiter.acquire(timeout=0.01)
+        held.release()
+        return info.value, limiter.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert stats["shed_deadline"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+
+def test_predicted_wait_beyond_the_deadline_is_shed_without_queueing(clock):
+    async def scenario():
+        limiter = UpstreamLimiter("gemini", max_concurrent=1, max_queue=4, max_wait=30, clock=clock)
+        slot = await limiter.acquire()
+        clock.advance(5)
+        slot.release()
+        held = await limiter.acquire()
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire(timeout=1)
+        stats = limiter.stats()
+        held.release()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["avg_hold_ms"] == 5000
+    assert stats["shed_deadline"] == 1
+    assert stats["queued"] == 0
+
+def test_releasing_a_slot_twice_frees_it_once():
+    async def scenario():
+        limiter = UpstreamLimiter("gemini", max_concurrent=2)
+        first = await limiter.acquire()
+        second = await limiter.acquire()
+        first.release()
+        first.release()
+        in_flight = limiter.stats()["in_flight"]
+        second.release()
+        return in_flight, limiter.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+def test_try_acquire_never_queues():
+    async def scenario():
+        limiter = UpstreamLimiter("pinecone", max_concurrent=1)
+        held = limiter.try_acquire()
+        assert held is not None
+        assert limiter.try_acquire() is None
+        held.release()
+        assert limiter.try_acquire() is not None
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import jwt
+import pytest
+
+from benchmarks.fakes import LocalTokenIssuer
+from services.auth_service import PublicKeyCache, TokenVerifier
+
+@pytest.fixture(scope="module")
+def issuer():
+    return LocalTokenIssuer(project_id="test-project", kid="key-1")
+
+def _verifier(issuer, **cache_kwargs):
+    return TokenVerifier(issuer.project_id, PublicKeyCache(fetch=issuer.fetch_keys, **cache_kwargs))
+
+def test_valid_token_returns_claims_and_is_memoized(issuer):
+    verifier = _verifier(issuer)
+    token = issuer.mint("user-1")
+
+    claims = verifier.verify(token)
+    assert claims["uid"] == "user-1"
+    assert verifier.cached(token) == claims
+    assert verifier.verify(token) == claims
+    assert verifier.stats()["hits"] >= 1
+
+def test_expired_token_is_rejected(issuer):
+    verifier = _verifier(issuer)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(issuer.mint("user-1", ttl_seconds=-60))
+
+def test_wrong_audience_is_rejected(issuer):
+    verifier = _verifier(issuer)
+    with pytest.raises(jwt.InvalidAudienceError):
+        verifier.verify(issuer.mint("user-1", aud="other-project"))
+
+def test_wrong_issuer_is_rejected(issuer):
+    verifier = _verifier(issuer)
+    with pytest.raises(jwt.InvalidIssuerError):
+        verifier.verify(issuer.mint("user-1", iss="https://securetoken.google.com/other-project"))
+
+def test_unknown_kid_is_rejected(issuer):
+    stranger = LocalTokenIssuer(project_id=issuer.project_id, kid="unknown-key")
+    verifier = _verifier(issuer)
+    with pytest.raises(ValueError, match="unknown key"):
+        verifier.verify(stranger.mint("user-1"))
+
+def test_unknown_kid_refetches_keys_at_most_once_per_interval(issuer):
+    keys = PublicKeyCache(fetch=issuer.fetch_keys, min_refresh_interval=30.0)
+    verifier = TokenVerifier(issuer.project_id, keys)
+    verifier.verify(issuer.mint("user-1"))
+    fetches = issuer.fetches
+
+    stranger = LocalTokenIssuer(project_id=issuer.project_id, kid="unknown-key")
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            verifier.verify(stranger.mint("user-1"))
+    assert issuer.fetches == fetches
+
+def test_keys_are_refreshed_after_rotation():
+    old = LocalTokenIssuer(project_id="test-project", kid="key-1")
+    new = LocalTokenIssuer(project_id="test-project", kid="key-2")
+    current = {"issuer": old}
+
+    def fetch():
+        return current["issuer"].fetch_keys()
+
+    verifier = TokenVerifier("test-project", PublicKeyCache(fetch=fetch, min_refresh_interval=0.0))
+    assert verifier.verify(old.mint("user-1"))["uid"] == "user-1"
+
+    current["issuer"] = new
+    assert verifier.verify(new.mint("user-2"))["uid"] == "user-2"
+    assert new.fetches == 1
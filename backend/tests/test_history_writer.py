@@ -0,0 +1,106 @@
+import time
+import threading
+
+from benchmarks.fakes import FakeFirestore, FakeWriteBatch
+from services.history_writer import HistoryWriter
+
+class PoisonedFirestore(FakeFirestore):
+    """Rejects any commit that contains a record with poison=True."""
+
+    def batch(self):
+        db = self
+
+        class Batch(FakeWriteBatch):
+            def commit(self):
+                if any(data and data.get("poison") for _, _, data in self._ops):
+                    db.commits += 1
+                    raise ValueError("invalid record")
+                super().commit()
+
+        return Batch(self)
+
+class BlockingFirestore(FakeFirestore):
+    """Commits hang until `release` is set."""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.release = threading.Event()
+
+    def batch(self):
+        db = self
+
+        class Batch(FakeWriteBatch):
+            def commit(self):
+                db.release.wait()
+                super().commit()
+
+        return Batch(self)
+
+def _submit(writer, db, count, **extra):
+    refs = [db.collection("generations").document() for _ in range(count)]
+    for i, ref in enumerate(refs):
+        assert writer.submit(ref, {"topic": f"topic {i}", **extra})
+    return refs
+
+def _stored(db):
+    return db.collections.get("generations", {})
+
+def test_records_are_grouped_into_batches():
+    db = FakeFirestore(latency=0)
+    writer = HistoryWriter(db, batch_size=10, flush_interval=5.0, backoff_seconds=0)
+    refs = _submit(writer, db, 25)
+    assert writer.pending_record(refs[-1].id) == {"topic": "topic 24"}
+
+    writer.close()
+    assert len(_stored(db)) == 25
+    assert db.commits == 3
+    assert writer.stats()["written"] == 25
+    assert writer.pending_record(refs[-1].id) is None
+
+def test_failed_commits_are_retried():
+    db = FakeFirestore(latency=0, fail_next_commits=2)
+    writer = HistoryWriter(db, batch_size=10, flush_interval=0.01, max_retries=3, backoff_seconds=0)
+    _submit(writer, db, 5)
+    writer.close()
+
+    stats = writer.stats()
+    assert len(_stored(db)) == 5
+    assert stats["retries"] == 2
+    assert stats["dropped"] == 0
+
+def test_bad_record_only_drops_itself():
+    db = PoisonedFirestore(latency=0)
+    writer = HistoryWriter(db, batch_size=10, flush_interval=5.0, max_retries=1, backoff_seconds=0)
+    good = _submit(writer, db, 4)
+    bad = _submit(writer, db, 1, poison=True)
+    writer.close()
+
+    stats = writer.stats()
+    assert set(_stored(db)) == {ref.id for ref in good}
+    assert stats["written"] == 4
+    assert stats["dropped"] == 1
+    assert stats["split_batches"] == 1
+    assert writer.pending_record(bad[0].id) is None
+
+def test_close_flushes_before_the_interval():
+    db = FakeFirestore(latency=0)
+    writer = HistoryWriter(db, batch_size=100, flush_interval=60.0, backoff_seconds=0)
+    _submit(writer, db, 3)
+
+    start = time.monotonic()
+    writer.close()
+    assert time.monotonic() - start < 5
+    assert len(_stored(db)) == 3
+    assert not writer.submit(db.collection("generations").document(), {"topic": "late"})
+
+def test_close_gives_up_after_its_timeout():
+    db = BlockingFirestore()
+    writer = HistoryWriter(db, batch_size=10, flush_interval=0.01, backoff_seconds=0)
+    refs = _submit(writer, db, 2)
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    writer.close(timeout=0.2)
+    assert time.monotonic() - start < 2
+    assert writer.pending_record(refs[0].id) is not None
+    db.release.set()
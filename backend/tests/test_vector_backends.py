@@ -0,0 +1,54 @@
+import os
+import threading
+
+import numpy as np
+
+from benchmarks.fakes import FakeEmbeddings
+from services.vector_backends import LocalVectorBackend
+
+def _backend(path):
+    return LocalVectorBackend(FakeEmbeddings(size=8, call_latency=0, per_text_latency=0), path=str(path))
+
+def _upsert(backend, ids, namespace="ns"):
+    vectors = [[float(i + 1)] * 8 for i in range(len(ids))]
+    backend.upsert(ids, [f"text {i}" for i in ids], vectors, [{} for _ in ids], namespace)
+
+def _upsert_with_timeout(backend, ids, timeout=5.0):
+    worker = threading.Thread(target=_upsert, args=(backend, ids), daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), "upsert did not finish"
+
+def test_round_trip_keeps_records(tmp_path):
+    backend = _backend(tmp_path)
+    _upsert(backend, ["a", "b"])
+    backend.close()
+
+    reopened = _backend(tmp_path)
+    assert reopened.count("ns") == 2
+    assert {doc.id for doc, _ in reopened.search([1.0] * 8, 2, "ns")} == {"a", "b"}
+
+def test_emptied_namespace_is_not_saved_and_accepts_upserts_after_reopen(tmp_path):
+    backend = _backend(tmp_path)
+    _upsert(backend, ["a", "b"])
+    backend.close()
+    backend = _backend(tmp_path)
+    backend.delete(["a", "b"], "ns")
+    backend.close()
+    assert not any(name.startswith("ns.") for name in os.listdir(tmp_path))
+
+    reopened = _backend(tmp_path)
+    assert reopened.count("ns") == 0
+    _upsert_with_timeout(reopened, ["c"])
+    assert reopened.count("ns") == 1
+
+def test_zero_row_matrix_on_disk_grows_on_upsert(tmp_path):
+    # Files written before empty namespaces were skipped hold a (0, dim) matrix.
+    backend = _backend(tmp_path)
+    matrix_file, meta_file = backend._files("ns")
+    np.save(matrix_file, np.zeros((0, 8), dtype=np.float32))
+    with open(meta_file, "w") as f:
+        f.write('{"ids": [], "texts": [], "metadatas": []}')
+
+    _upsert_with_timeout(backend, ["a"])
+    assert backend.count("ns") == 1
@@ -57,6 +57,8 @@ const formatMarkdown = (text) => {
 export default function HistoryList() {
   const { user } = useAuth();
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [copied, setCopied] = useState(false);
   
@@ -75,7 +77,9 @@ export default function HistoryList() {
     if (user) {
       const cachedData = sessionStorage.getItem(`history_${user.uid}`);
       if (cachedData) {
-        setHistory(JSON.parse(cachedData));
+        const cached = JSON.parse(cachedData);
+        setHistory(cached.items || []);
+        setNextCursor(cached.next_cursor || null);
         setLoading(false);
         fetchHistory(true);
       } else {
@@ -129,7 +133,8 @@ export default function HistoryList() {
       });
       if (response.ok) {
         const data = await response.json();
-        setHistory(data);
+        setHistory(data.items);
+        setNextCursor(data.next_cursor);
         sessionStorage.setItem(`history_${user.uid}`, JSON.stringify(data));
       }
     } catch (error) {
@@ -139,12 +144,48 @@ export default function HistoryList() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const token = await user.getIdToken();
+      const response = await fetch(`${API_URL}/api/history?cursor=${encodeURIComponent(nextCursor)}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const data = await response.json();
+        setHistory((prev) => [...prev, ...data.items]);
+        setNextCursor(data.next_cursor);
+      }
+    } catch (error) {
+      console.error("Failed to load more history", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const openItem = async (item) => {
+    setSelectedItem({ ...item, answer: item.preview || "" });
+    try {
+      const token = await user.getIdToken();
+      const response = await fetch(`${API_URL}/api/history/${item.id}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const full = await response.json();
+        setSelectedItem((current) => (current && current.id === full.id ? full : current));
+      }
+    } catch (error) {
+      console.error("Failed to load history item", error);
+    }
+  };
+
   const handleDelete = async (id, e) => {
     e.stopPropagation(); 
     if (!confirm("Are you sure you want to delete this?")) return;
     const updatedHistory = history.filter((item) => item.id !== id);
     setHistory(updatedHistory);
-    if (user) sessionStorage.setItem(`history_${user.uid}`, JSON.stringify(updatedHistory));
+    if (user) sessionStorage.setItem(`history_${user.uid}`, JSON.stringify({ items: updatedHistory, next_cursor: nextCursor }));
 
     try {
       const token = await user.getIdToken();
@@ -289,7 +330,7 @@ export default function HistoryList() {
             <div 
               key={item.id} 
               className="group relative flex flex-col justify-between bg-white p-6 rounded-2xl border border-slate-100 shadow-sm transition-all duration-300 hover:shadow-[0_8px_30px_rgb(0,0,0,0.06)] hover:-translate-y-1 hover:border-indigo-100 cursor-pointer"
-              onClick={() => setSelectedItem(item)}
+              onClick={() => openItem(item)}
             >
               <div>
                 <div className="flex justify-between items-start mb-4">
@@ -309,7 +350,7 @@ export default function HistoryList() {
                 </h3>
 
                 <p className="text-sm text-slate-600 line-clamp-3 leading-relaxed mb-4">
-                  {item.answer}
+                  {item.preview}
                 </p>
               </div>
 
@@ -331,6 +372,18 @@ export default function HistoryList() {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="mt-8 flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-5 py-2.5 rounded-xl border border-slate-200 bg-white text-sm font-semibold text-slate-700 shadow-sm hover:border-indigo-200 hover:text-indigo-600 transition-colors disabled:opacity-50"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
+
       {selectedItem && (
         <div className="fixed inset-0 z-[100] flex items-center justify-center p-4 bg-slate-900/60 backdrop-blur-sm animate-in fade-in duration-200">
           <div className="bg-white w-full max-w-3xl rounded-2xl shadow-2xl overflow-hidden max-h-[85vh] flex flex-col ring-1 ring-white/20">
@@ -19,6 +19,27 @@ export default function KnowledgeUpload() {
     }
   };
 
+  const waitForJob = async (jobId, token) => {
+    while (true) {
+      const res = await fetch(`${API_URL}/api/knowledge/jobs/${jobId}`, {
+        headers: { "Authorization": `Bearer ${token}` },
+      });
+      const job = await res.json();
+
+      if (!res.ok) throw new Error(job.detail || "Could not check upload progress");
+      if (job.status === "completed") return job;
+      if (job.status === "failed") throw new Error(job.error || "Upload failed");
+
+      setStatus({
+        type: "progress",
+        text: job.chunks_total
+          ? `Learning... ${job.chunks_processed}/${job.chunks_total} chunks (${job.stage})`
+          : `Learning... (${job.stage})`,
+      });
+      await new Promise((resolve) => setTimeout(resolve, 1500));
+    }
+  };
+
   const handleUpload = async (e) => {
     e.preventDefault();
     if (!file || !user) return;
@@ -43,9 +64,13 @@ export default function KnowledgeUpload() {
 
       if (!response.ok) throw new Error(data.detail || "Upload failed");
 
+      const job = await waitForJob(data.job_id, token);
+
       setStatus({
         type: "success",
-        text: `Success! Added ${data.chunks_added} knowledge chunks to your brain.`,
+        text: job.chunks_skipped || job.chunks_removed
+          ? `Success! Added ${job.chunks_added} new chunks, kept ${job.chunks_skipped} unchanged and removed ${job.chunks_removed} outdated ones.`
+          : `Success! Added ${job.chunks_added} knowledge chunks to your brain.`,
       });
       setFile(null); 
     } catch (error) {
@@ -126,9 +151,13 @@ export default function KnowledgeUpload() {
 
             {status && (
               <div className={`p-4 rounded-lg flex items-start gap-3 text-sm font-medium ${
-                status.type === 'success' ? 'bg-green-50 text-green-800' : 'bg-red-50 text-red-800'
+                status.type === 'success' ? 'bg-green-50 text-green-800'
+                  : status.type === 'progress' ? 'bg-indigo-50 text-indigo-800'
+                  : 'bg-red-50 text-red-800'
               }`}>
-                {status.type === 'success' ? <CheckCircle size={18} className="mt-0.5 shrink-0" /> : <AlertCircle size={18} className="mt-0.5 shrink-0" />}
+                {status.type === 'success' ? <CheckCircle size={18} className="mt-0.5 shrink-0" />
+                  : status.type === 'progress' ? <Brain size={18} className="mt-0.5 shrink-0" />
+                  : <AlertCircle size={18} className="mt-0.5 shrink-0" />}
                 {status.text}
               </div>
             )}
@@ -189,7 +189,7 @@ export default function ResultSection({ data, onRegenerate }) {
       const res = await fetch(`${API_URL}/api/regenerate`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ selected_text: selectedText, instruction: enhancedInstruction }),
+        body: JSON.stringify({ selected_text: selectedText, instruction: enhancedInstruction, context: editorInstance.getData() }),
       });
       const result = await res.json();
       const formattedHtml = formatMarkdown(result.updated_text);